@@ -3,24 +3,35 @@ Authentication utilities: JWT creation/verification and password hashing.
 """
 
 import hashlib
+import hmac
 import os
 from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import Optional
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from jose import JWTError, jwt
-from passlib.context import CryptContext
 
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
+# Shared secret for operator endpoints (exports, imports). Unset disables them.
+ADMIN_API_KEY = os.getenv("ADMIN_API_KEY")
 
-# bcrypt has a 72-byte limit; we pre-hash with SHA256 so long passwords work.
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer(auto_error=False)
 
 
+# passlib and python-jose are imported on first use rather than at module load:
+# together they are a large share of worker boot time.
+@lru_cache(maxsize=1)
+def get_pwd_context():
+    """Password hashing context, built on first use."""
+    from passlib.context import CryptContext
+
+    # bcrypt has a 72-byte limit; we pre-hash with SHA256 so long passwords work.
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
 def _password_digest(password: str) -> str:
     """SHA256 digest of password (UTF-8). Keeps input to bcrypt under 72 bytes."""
     return hashlib.sha256(password.encode("utf-8")).hexdigest()
@@ -28,11 +39,12 @@ def _password_digest(password: str) -> str:
 
 def hash_password(password: str) -> str:
     """Hash a plain password (any length; pre-hashed before bcrypt)."""
-    return pwd_context.hash(_password_digest(password))
+    return get_pwd_context().hash(_password_digest(password))
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a plain password against a hash. Supports both new (SHA256+bcrypt) and legacy (bcrypt-only) hashes."""
+    pwd_context = get_pwd_context()
     digest = _password_digest(plain_password)
     if pwd_context.verify(digest, hashed_password):
         return True
@@ -44,6 +56,8 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token."""
+    from jose import jwt
+
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
     to_encode.update({"exp": expire})
@@ -52,6 +66,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
 
 def decode_access_token(token: str) -> Optional[dict]:
     """Decode and validate a JWT token. Returns payload or None."""
+    from jose import JWTError, jwt
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         return payload
@@ -94,3 +110,20 @@ def get_current_user_id(
             detail="Invalid user in token",
             headers={"WWW-Authenticate": "Bearer"},
         )
+
+
+def require_admin(x_admin_key: Optional[str] = Header(None)) -> None:
+    """
+    Dependency: require the X-Admin-Key header to match ADMIN_API_KEY.
+    Use this on operator-only routes (bulk exports and imports).
+    """
+    if not ADMIN_API_KEY:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin API is disabled",
+        )
+    if x_admin_key is None or not hmac.compare_digest(x_admin_key, ADMIN_API_KEY):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Invalid admin key",
+        )
@@ -0,0 +1,125 @@
+"""
+Chunked, resumable data backfills for migrations on large tables.
+
+A single UPDATE over a large table holds SQLite's write lock until it finishes,
+stalling every writer behind it. A backfill instead walks the table in key order
+and applies its UPDATE to one keyset batch per transaction, pausing between
+batches so live traffic can interleave. Progress is checkpointed in the
+``_backfills`` table inside each batch transaction, so an interrupted backfill
+resumes after the last committed batch.
+
+Migrations register work by defining a ``backfill()`` function that calls
+``run_backfill``; ``python migrate.py backfill`` runs every pending one.
+"""
+
+import os
+import sqlite3
+import time
+from typing import Optional
+
+from app import database
+from app.database import configure_connection
+
+BACKFILL_BATCH_SIZE = int(os.getenv("BACKFILL_BATCH_SIZE", "1000"))
+BACKFILL_PAUSE_SECONDS = float(os.getenv("BACKFILL_PAUSE_SECONDS", "0.05"))
+
+# Lower bound for the first batch: smaller than any SQLite INTEGER key.
+_MIN_KEY = -(2**63)
+
+
+def ensure_backfill_table(conn: sqlite3.Connection) -> None:
+    """Create the checkpoint table if it doesn't exist."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS _backfills (
+            name TEXT PRIMARY KEY,
+            last_key INTEGER,
+            rows_done INTEGER NOT NULL DEFAULT 0,
+            started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            completed_at TIMESTAMP
+        )
+    """)
+
+
+def get_backfill_status(name: str, db_path: Optional[str] = None) -> Optional[dict]:
+    """Return the checkpoint row for a backfill, or None if it has never started."""
+    conn = sqlite3.connect(db_path or database.DATABASE_PATH, uri=True)
+    try:
+        ensure_backfill_table(conn)
+        row = conn.execute(
+            "SELECT last_key, rows_done, completed_at FROM _backfills WHERE name = ?",
+            (name,),
+        ).fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        return None
+    return {"name": name, "last_key": row[0], "rows_done": row[1], "completed": row[2] is not None}
+
+
+def run_backfill(
+    name: str,
+    table: str,
+    update_sql: str,
+    key_column: str = "id",
+    batch_size: Optional[int] = None,
+    pause: Optional[float] = None,
+    db_path: Optional[str] = None,
+) -> int:
+    """
+    Apply update_sql to table in keyset batches. Returns rows processed by this run.
+
+    update_sql is executed once per batch with two parameters: the exclusive lower
+    and inclusive upper key bound, e.g.
+    "UPDATE products SET price_cents = ... WHERE id > ? AND id <= ?".
+    A completed backfill is a no-op; an interrupted one resumes after its checkpoint.
+    """
+    batch_size = batch_size or BACKFILL_BATCH_SIZE
+    pause = BACKFILL_PAUSE_SECONDS if pause is None else pause
+    conn = configure_connection(sqlite3.connect(db_path or database.DATABASE_PATH, uri=True))
+    processed = 0
+    try:
+        ensure_backfill_table(conn)
+        conn.execute("INSERT OR IGNORE INTO _backfills (name) VALUES (?)", (name,))
+        conn.commit()
+        last_key, completed_at = conn.execute(
+            "SELECT last_key, completed_at FROM _backfills WHERE name = ?", (name,)
+        ).fetchone()
+        if completed_at is not None:
+            return 0
+        if last_key is None:
+            last_key = _MIN_KEY
+
+        while True:
+            high, count = conn.execute(
+                f"""
+                SELECT MAX({key_column}), COUNT(*) FROM (
+                    SELECT {key_column} FROM {table}
+                    WHERE {key_column} > ? ORDER BY {key_column} LIMIT ?
+                )
+                """,
+                (last_key, batch_size),
+            ).fetchone()
+            if count == 0:
+                conn.execute(
+                    "UPDATE _backfills SET completed_at = CURRENT_TIMESTAMP WHERE name = ?",
+                    (name,),
+                )
+                conn.commit()
+                return processed
+
+            # Batch and checkpoint commit together, so a crash never skips or repeats a batch.
+            conn.execute(update_sql, (last_key, high))
+            conn.execute(
+                "UPDATE _backfills SET last_key = ?, rows_done = rows_done + ? WHERE name = ?",
+                (high, count, name),
+            )
+            conn.commit()
+            last_key = high
+            processed += count
+            if pause > 0:
+                time.sleep(pause)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
@@ -0,0 +1,244 @@
+"""
+Online backups of the live databases, taken while the service keeps serving.
+
+Copying data/app.db while it is written is unsafe: the file and its -wal are
+copied at different moments. run_backup() copies every shard (and the order
+archive) with SQLite's online backup API instead, BACKUP_STEP_PAGES pages per
+step with BACKUP_PAUSE_SECONDS between steps, so the copy never holds the CPU or
+the disk for long.
+
+The backup connection first opens a read transaction. In WAL mode this pins a
+snapshot: every step copies the same consistent state while writers keep
+committing to the WAL, and the backup is never restarted by their commits (the
+WAL cannot be checkpointed past the snapshot until the copy ends). Without WAL
+(e.g. in-memory databases) the read transaction would block writers, so steps
+run unpinned and SQLite restarts the copy when another connection writes.
+
+With vacuum=True each database is written with VACUUM INTO instead: a compacted
+copy without free pages, made in one pass over the same kind of snapshot.
+
+Copies are written to <name>.partial and renamed when complete. Progress of the
+running backup (pages copied, bytes/sec) is available from get_status().
+
+Usage:
+    python -m app.backup [--dir backups/now] [--vacuum] [--step-pages 256] [--pause 0.01]
+"""
+
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from typing import Callable, Optional
+from urllib.parse import quote
+
+from app import database, metrics
+from app.database import SHARD_COUNT, database_exists, is_memory_database, shard_path
+
+logger = logging.getLogger(__name__)
+
+# Each backup goes to a new timestamped directory under BACKUP_DIR.
+BACKUP_DIR = os.getenv("BACKUP_DIR", "backups")
+BACKUP_STEP_PAGES = int(os.getenv("BACKUP_STEP_PAGES", "256"))
+BACKUP_PAUSE_SECONDS = float(os.getenv("BACKUP_PAUSE_SECONDS", "0.01"))
+
+# One backup at a time per worker.
+_running = threading.Lock()
+_status_lock = threading.Lock()
+_status: dict = {"running": False, "progress": None, "last_report": None}
+
+
+class BackupInProgress(Exception):
+    """Another backup is running in this worker."""
+
+
+def copy_name(path: str) -> str:
+    """File name of a database's copy: its own file name (an in-memory database's name plus .db)."""
+    name = path.partition("?")[0]
+    if name.startswith("file:"):
+        name = name[len("file:"):]
+    name = os.path.basename(name)
+    return name if os.path.splitext(name)[1] else f"{name}.db"
+
+
+def _set_progress(**progress) -> None:
+    with _status_lock:
+        _status["progress"] = progress
+
+
+def get_status() -> dict:
+    """Whether a backup is running, its progress, and the report of the last completed one."""
+    with _status_lock:
+        return {key: dict(value) if isinstance(value, dict) else value for key, value in _status.items()}
+
+
+def backup_file(
+    source: str,
+    target: str,
+    pages_per_step: Optional[int] = None,
+    pause: Optional[float] = None,
+    on_progress: Optional[Callable[[dict], None]] = None,
+) -> dict:
+    """Copy one database to target with the backup API. Returns pages and bytes copied, steps, restarts and seconds."""
+    pages_per_step = pages_per_step or BACKUP_STEP_PAGES
+    pause = BACKUP_PAUSE_SECONDS if pause is None else pause
+    partial = target + ".partial"
+    if os.path.exists(partial):
+        os.remove(partial)
+    started = time.perf_counter()
+    src = sqlite3.connect(source, uri=True, isolation_level=None)
+    dst = sqlite3.connect(partial)
+    state = {"steps": 0, "restarts": 0, "remaining": None}
+    try:
+        src.execute(f"PRAGMA busy_timeout = {database.DB_BUSY_TIMEOUT_MS}")
+        page_size = src.execute("PRAGMA page_size").fetchone()[0]
+        pinned = src.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        if pinned:
+            src.execute("BEGIN")
+            src.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+
+        def progress(status: int, remaining: int, total: int) -> None:
+            state["steps"] += 1
+            if state["remaining"] is not None and remaining > state["remaining"]:
+                state["restarts"] += 1
+            state["remaining"] = remaining
+            elapsed = time.perf_counter() - started
+            copied = (total - remaining) * page_size
+            report = {
+                "database": copy_name(source),
+                "pages_done": total - remaining,
+                "pages_total": total,
+                "bytes_per_sec": round(copied / elapsed) if elapsed > 0 else None,
+            }
+            _set_progress(**report)
+            metrics.set_gauge("backup.remaining_pages", remaining)
+            if on_progress is not None:
+                on_progress(report)
+            if remaining and pause > 0:
+                time.sleep(pause)
+
+        src.backup(dst, pages=pages_per_step, progress=progress)
+        if pinned:
+            src.execute("COMMIT")
+        pages = dst.execute("PRAGMA page_count").fetchone()[0]
+    finally:
+        dst.close()
+        src.close()
+    os.replace(partial, target)
+    return {
+        "database": copy_name(source),
+        "path": target,
+        "pages": pages,
+        "bytes": pages * page_size,
+        "steps": state["steps"],
+        "restarts": state["restarts"],
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def _on_disk(path: str) -> str:
+    """URI of a file on the OS file system; VACUUM INTO otherwise uses the source's VFS (memdb)."""
+    return f"file:{quote(os.path.abspath(path))}?vfs={'win32' if os.name == 'nt' else 'unix'}"
+
+
+def vacuum_into(source: str, target: str) -> dict:
+    """Write a compacted copy of one database to target with VACUUM INTO. Returns bytes written and seconds."""
+    partial = target + ".partial"
+    if os.path.exists(partial):
+        os.remove(partial)
+    started = time.perf_counter()
+    _set_progress(database=copy_name(source), pages_done=None, pages_total=None, bytes_per_sec=None)
+    conn = sqlite3.connect(source, uri=True)
+    try:
+        conn.execute(f"PRAGMA busy_timeout = {database.DB_BUSY_TIMEOUT_MS}")
+        conn.execute("VACUUM INTO ?", (_on_disk(partial) if is_memory_database(source) else partial,))
+    finally:
+        conn.close()
+    os.replace(partial, target)
+    return {
+        "database": copy_name(source),
+        "path": target,
+        "bytes": os.path.getsize(target),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def run_backup(
+    directory: Optional[str] = None,
+    vacuum: bool = False,
+    pages_per_step: Optional[int] = None,
+    pause: Optional[float] = None,
+    on_progress: Optional[Callable[[dict], None]] = None,
+) -> dict:
+    """
+    Back up every shard and the order archive (if any) into directory (default: a new
+    timestamped directory under BACKUP_DIR). Returns the files written, total bytes,
+    seconds and bytes/sec. Raises BackupInProgress if a backup is already running.
+    """
+    if not _running.acquire(blocking=False):
+        raise BackupInProgress()
+    try:
+        with _status_lock:
+            _status["running"] = True
+            _status["progress"] = None
+        directory = directory or os.path.join(BACKUP_DIR, time.strftime("%Y%m%d-%H%M%S"))
+        os.makedirs(directory, exist_ok=True)
+        sources = [shard_path(shard) for shard in range(SHARD_COUNT)]
+        if database_exists(database.ARCHIVE_DATABASE_PATH):
+            sources.append(database.ARCHIVE_DATABASE_PATH)
+        started = time.perf_counter()
+        files = []
+        for source in sources:
+            target = os.path.join(directory, copy_name(source))
+            if vacuum:
+                files.append(vacuum_into(source, target))
+            else:
+                files.append(backup_file(source, target, pages_per_step, pause, on_progress))
+        seconds = time.perf_counter() - started
+        total_bytes = sum(f["bytes"] for f in files)
+        report = {
+            "directory": directory,
+            "method": "vacuum_into" if vacuum else "backup",
+            "files": files,
+            "bytes": total_bytes,
+            "seconds": round(seconds, 3),
+            "bytes_per_sec": round(total_bytes / seconds) if seconds > 0 else None,
+        }
+        metrics.inc("backup.runs")
+        metrics.inc("backup.bytes", total_bytes)
+        metrics.observe("backup.run_seconds", seconds)
+        with _status_lock:
+            _status["last_report"] = report
+        return report
+    except Exception:
+        metrics.inc("backup.failures")
+        logger.exception("Backup failed")
+        raise
+    finally:
+        with _status_lock:
+            _status["running"] = False
+            _status["progress"] = None
+        _running.release()
+
+
+def _print_progress(progress: dict) -> None:
+    done, total = progress["pages_done"], progress["pages_total"]
+    percent = 100 * done / total if total else 100
+    print(
+        f"{progress['database']}: {done}/{total} pages ({percent:.0f}%), {progress['bytes_per_sec'] or 0} bytes/sec",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Back up the databases while the service runs")
+    parser.add_argument("--dir", help="Output directory (default: a new directory under BACKUP_DIR)")
+    parser.add_argument("--vacuum", action="store_true", help="Write compacted copies with VACUUM INTO")
+    parser.add_argument("--step-pages", type=int, default=None, help="Pages copied per backup step")
+    parser.add_argument("--pause", type=float, default=None, help="Seconds to sleep between steps")
+    args = parser.parse_args()
+
+    print(json.dumps(run_backup(args.dir, args.vacuum, args.step_pages, args.pause, _print_progress), indent=2))
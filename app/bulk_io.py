@@ -0,0 +1,55 @@
+"""
+Incremental readers for bulk CSV / JSONL input.
+
+Records are parsed one line at a time and handed out in fixed-size chunks, so a
+file of millions of rows is never held in memory at once.
+"""
+
+import csv
+import json
+import os
+from itertools import islice
+from typing import IO, Iterable, Iterator
+
+FORMATS = ("csv", "jsonl")
+
+
+def detect_format(path: str) -> str:
+    """Input format from the file extension (.csv, or .jsonl/.ndjson)."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        return "csv"
+    if ext in (".jsonl", ".ndjson"):
+        return "jsonl"
+    raise ValueError(f"Cannot detect format of {path}; expected .csv or .jsonl")
+
+
+def iter_records(stream: IO[str], fmt: str) -> Iterator[tuple[int, dict]]:
+    """
+    Yield (line number, record) pairs. CSV needs a header row.
+    A JSONL line that is not a JSON object yields a record of {"_error": message}.
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+    elif fmt == "jsonl":
+        for line_num, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                record = {"_error": f"invalid JSON: {e.msg}"}
+            if not isinstance(record, dict):
+                record = {"_error": "expected a JSON object"}
+            yield line_num, record
+    else:
+        raise ValueError(f"Unsupported format {fmt!r}; expected one of {', '.join(FORMATS)}")
+
+
+def chunked(iterable: Iterable, size: int) -> Iterator[list]:
+    """Split an iterable into lists of at most size items."""
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
@@ -0,0 +1,139 @@
+"""
+In-process read-model cache for GET /cart.
+
+Holds the materialized cart view (items and total) per user_id in an LRU bounded
+by CART_CACHE_MAX_LINES: every entry weighs one plus its number of cart lines, so
+memory stays bounded however large individual carts get.
+
+Writers call invalidate() (or set() with the new view) after their transaction
+commits, and publish a "cart" event for the other workers (app.invalidation).
+A reader that misses calls begin_load() before querying and passes the token to
+put(); if a write for that user lands in between, the token is revoked and the
+possibly stale view is not stored. load() wraps this and coalesces concurrent
+misses for one user into a single query.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from app import metrics
+from app.invalidation import bus
+from app.singleflight import SingleFlight
+
+CART_CACHE_MAX_LINES = int(os.getenv("CART_CACHE_MAX_LINES", "100000"))
+
+
+class CartCache:
+    def __init__(self, max_weight: int):
+        self.max_weight = max_weight
+        self.weight = 0
+        self._entries: OrderedDict[int, tuple[dict, int]] = OrderedDict()
+        self._loads: dict[int, object] = {}
+        self._flight = SingleFlight("cart")
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: int) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(user_id)
+        metrics.inc("cart_cache.hits" if entry else "cart_cache.misses")
+        metrics.set_gauge("cart_cache.hit_rate", self.hit_rate())
+        return entry[0] if entry else None
+
+    def load(self, user_id: int, loader: Callable[[int], dict], timeout: Optional[float] = None) -> dict:
+        """Cached view, or loader(user_id) run once for all concurrent callers that missed."""
+        view = self.get(user_id)
+        if view is not None:
+            return view
+
+        def load_and_store() -> dict:
+            token = self.begin_load(user_id)
+            view = loader(user_id)
+            self.put(user_id, view, token)
+            return view
+
+        return self._flight.do(user_id, load_and_store, timeout)
+
+    def begin_load(self, user_id: int) -> object:
+        """Register an in-flight load; returns the token to pass to put()."""
+        token = object()
+        with self._lock:
+            self._loads[user_id] = token
+        return token
+
+    def put(self, user_id: int, view: dict, token: object) -> bool:
+        """Store a loaded view unless a write for this user happened since begin_load()."""
+        with self._lock:
+            if self._loads.get(user_id) is not token:
+                metrics.inc("cart_cache.stale_loads_discarded")
+                return False
+            del self._loads[user_id]
+            self._store(user_id, view)
+            return True
+
+    def set(self, user_id: int, view: dict) -> None:
+        """Write-through: replace the user's view after a committed write."""
+        with self._lock:
+            self._loads.pop(user_id, None)
+            self._store(user_id, view)
+        self._flight.forget(user_id)
+
+    def invalidate(self, user_id: int) -> None:
+        """Drop the user's view after a committed write; revokes in-flight loads."""
+        with self._lock:
+            self._loads.pop(user_id, None)
+            self._remove(user_id)
+        self._flight.forget(user_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._loads.clear()
+            self._entries.clear()
+            self.weight = 0
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "weight": self.weight,
+                "max_weight": self.max_weight,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hit_rate(), 4),
+            }
+
+    def _store(self, user_id: int, view: dict) -> None:
+        self._remove(user_id)
+        weight = 1 + len(view["items"])
+        if weight > self.max_weight:
+            return
+        self._entries[user_id] = (view, weight)
+        self.weight += weight
+        while self.weight > self.max_weight:
+            _, (_, evicted_weight) = self._entries.popitem(last=False)
+            self.weight -= evicted_weight
+            metrics.inc("cart_cache.evictions")
+        metrics.set_gauge("cart_cache.entries", len(self._entries))
+
+    def _remove(self, user_id: int) -> None:
+        entry = self._entries.pop(user_id, None)
+        if entry is not None:
+            self.weight -= entry[1]
+
+
+cart_cache = CartCache(CART_CACHE_MAX_LINES)
+# Cart writes handled by other workers.
+bus.subscribe("cart", cart_cache.invalidate)
+bus.on_reset(cart_cache.clear)
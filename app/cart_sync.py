@@ -0,0 +1,95 @@
+"""
+Propagation of product changes into cart line snapshots.
+
+Cart lines carry a snapshot of product name and unit price, so cart reads never
+join products. When products change (catalog import), active carts are
+re-snapshotted in the background: active carts of each shard are walked in keyset
+batches of CART_SYNC_BATCH_SIZE, each batch in its own short transaction, and the
+cached views of the affected carts are dropped (cart totals follow via triggers on
+cart_items).
+"""
+
+import json
+import logging
+import os
+import threading
+from typing import Optional
+
+from app import metrics
+from app.cart_cache import cart_cache
+from app.database import SHARD_COUNT, get_db
+from app.invalidation import publish_many
+
+logger = logging.getLogger(__name__)
+
+CART_SYNC_BATCH_SIZE = int(os.getenv("CART_SYNC_BATCH_SIZE", "500"))
+
+
+def refresh_active_cart_lines(product_ids: Optional[list[int]] = None) -> int:
+    """
+    Copy current product name and price into lines of active carts
+    (only lines of product_ids, if given). Returns the number of lines changed.
+    """
+    product_filter = json.dumps(product_ids) if product_ids is not None else None
+    changed = sum(_refresh_shard(shard, product_filter) for shard in range(SHARD_COUNT))
+    metrics.inc("cart_sync.lines_refreshed", changed)
+    return changed
+
+
+def _refresh_shard(shard: int, product_filter: Optional[str]) -> int:
+    last_cart_id = 0
+    changed = 0
+    while True:
+        with get_db(shard=shard) as conn:
+            high, count = conn.execute(
+                """
+                SELECT MAX(id), COUNT(*) FROM (
+                    SELECT id FROM cart WHERE status = 'active' AND id > ? ORDER BY id LIMIT ?
+                )
+                """,
+                (last_cart_id, CART_SYNC_BATCH_SIZE),
+            ).fetchone()
+            if count == 0:
+                break
+            # One row per changed line; triggers on cart_items keep the cart totals current.
+            rows = conn.execute(
+                """
+                UPDATE cart_items SET product_name = p.name, unit_price_cents = p.price_cents
+                FROM products p
+                WHERE p.id = cart_items.product_id
+                  AND cart_items.cart_id IN (
+                      SELECT id FROM cart WHERE status = 'active' AND id > ? AND id <= ?
+                  )
+                  AND (?3 IS NULL OR cart_items.product_id IN (SELECT value FROM json_each(?3)))
+                  AND (
+                      cart_items.unit_price_cents IS NOT p.price_cents
+                      OR cart_items.product_name IS NOT p.name
+                  )
+                RETURNING (SELECT user_id FROM cart WHERE cart.id = cart_items.cart_id) AS user_id
+                """,
+                (last_cart_id, high, product_filter),
+            ).fetchall()
+            user_ids = sorted({row["user_id"] for row in rows})
+            publish_many(conn, "cart", user_ids)
+        for user_id in user_ids:
+            cart_cache.invalidate(user_id)
+        changed += len(rows)
+        last_cart_id = high
+    return changed
+
+
+def _refresh_in_background(product_ids: Optional[list[int]]) -> None:
+    try:
+        refresh_active_cart_lines(product_ids)
+    except Exception:
+        logger.exception("Refreshing cart line snapshots failed")
+        metrics.inc("cart_sync.failures")
+
+
+def schedule_refresh(product_ids: Optional[list[int]] = None) -> threading.Thread:
+    """Run refresh_active_cart_lines in a background thread; returns the thread."""
+    thread = threading.Thread(
+        target=_refresh_in_background, args=(product_ids,), name="cart-sync", daemon=True
+    )
+    thread.start()
+    return thread
@@ -0,0 +1,86 @@
+"""
+Cached product catalog.
+
+Products change rarely (migrations, imports), so the list served by GET /products
+is loaded once and kept in memory until invalidate() is called, here or (through
+the invalidation bus) in another worker.
+"""
+
+import threading
+from typing import Optional
+
+from app import metrics, repositories
+from app.invalidation import bus
+from app.money import from_cents
+from app.singleflight import SINGLEFLIGHT_TIMEOUT_SECONDS, SingleFlight
+
+_lock = threading.Lock()
+_products: Optional[list[dict]] = None
+# (products list, the same products by id), rebuilt when get_products() returns a new list.
+_by_id: tuple[Optional[list[dict]], dict[int, dict]] = (None, {})
+_version = 0
+# Concurrent misses for the same catalog version share one load.
+_flight = SingleFlight("catalog")
+
+
+def get_version() -> int:
+    """Catalog version; incremented on every invalidation."""
+    return _version
+
+
+def get_products() -> list[dict]:
+    """
+    All products ordered by id, each with price (for responses) and price_cents.
+    Served from memory after the first load; do not mutate. Raises SingleFlightTimeout
+    if another caller's load of the same version takes too long.
+    """
+    bus.ensure_fresh()
+    products = _products
+    if products is not None:
+        metrics.inc("catalog.cache_hits")
+        return products
+    metrics.inc("catalog.cache_misses")
+    return _flight.do(_version, _load, SINGLEFLIGHT_TIMEOUT_SECONDS)
+
+
+def get_product(product_id: int) -> Optional[dict]:
+    """One product of the cached catalog (same fields as get_products()), or None."""
+    global _by_id
+    products = get_products()
+    cached, by_id = _by_id
+    if cached is not products:
+        by_id = {product["id"]: product for product in products}
+        _by_id = (products, by_id)
+    return by_id.get(product_id)
+
+
+def _load() -> list[dict]:
+    global _products
+    version = _version
+    products = [
+        {
+            "id": row["id"],
+            "name": row["name"],
+            "price": from_cents(row["price_cents"]),
+            "price_cents": row["price_cents"],
+        }
+        for row in repositories.products.list_all()
+    ]
+    with _lock:
+        # Don't cache a result that an invalidation raced past.
+        if _version == version:
+            _products = products
+    return products
+
+
+def invalidate() -> None:
+    """Drop the cached catalog and bump the version; the next read reloads it."""
+    global _products, _version
+    with _lock:
+        _products = None
+        _version += 1
+
+
+# Catalog changes made by other workers (imports).
+bus.subscribe("catalog", lambda _key: invalidate())
+bus.on_reset(invalidate)
@@ -0,0 +1,218 @@
+"""
+Bulk product catalog import from CSV or JSONL.
+
+Each record has ``name`` and ``price`` and optionally ``id``: records with an id
+are upserted (insert, or update name and price of the existing product), records
+without one are inserted. Input is parsed incrementally and written in chunked
+executemany transactions on a dedicated connection with relaxed durability
+PRAGMAs; secondary indexes on products are dropped for the load and rebuilt
+once at the end. Products are written to shard 0 and then replicated to the other
+shards. The catalog cache version is bumped once, after the last chunk, and lines
+of active carts holding updated products are re-snapshotted.
+
+Usage:
+    python -m app.catalog_import products.csv [--format csv|jsonl] [--chunk-size 10000]
+"""
+
+import argparse
+import logging
+import os
+import sqlite3
+import time
+from typing import IO, Optional
+
+from app import catalog
+from app.bulk_io import chunked, detect_format, iter_records
+from app.cart_sync import refresh_active_cart_lines, schedule_refresh
+from app.database import SHARD_COUNT, configure_connection, shard_path
+from app.invalidation import publish
+from app.money import to_cents
+
+logger = logging.getLogger(__name__)
+
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "10000"))
+# Only the first few bad rows are reported individually.
+MAX_REPORTED_ERRORS = 100
+# Beyond this many updated products, active carts are re-snapshotted in full instead of by id.
+CART_REFRESH_MAX_IDS = 10000
+
+_UPSERT_SQL = """
+    INSERT INTO products (id, name, price_cents) VALUES (?, ?, ?)
+    ON CONFLICT(id) DO UPDATE SET name = excluded.name, price_cents = excluded.price_cents
+"""
+_INSERT_SQL = "INSERT INTO products (name, price_cents) VALUES (?, ?)"
+
+
+def _parse_product(record: dict) -> tuple[Optional[int], str, int]:
+    """Validate one input record; price is returned in cents. Raises ValueError with a readable message."""
+    if "_error" in record:
+        raise ValueError(record["_error"])
+    name = (record.get("name") or "").strip()
+    if not name:
+        raise ValueError("name is required")
+    try:
+        price = to_cents(record.get("price"))
+    except ValueError:
+        raise ValueError("price must be a number")
+    if price < 0:
+        raise ValueError("price must not be negative")
+    raw_id = record.get("id")
+    if raw_id in (None, ""):
+        return None, name, price
+    try:
+        return int(raw_id), name, price
+    except (TypeError, ValueError):
+        raise ValueError("id must be an integer")
+
+
+def _open_bulk_connection(path: Optional[str] = None) -> sqlite3.Connection:
+    """
+    Connection tuned for a bulk load, to shard 0 unless path is given. A crash
+    mid-import can lose the last chunks, not corrupt the file.
+    """
+    conn = configure_connection(sqlite3.connect(path or shard_path(0), uri=True))
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA cache_size = -200000")  # ~200 MB
+    return conn
+
+
+def _drop_secondary_indexes(conn: sqlite3.Connection) -> list[str]:
+    """
+    Drop the non-unique indexes created on products; returns their CREATE statements for
+    rebuilding. Unique indexes stay: they enforce constraints during the load.
+    """
+    rows = conn.execute(
+        """
+        SELECT m.name, m.sql FROM pragma_index_list('products') AS i JOIN sqlite_master AS m ON m.name = i.name
+        WHERE i."unique" = 0 AND i.origin = 'c'
+        """
+    ).fetchall()
+    for name, _ in rows:
+        conn.execute(f'DROP INDEX "{name}"')
+    conn.commit()
+    return [sql for _, sql in rows]
+
+
+def _rebuild_indexes(conn: sqlite3.Connection, index_sql: list[str], load_failed: bool) -> None:
+    """Recreate dropped indexes. After a failed load a rebuild error is only logged; the load's error is raised."""
+    for sql in index_sql:
+        try:
+            conn.execute(sql)
+        except sqlite3.Error:
+            if not load_failed:
+                raise
+            logger.exception("Could not rebuild index after a failed import: %s", sql)
+
+
+def replicate_products() -> int:
+    """
+    Copy new and changed products from shard 0 to the other shards (cart lines snapshot
+    and stock-check products in their own shard). Returns rows written across shards.
+    """
+    written = 0
+    for shard in range(1, SHARD_COUNT):
+        conn = _open_bulk_connection(shard_path(shard))
+        try:
+            conn.execute("ATTACH DATABASE ? AS primary_shard", (shard_path(0),))
+            written += conn.execute(
+                """
+                INSERT INTO products (id, name, price_cents)
+                SELECT id, name, price_cents FROM primary_shard.products WHERE true
+                ON CONFLICT (id) DO UPDATE SET name = excluded.name, price_cents = excluded.price_cents
+                WHERE products.name IS NOT excluded.name OR products.price_cents IS NOT excluded.price_cents
+                """
+            ).rowcount
+            conn.commit()
+        finally:
+            conn.close()
+    return written
+
+
+def import_catalog(
+    stream: IO[str], fmt: str, chunk_size: Optional[int] = None, background: bool = True
+) -> dict:
+    """
+    Import products from a text stream. Invalid rows are skipped and reported.
+    Returns counts, elapsed seconds and rows/sec. Cart snapshots are refreshed in a
+    background thread, or before returning if background is False.
+    """
+    chunk_size = chunk_size or IMPORT_CHUNK_SIZE
+    started = time.perf_counter()
+    imported = 0
+    failed = 0
+    errors = []
+    upserted_ids: set[int] = set()
+    conn = _open_bulk_connection()
+    try:
+        index_sql = _drop_secondary_indexes(conn)
+        load_failed = True
+        try:
+            for chunk in chunked(iter_records(stream, fmt), chunk_size):
+                upserts, inserts = [], []
+                for line_num, record in chunk:
+                    try:
+                        product_id, name, price = _parse_product(record)
+                    except ValueError as e:
+                        failed += 1
+                        if len(errors) < MAX_REPORTED_ERRORS:
+                            errors.append({"line": line_num, "error": str(e)})
+                        continue
+                    if product_id is None:
+                        inserts.append((name, price))
+                    else:
+                        upserts.append((product_id, name, price))
+                conn.executemany(_UPSERT_SQL, upserts)
+                conn.executemany(_INSERT_SQL, inserts)
+                conn.commit()
+                imported += len(upserts) + len(inserts)
+                if len(upserted_ids) <= CART_REFRESH_MAX_IDS:
+                    upserted_ids.update(product_id for product_id, _, _ in upserts)
+            load_failed = False
+        finally:
+            _rebuild_indexes(conn, index_sql, load_failed)
+            if imported:
+                publish(conn, "catalog")
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+        if imported:
+            replicate_products()
+            catalog.invalidate()
+
+    # Only updated products can already be in carts; new ones cannot.
+    if upserted_ids:
+        refresh_ids = None if len(upserted_ids) > CART_REFRESH_MAX_IDS else sorted(upserted_ids)
+        if background:
+            schedule_refresh(refresh_ids)
+        else:
+            refresh_active_cart_lines(refresh_ids)
+
+    elapsed = time.perf_counter() - started
+    return {
+        "imported": imported,
+        "failed": failed,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(imported / elapsed, 1) if elapsed > 0 else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import products from CSV or JSONL")
+    parser.add_argument("path", help="Input file (.csv, .jsonl)")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="Input format (default: from extension)")
+    parser.add_argument("--chunk-size", type=int, default=None, help="Rows per transaction")
+    args = parser.parse_args()
+
+    with open(args.path, newline="", encoding="utf-8") as f:
+        result = import_catalog(f, args.format or detect_format(args.path), args.chunk_size, background=False)
+    for error in result["errors"]:
+        print(f"line {error['line']}: {error['error']}")
+    print(
+        f"Imported {result['imported']} products ({result['failed']} failed) "
+        f"in {result['seconds']}s, {result['rows_per_sec']} rows/sec"
+    )
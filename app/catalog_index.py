@@ -0,0 +1,120 @@
+"""
+Columnar in-memory index over the product catalog for browse queries.
+
+The catalog is held as flat typed arrays instead of a list of dicts: ids and
+prices in cents (``array('q')``), names as one UTF-8 byte string addressed by an
+offsets array, and a permutation of row positions sorted by (price, id) with the
+matching sorted price column. "Products between X and Y sorted by price" and
+"top N cheapest" are two binary searches on the sorted prices plus a slice of the
+permutation; only the rows actually returned are materialized as dicts.
+
+The index is built from the catalog cache and swapped in as a whole when the
+catalog version changes, so readers always see one consistent snapshot.
+"""
+
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Optional
+
+from app import catalog, metrics
+from app.invalidation import bus
+from app.money import from_cents
+
+
+class CatalogIndex:
+    """Immutable columnar snapshot of the catalog. Row positions follow id order."""
+
+    def __init__(self, products: list[dict], version: int):
+        self.version = version
+        self.ids = array("q")
+        self.prices = array("q")
+        self.name_offsets = array("q", [0])
+        encoded = []
+        offset = 0
+        for product in products:
+            self.ids.append(product["id"])
+            self.prices.append(product["price_cents"])
+            name = product["name"].encode("utf-8")
+            encoded.append(name)
+            offset += len(name)
+            self.name_offsets.append(offset)
+        self.names = b"".join(encoded)
+        # Stable sort over positions in id order: ties on price stay ordered by id.
+        by_price = sorted(range(len(self.ids)), key=self.prices.__getitem__)
+        self.by_price = array("q", by_price)
+        self.sorted_prices = array("q", (self.prices[pos] for pos in by_price))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def name(self, pos: int) -> str:
+        return self.names[self.name_offsets[pos]:self.name_offsets[pos + 1]].decode("utf-8")
+
+    def row(self, pos: int) -> dict:
+        return {"id": self.ids[pos], "name": self.name(pos), "price": from_cents(self.prices[pos])}
+
+    def price_range(
+        self, min_cents: Optional[int] = None, max_cents: Optional[int] = None, limit: Optional[int] = None
+    ) -> array:
+        """Row positions with min_cents <= price <= max_cents, ordered by (price, id); the first limit of them."""
+        lo = 0 if min_cents is None else bisect_left(self.sorted_prices, min_cents)
+        hi = len(self.sorted_prices) if max_cents is None else bisect_right(self.sorted_prices, max_cents)
+        if limit is not None:
+            hi = min(hi, lo + limit)
+        return self.by_price[lo:hi] if lo < hi else array("q")
+
+    def query(
+        self,
+        min_cents: Optional[int] = None,
+        max_cents: Optional[int] = None,
+        sort: str = "id",
+        limit: Optional[int] = None,
+    ) -> list[dict]:
+        """Products in the price range, sorted by "price" or "id", at most limit of them."""
+        if min_cents is None and max_cents is None and sort == "id":
+            positions = range(len(self.ids) if limit is None else min(limit, len(self.ids)))
+        elif sort == "price":
+            positions = self.price_range(min_cents, max_cents, limit)
+        else:
+            positions = sorted(self.price_range(min_cents, max_cents))[:limit]
+        return [self.row(pos) for pos in positions]
+
+    def memory_bytes(self) -> int:
+        """Bytes held by the column buffers."""
+        columns = (self.ids, self.prices, self.name_offsets, self.by_price, self.sorted_prices)
+        return sum(column.itemsize * len(column) for column in columns) + len(self.names)
+
+    def stats(self) -> dict:
+        size = self.memory_bytes()
+        return {
+            "products": len(self),
+            "version": self.version,
+            "bytes": size,
+            "bytes_per_million_products": round(size / len(self) * 1_000_000) if len(self) else 0,
+        }
+
+
+_lock = threading.Lock()
+_index: Optional[CatalogIndex] = None
+
+
+def get_index() -> CatalogIndex:
+    """Current index; rebuilt (once, by one thread) when the catalog version has changed."""
+    global _index
+    bus.ensure_fresh()
+    index = _index
+    if index is not None and index.version == catalog.get_version():
+        return index
+    with _lock:
+        index = _index
+        version = catalog.get_version()
+        if index is None or index.version != version:
+            # Tag with the version read before loading: a racing invalidation makes it stale, not wrong.
+            index = CatalogIndex(catalog.get_products(), version)
+            _index = index
+            stats = index.stats()
+            metrics.inc("catalog_index.rebuilds")
+            metrics.set_gauge("catalog_index.bytes", stats["bytes"])
+            metrics.set_gauge("catalog_index.bytes_per_million_products", stats["bytes_per_million_products"])
+    return index
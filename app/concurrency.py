@@ -0,0 +1,128 @@
+"""
+Per-route-group concurrency limits for the sync handlers.
+
+Sync handlers all run on anyio's default thread limiter, so one slow group (a
+burst of bcrypt hashing on /auth) could take every thread and stall /products and
+/cart. Each route group gets its own limit: a request first takes a slot of its
+group on the event loop (no thread is used while it waits) and only then
+proceeds to the threadpool. A request that cannot get a slot within the group's
+queue timeout is answered 503 with Retry-After, instead of queueing behind the
+threadpool.
+
+The default thread limiter is raised to THREADPOOL_SIZE at startup, above the
+sum of the group limits, so groups cannot starve each other or ungrouped routes.
+
+Usage: ``dependencies=[Depends(limit_concurrency("cart_write"))]``.
+"""
+
+import asyncio
+import os
+import time
+import weakref
+
+import anyio
+from anyio.to_thread import current_default_thread_limiter
+from fastapi import HTTPException, status
+
+from app import metrics
+
+THREADPOOL_SIZE = int(os.getenv("THREADPOOL_SIZE", "64"))
+
+
+class ConcurrencyGroup:
+    def __init__(self, name: str, limit: int, queue_timeout: float):
+        self.name = name
+        self.limit = limit
+        self.queue_timeout = queue_timeout
+        self.in_use = 0
+        self.waiting = 0
+        # anyio primitives belong to one event loop (each TestClient runs its own).
+        self._semaphores: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+    def _semaphore(self) -> anyio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = anyio.Semaphore(self.limit)
+        return semaphore
+
+    async def acquire(self) -> bool:
+        """Take a slot, waiting at most queue_timeout. Returns False if none became free."""
+        semaphore = self._semaphore()
+        try:
+            semaphore.acquire_nowait()
+        except anyio.WouldBlock:
+            pass
+        else:
+            self.in_use += 1
+            metrics.observe(f"concurrency.{self.name}.queue_wait_seconds", 0.0)
+            return True
+        started = time.perf_counter()
+        self.waiting += 1
+        try:
+            with anyio.move_on_after(self.queue_timeout):
+                await semaphore.acquire()
+                self.in_use += 1
+                return True
+            return False
+        finally:
+            self.waiting -= 1
+            metrics.observe(f"concurrency.{self.name}.queue_wait_seconds", time.perf_counter() - started)
+
+    def release(self) -> None:
+        self.in_use -= 1
+        self._semaphore().release()
+
+    def stats(self) -> dict:
+        return {"limit": self.limit, "in_use": self.in_use, "waiting": self.waiting}
+
+
+GROUPS = {
+    group.name: group
+    for group in (
+        ConcurrencyGroup(
+            "auth",
+            int(os.getenv("AUTH_CONCURRENCY", str(os.cpu_count() or 4))),
+            float(os.getenv("AUTH_QUEUE_TIMEOUT_SECONDS", "2")),
+        ),
+        ConcurrencyGroup(
+            "cart_write",
+            int(os.getenv("CART_WRITE_CONCURRENCY", "8")),
+            float(os.getenv("CART_WRITE_QUEUE_TIMEOUT_SECONDS", "1")),
+        ),
+        ConcurrencyGroup(
+            "catalog_read",
+            int(os.getenv("CATALOG_READ_CONCURRENCY", "16")),
+            float(os.getenv("CATALOG_READ_QUEUE_TIMEOUT_SECONDS", "0.5")),
+        ),
+    )
+}
+
+
+def limit_concurrency(group_name: str):
+    """Dependency that holds a slot of the group for the duration of the request."""
+    group = GROUPS[group_name]
+
+    async def dependency():
+        if not await group.acquire():
+            metrics.inc(f"concurrency.{group.name}.rejected")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"Too many concurrent {group.name} requests, retry later",
+                headers={"Retry-After": "1"},
+            )
+        try:
+            yield
+        finally:
+            group.release()
+
+    return dependency
+
+
+def configure_threadpool() -> None:
+    """Size the default thread limiter of the running event loop (call from the lifespan)."""
+    current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+
+
+def stats() -> dict:
+    return {name: group.stats() for name, group in GROUPS.items()}
@@ -1,27 +1,396 @@
 import os
 import sqlite3
+import threading
+import zlib
 from contextlib import contextmanager
-from typing import Generator
+from typing import Callable, Generator, Optional
 
+# A file, or an SQLite URI: "file:/name?vfs=memdb" is an in-memory database shared by
+# the connections of this process (see use_database() and clone_database()).
 DATABASE_PATH = os.getenv("DATABASE_PATH", "app.db")
 
 
-def get_connection() -> sqlite3.Connection:
-    """Create a new database connection."""
-    conn = sqlite3.connect(DATABASE_PATH)
-    conn.row_factory = sqlite3.Row  # Enable dict-like access to rows
+def is_memory_database(path: str) -> bool:
+    """Whether path is an SQLite URI naming an in-memory database."""
+    return path.startswith("file:") and ("vfs=memdb" in path or "mode=memory" in path)
+
+
+def derived_path(path: str, suffix: str) -> str:
+    """path with suffix added to the database name (app.db -> app_shard1.db); a URI keeps its query."""
+    name, separator, query = path.partition("?")
+    base, ext = os.path.splitext(name)
+    return f"{base}{suffix}{ext}{separator}{query}"
+
+
+def default_archive_path(path: str) -> str:
+    if path.startswith("file:"):
+        return derived_path(path, "_archive")
+    return os.path.splitext(path)[0] + "_archive.db"
+
+
+# Order history moved out of the live tables by app.maintenance.
+ARCHIVE_DATABASE_PATH = os.getenv("ARCHIVE_DATABASE_PATH", default_archive_path(DATABASE_PATH))
+# How long a connection waits on a locked database before raising "database is locked".
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+# Idle connections kept open for reuse by get_db() (per shard).
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+# Users, and their carts, orders and idempotency keys, are spread over this many
+# database files; products are replicated to every shard. Fixed for a deployment:
+# a user's shard is derived from their email at registration.
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "1"))
+# Row ids of users, carts and cart lines in shard s start at s << SHARD_ID_BITS,
+# so ids are unique across shards and an id names its shard.
+SHARD_ID_BITS = 48
+# Keeps every id below 2**53, exact in JSON clients.
+MAX_SHARDS = 32
+SHARDED_TABLES = ("users", "cart", "cart_items")
+
+if not 1 <= SHARD_COUNT <= MAX_SHARDS:
+    raise ValueError(f"SHARD_COUNT must be between 1 and {MAX_SHARDS}")
+# Where users, products, carts and items live (see app.repositories): "sqlite", or
+# "memory" for one process holding everything in memory (tests, benchmarks).
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "sqlite")
+STORAGE_BACKENDS = ("sqlite", "memory")
+
+if STORAGE_BACKEND not in STORAGE_BACKENDS:
+    raise ValueError(f"STORAGE_BACKEND must be one of: {', '.join(STORAGE_BACKENDS)}")
+
+
+def shard_path(shard: int) -> str:
+    """Database file of a shard. Shard 0 is DATABASE_PATH, which also holds the unsharded tables."""
+    if shard == 0:
+        return DATABASE_PATH
+    return derived_path(DATABASE_PATH, f"_shard{shard}")
+
+
+def shard_for_email(email: str) -> int:
+    """Shard a new user is placed in."""
+    return zlib.crc32(email.lower().encode("utf-8")) % SHARD_COUNT
+
+
+def shard_for_user(user_id: int) -> int:
+    """Shard holding a user's rows (encoded in the id, see SHARD_ID_BITS)."""
+    return user_id >> SHARD_ID_BITS
+
+
+class ShardCountMismatch(RuntimeError):
+    """SHARD_COUNT differs from the count the databases were created with."""
+
+
+def recorded_shard_count(conn: sqlite3.Connection) -> Optional[int]:
+    """
+    SHARD_COUNT recorded in shard 0 by migrate.py. Databases from before the record have
+    one file, so users there without a record count as 1. None only for an empty database.
+    """
+    try:
+        row = conn.execute("SELECT value FROM _meta WHERE key = 'shard_count'").fetchone()
+    except sqlite3.OperationalError:
+        row = None
+    if row is not None:
+        return int(row[0])
+    try:
+        has_users = conn.execute("SELECT EXISTS (SELECT 1 FROM users)").fetchone()[0]
+    except sqlite3.OperationalError:
+        return None
+    return 1 if has_users else None
+
+
+def check_shard_count(conn: sqlite3.Connection) -> None:
+    """
+    Raise ShardCountMismatch if SHARD_COUNT is not the recorded count. With another
+    count, existing users' emails hash to the wrong shard: their logins fail and the
+    same email can register again.
+    """
+    recorded = recorded_shard_count(conn)
+    if recorded is not None and recorded != SHARD_COUNT:
+        raise ShardCountMismatch(
+            f"SHARD_COUNT is {SHARD_COUNT} but the databases were created with SHARD_COUNT={recorded}; "
+            f"users would be looked up in the wrong shard. Restore SHARD_COUNT={recorded}."
+        )
+
+
+def configure_connection(conn: sqlite3.Connection) -> sqlite3.Connection:
+    """Apply per-connection PRAGMAs. WAL lets readers proceed while a writer (e.g. a backfill batch) commits."""
+    conn.execute(f"PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA journal_mode = WAL")
     return conn
 
 
+def get_connection(shard: int = 0) -> sqlite3.Connection:
+    """Create a new database connection (to shard 0 unless given)."""
+    # Pooled connections are handed between threadpool threads, one request at a time.
+    conn = sqlite3.connect(shard_path(shard), uri=True, check_same_thread=False)
+    conn.row_factory = sqlite3.Row  # Enable dict-like access to rows
+    return configure_connection(conn)
+
+
+class ConnectionPool:
+    """
+    Reuses connections across requests instead of opening one per request.
+    Keeps up to `size` idle connections; demand beyond that opens extra
+    connections, which are closed on release.
+    """
+
+    def __init__(self, size: int, shard: int = 0):
+        self.size = size
+        self.shard = shard
+        self.in_use = 0
+        self._idle: list[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+    def acquire(self) -> sqlite3.Connection:
+        with self._lock:
+            self.in_use += 1
+            if self._idle:
+                return self._idle.pop()
+        try:
+            return get_connection(self.shard)
+        except Exception:
+            with self._lock:
+                self.in_use -= 1
+            raise
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        with self._lock:
+            self.in_use -= 1
+            if len(self._idle) < self.size:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def prefill(self) -> None:
+        """Open idle connections up to the pool size."""
+        while True:
+            with self._lock:
+                if len(self._idle) + self.in_use >= self.size:
+                    return
+            conn = get_connection(self.shard)
+            with self._lock:
+                if len(self._idle) < self.size:
+                    self._idle.append(conn)
+                    continue
+            conn.close()
+            return
+
+    def close_all(self) -> None:
+        """Close idle connections (connections in use are closed when released past the limit)."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": self.size, "in_use": self.in_use, "idle": len(self._idle)}
+
+
+_pools: dict[int, ConnectionPool] = {}
+_pool_lock = threading.Lock()
+
+
+def get_pool(shard: int = 0) -> ConnectionPool:
+    """The process-wide connection pool of a shard, created on first use."""
+    pool = _pools.get(shard)
+    if pool is None:
+        with _pool_lock:
+            pool = _pools.get(shard)
+            if pool is None:
+                pool = _pools[shard] = ConnectionPool(DB_POOL_SIZE, shard)
+    return pool
+
+
+def close_pool() -> None:
+    """Close pooled connections of every shard (called on application shutdown)."""
+    for pool in list(_pools.values()):
+        pool.close_all()
+
+
+# An in-memory database is freed when its last connection closes, so this module holds
+# one open per in-memory database in use (pools are closed and refilled freely).
+_resident: dict[str, sqlite3.Connection] = {}
+_resident_lock = threading.Lock()
+_switch_handlers: list[Callable[[], None]] = []
+
+
+def _keep_resident(path: str) -> None:
+    if not is_memory_database(path):
+        return
+    with _resident_lock:
+        if path not in _resident:
+            _resident[path] = sqlite3.connect(path, uri=True, check_same_thread=False)
+
+
+def _keep_databases_resident() -> None:
+    for shard in range(SHARD_COUNT):
+        _keep_resident(shard_path(shard))
+    _keep_resident(ARCHIVE_DATABASE_PATH)
+
+
+def drop_database(path: str) -> None:
+    """Let an in-memory database be freed once no other connection uses it (no-op for files)."""
+    with _resident_lock:
+        conn = _resident.pop(path, None)
+    if conn is not None:
+        conn.close()
+
+
+def database_exists(path: str) -> bool:
+    """Whether the database has been created: the file exists, or the in-memory database has a schema."""
+    if not is_memory_database(path):
+        return os.path.exists(path)
+    with _resident_lock:
+        conn = _resident.get(path)
+        return conn is not None and conn.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchone() is not None
+
+
+def connect_read_only(path: str, **kwargs) -> sqlite3.Connection:
+    """A connection that cannot write to the database at path."""
+    if path.startswith("file:"):
+        conn = sqlite3.connect(path, uri=True, **kwargs)
+        conn.execute("PRAGMA query_only = ON")
+        return conn
+    return sqlite3.connect(f"file:{path}?mode=ro", uri=True, **kwargs)
+
+
+def clone_database(source: str, target: str) -> None:
+    """
+    Copy the database at source to target (replacing its content) with SQLite's backup API.
+    Copying a migrated template, e.g. into a fresh in-memory database per test, is far
+    cheaper than running every migration again.
+    """
+    _keep_resident(target)
+    src = sqlite3.connect(source, uri=True)
+    dst = sqlite3.connect(target, uri=True)
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+
+
+def on_switch(callback: Callable[[], None]) -> None:
+    """Call callback() after use_database() pointed the process at another database."""
+    _switch_handlers.append(callback)
+
+
+def use_database(path: str, archive_path: Optional[str] = None) -> None:
+    """
+    Point this process at another database, its shards and an order archive (by default
+    next to it): connections opened from now on use them. Pooled connections to the
+    previous database are closed and on_switch() callbacks drop what was cached from
+    it. For tests, which run each test on its own copy of a migrated template.
+    """
+    global DATABASE_PATH, ARCHIVE_DATABASE_PATH
+    with _pool_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close_all()
+    DATABASE_PATH = path
+    ARCHIVE_DATABASE_PATH = archive_path or default_archive_path(path)
+    _keep_databases_resident()
+    for callback in _switch_handlers:
+        callback()
+
+
+_keep_databases_resident()
+
+
+_statement_traces: list[list[str]] = []
+_TRANSACTION_CONTROL = ("BEGIN", "COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE")
+
+
+def _record_statement(sql: str) -> None:
+    if sql.lstrip().upper().startswith(_TRANSACTION_CONTROL):
+        return
+    for trace in _statement_traces:
+        trace.append(sql)
+
+
+class _TracedCursor:
+    """Cursor proxy that records each statement it is asked to run."""
+
+    def __init__(self, cursor: sqlite3.Cursor):
+        self._cursor = cursor
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def execute(self, sql, parameters=()):
+        _record_statement(sql)
+        self._cursor.execute(sql, parameters)
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        _record_statement(sql)
+        self._cursor.executemany(sql, seq_of_parameters)
+        return self
+
+    def executescript(self, script):
+        _record_statement(script)
+        self._cursor.executescript(script)
+        return self
+
+
+class _TracedConnection:
+    """
+    Connection proxy handed out by get_db() while trace_statements() is active.
+    Statements are recorded per execute call, not from SQLite's trace hook,
+    which reports trigger bodies as repeats of the statement that fired them.
+    """
+
+    def __init__(self, conn: sqlite3.Connection):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self) -> _TracedCursor:
+        return _TracedCursor(self._conn.cursor())
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, script):
+        return self.cursor().executescript(script)
+
+
 @contextmanager
-def get_db() -> Generator[sqlite3.Connection, None, None]:
-    """Context manager for database connections."""
-    conn = get_connection()
+def trace_statements() -> Generator[list[str], None, None]:
+    """
+    Collect the SQL statements run through get_db() while the block is active
+    (transaction control and trigger bodies excluded). For tests and profiling.
+    """
+    trace: list[str] = []
+    _statement_traces.append(trace)
     try:
-        yield conn
+        yield trace
+    finally:
+        _statement_traces.remove(trace)
+
+
+@contextmanager
+def get_db(user_id: Optional[int] = None, shard: Optional[int] = None) -> Generator[sqlite3.Connection, None, None]:
+    """
+    Context manager for database connections (borrowed from the pool). Pass user_id for
+    a user's rows (users, carts, idempotency keys) and shard to address one shard; the
+    default is shard 0, where the catalog and other unsharded tables are read.
+    """
+    if shard is None:
+        shard = 0 if user_id is None else shard_for_user(user_id)
+    pool = get_pool(shard)
+    conn = pool.acquire()
+    try:
+        yield _TracedConnection(conn) if _statement_traces else conn
         conn.commit()
-    except Exception:
+    except BaseException:
         conn.rollback()
         raise
     finally:
-        conn.close()
+        pool.release(conn)
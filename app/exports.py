@@ -0,0 +1,142 @@
+"""
+Streaming NDJSON exports for bulk consumers (feed generator, BI sync).
+
+Rows are read from one cursor with fetchmany(EXPORT_CHUNK_SIZE) and each chunk is
+serialized and yielded before the next is fetched, so memory use does not grow
+with table size. Every record carries its id, in ascending order; an interrupted
+download resumes with ?after=<last id received>. Orders include those moved to
+the archive database by app.maintenance.
+"""
+
+import heapq
+import json
+import os
+import sqlite3
+from contextlib import ExitStack
+from typing import Iterator, Optional
+
+from app import database
+from app.database import SHARD_COUNT, connect_read_only, database_exists, get_db
+from app.money import from_cents
+
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "500"))
+
+
+def _line(record: dict) -> str:
+    return json.dumps(record, separators=(",", ":")) + "\n"
+
+
+def iter_products(after: int = 0) -> Iterator[str]:
+    """NDJSON chunks of products with id > after."""
+    with get_db() as conn:
+        cursor = conn.execute(
+            "SELECT id, name, price_cents FROM products WHERE id > ? ORDER BY id",
+            (after,),
+        )
+        while True:
+            rows = cursor.fetchmany(EXPORT_CHUNK_SIZE)
+            if not rows:
+                return
+            yield "".join(
+                _line({"id": row["id"], "name": row["name"], "price": from_cents(row["price_cents"])})
+                for row in rows
+            )
+
+
+def _order_rows(cursor: sqlite3.Cursor) -> Iterator[sqlite3.Row]:
+    while True:
+        rows = cursor.fetchmany(EXPORT_CHUNK_SIZE)
+        if not rows:
+            return
+        yield from rows
+
+
+def _open_archive() -> Optional[sqlite3.Connection]:
+    """Read-only connection to the order archive, if app.maintenance has created one."""
+    if not database_exists(database.ARCHIVE_DATABASE_PATH):
+        return None
+    conn = connect_read_only(database.ARCHIVE_DATABASE_PATH, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def iter_orders(after: int = 0) -> Iterator[str]:
+    """
+    NDJSON chunks of checked-out carts (orders) with id > after, one line per order with its items.
+    Item prices are the snapshot taken when the line was added to the cart. Orders of every
+    shard and those moved to the archive database are merged by id.
+    """
+    archive = _open_archive()
+    try:
+        with ExitStack() as stack:
+            streams = []
+            for shard in range(SHARD_COUNT):
+                conn = stack.enter_context(get_db(shard=shard))
+                streams.append(
+                    _order_rows(
+                        conn.execute(
+                            """
+                            SELECT c.id AS order_id, c.user_id, c.total_cents, ci.id AS item_id,
+                                   ci.product_id, ci.quantity, ci.product_name, ci.unit_price_cents
+                            FROM cart c
+                            LEFT JOIN cart_items ci ON ci.cart_id = c.id
+                            WHERE c.status = 'checked_out' AND c.id > ?
+                            ORDER BY c.id, ci.id
+                            """,
+                            (after,),
+                        )
+                    )
+                )
+            if archive is not None:
+                streams.append(
+                    _order_rows(
+                        archive.execute(
+                            """
+                            SELECT o.id AS order_id, o.user_id, o.total_cents, oi.id AS item_id,
+                                   oi.product_id, oi.quantity, oi.product_name, oi.unit_price_cents
+                            FROM orders o
+                            LEFT JOIN order_items oi ON oi.order_id = o.id
+                            WHERE o.id > ?
+                            ORDER BY o.id, oi.id
+                            """,
+                            (after,),
+                        )
+                    )
+                )
+            order: Optional[dict] = None
+            last_key = None
+            lines = []
+            for row in heapq.merge(*streams, key=lambda r: (r["order_id"], r["item_id"] or 0)):
+                key = (row["order_id"], row["item_id"])
+                if key == last_key:
+                    # Archived while the export was running: the same line read from both databases.
+                    continue
+                last_key = key
+                if order is None or order["id"] != row["order_id"]:
+                    if order is not None:
+                        lines.append(_line(order))
+                        if len(lines) >= EXPORT_CHUNK_SIZE:
+                            yield "".join(lines)
+                            lines = []
+                    order = {
+                        "id": row["order_id"],
+                        "user_id": row["user_id"],
+                        "total": from_cents(row["total_cents"]),
+                        "items": [],
+                    }
+                if row["product_id"] is not None:
+                    order["items"].append(
+                        {
+                            "product_id": row["product_id"],
+                            "product_name": row["product_name"],
+                            "price": from_cents(row["unit_price_cents"]),
+                            "quantity": row["quantity"],
+                        }
+                    )
+            if order is not None:
+                lines.append(_line(order))
+            if lines:
+                yield "".join(lines)
+    finally:
+        if archive is not None:
+            archive.close()
@@ -0,0 +1,104 @@
+"""
+Guest carts: anonymous carts carried by the client in a signed token, not stored.
+
+Most cart traffic is anonymous shoppers adding items. Instead of a user row and
+cart rows per click, a guest cart is its list of (product_id, quantity) lines
+signed with the JWT secret (HS256, see app.auth) and handed back to the client
+on every change. Guest cart requests write nothing to the database. Names and
+prices come from the catalog cache each time the cart is shown, so they follow
+the catalog until the cart is merged into a user's cart at login (in one
+transaction, see merge(); lines short of stock are left out). From then on the
+lines hold a snapshot like any cart line.
+
+A token expires GUEST_CART_TTL_DAYS after the last change and holds at most
+GUEST_CART_MAX_LINES lines, which keeps it small enough for a cookie. Every token
+of a cart carries the cart's id (jti); the merge records it, so a replayed token
+(a retried login, a second tab) merges nothing.
+"""
+
+import os
+import time
+import uuid
+from datetime import timedelta
+from typing import Optional
+
+from app import catalog, repositories
+from app.auth import create_access_token, decode_access_token
+from app.cart_cache import cart_cache
+from app.money import from_cents
+
+GUEST_CART_TTL_DAYS = float(os.getenv("GUEST_CART_TTL_DAYS", "30"))
+GUEST_CART_MAX_LINES = int(os.getenv("GUEST_CART_MAX_LINES", "50"))
+# Payload "typ": a guest cart token is not an access token (it has no "sub") and vice versa.
+TOKEN_TYPE = "guest_cart"
+
+
+class InvalidGuestCart(Exception):
+    """The guest cart token is malformed, forged or expired."""
+
+
+def encode(lines: dict[int, int], cart_id: Optional[str] = None) -> str:
+    """Signed token for a guest cart's lines (product id -> quantity); a new cart id unless given."""
+    payload = {
+        "typ": TOKEN_TYPE,
+        "jti": cart_id or uuid.uuid4().hex,
+        "lines": [[product_id, quantity] for product_id, quantity in lines.items()],
+    }
+    return create_access_token(payload, timedelta(days=GUEST_CART_TTL_DAYS))
+
+
+def read(token: Optional[str]) -> tuple[Optional[str], dict[int, int]]:
+    """The cart id and lines (product id -> quantity) of a guest cart token; (None, {}) without one."""
+    if not token:
+        return None, {}
+    payload = decode_access_token(token)
+    if payload is None or payload.get("typ") != TOKEN_TYPE or not isinstance(payload.get("jti"), str):
+        raise InvalidGuestCart()
+    try:
+        lines = {int(product_id): int(quantity) for product_id, quantity in payload["lines"]}
+    except (KeyError, TypeError, ValueError):
+        raise InvalidGuestCart()
+    if len(lines) > GUEST_CART_MAX_LINES or any(quantity < 1 for quantity in lines.values()):
+        raise InvalidGuestCart()
+    return payload["jti"], lines
+
+
+def view(lines: dict[int, int]) -> dict:
+    """The cart in the shape of GET /cart, priced from the catalog. Products removed since are left out."""
+    items = []
+    total_cents = 0
+    for product_id, quantity in lines.items():
+        product = catalog.get_product(product_id)
+        if product is None:
+            continue
+        subtotal_cents = product["price_cents"] * quantity
+        total_cents += subtotal_cents
+        items.append(
+            {
+                "product_id": product_id,
+                "product_name": product["name"],
+                "price": product["price"],
+                "quantity": quantity,
+                "subtotal": from_cents(subtotal_cents),
+            }
+        )
+    return {"items": items, "total": from_cents(total_cents), "status": "guest"}
+
+
+def merge(user_id: int, token: str) -> tuple[int, list[int]]:
+    """
+    Add a guest cart's lines to the user's active cart in one transaction (quantities of
+    products already there are added up). Returns the lines merged and the product ids
+    left out because their units could not be reserved; (0, []) if the cart was merged
+    before. Raises InvalidGuestCart.
+    """
+    cart_id, lines = read(token)
+    if not lines:
+        return 0, []
+    # A merged cart id is kept as long as any token of the cart can still be valid.
+    now = time.time()
+    merged, short = repositories.carts.merge_lines(
+        user_id, list(lines.items()), cart_id, now, now - GUEST_CART_TTL_DAYS * 86400
+    )
+    cart_cache.invalidate(user_id)
+    return merged, short
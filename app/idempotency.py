@@ -0,0 +1,153 @@
+"""
+Idempotency-Key support for retried writes (cart adds, checkout).
+
+The first response to a write sent with an ``Idempotency-Key`` header is stored
+per user in idempotency_keys (through app.repositories), in the same transaction
+as the write itself, and kept in an in-process LRU for IDEMPOTENCY_TTL_SECONDS.
+A retry with the same key and the same request is answered from the LRU (or, in
+another worker, with one SELECT) and writes nothing. Reusing a key for a
+different request is a 422.
+
+Concurrent duplicates in one worker are coalesced with single-flight; duplicates
+racing in different workers are settled by the table's primary key: the loser's
+transaction rolls back and it replays the winner's response.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+from fastapi import HTTPException, status
+
+from app import metrics, repositories
+from app.database import on_switch
+from app.repositories import Store
+from app.singleflight import SINGLEFLIGHT_TIMEOUT_SECONDS, SingleFlight, SingleFlightTimeout
+
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+MAX_KEY_LENGTH = 255
+# Expired rows are deleted by every this-many-th stored response.
+_PRUNE_EVERY = 1000
+
+# (user_id, key) -> (fingerprint, response, expires_at)
+_cache: OrderedDict[tuple[int, str], tuple[str, dict, float]] = OrderedDict()
+_lock = threading.Lock()
+_flight = SingleFlight("idempotency")
+_stores = 0
+
+
+class _KeyTaken(Exception):
+    """Another request stored a response for this key first."""
+
+
+def fingerprint(operation: str, payload: dict) -> str:
+    """Digest of the operation and its request body; a key may only be replayed for the same request."""
+    data = json.dumps([operation, payload], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def _remember(user_id: int, key: str, digest: str, response: dict, expires_at: float) -> None:
+    with _lock:
+        _cache[(user_id, key)] = (digest, response, expires_at)
+        _cache.move_to_end((user_id, key))
+        while len(_cache) > IDEMPOTENCY_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def _lookup(user_id: int, key: str) -> Optional[tuple[str, dict]]:
+    """Stored (fingerprint, response) for the key, if not expired."""
+    now = time.time()
+    with _lock:
+        entry = _cache.get((user_id, key))
+        if entry is not None and entry[2] > now:
+            _cache.move_to_end((user_id, key))
+            return entry[0], entry[1]
+    stored = repositories.idempotency_keys.find(user_id, key, now - IDEMPOTENCY_TTL_SECONDS)
+    if stored is None:
+        return None
+    digest, response, created_at = stored
+    _remember(user_id, key, digest, response, created_at + IDEMPOTENCY_TTL_SECONDS)
+    return digest, response
+
+
+def _replay(user_id: int, key: str, digest: str) -> Optional[dict]:
+    stored = _lookup(user_id, key)
+    if stored is None:
+        return None
+    if stored[0] != digest:
+        metrics.inc("idempotency.mismatches")
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Idempotency-Key was already used for a different request",
+        )
+    metrics.inc("idempotency.replays")
+    return stored[1]
+
+
+def run_idempotent(
+    user_id: int, key: Optional[str], digest: str, write: Callable[[Store], dict]
+) -> tuple[dict, bool]:
+    """
+    Run write(store) at most once per (user, key) within the TTL. The write must call
+    store(tx, response) inside its transaction. Returns (response, replayed).
+    """
+    if key is None:
+        return write(lambda tx, response: None), False
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters",
+        )
+
+    def attempt() -> tuple[dict, bool, int]:
+        leader = threading.get_ident()
+        response = _replay(user_id, key, digest)
+        if response is not None:
+            return response, True, leader
+        now = time.time()
+
+        def store(tx: Any, response: dict) -> None:
+            global _stores
+            expired_before = now - IDEMPOTENCY_TTL_SECONDS
+            # An expired row for the key may be overwritten; a live one means we lost a race.
+            if not repositories.idempotency_keys.save(tx, user_id, key, digest, response, now, expired_before):
+                raise _KeyTaken()
+            _stores += 1
+            if _stores % _PRUNE_EVERY == 0:
+                repositories.idempotency_keys.prune(tx, expired_before)
+
+        try:
+            response = write(store)
+        except _KeyTaken:
+            # The write was rolled back; answer like a retry of the winning request.
+            response = _replay(user_id, key, digest)
+            if response is None:
+                raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Idempotency-Key is in use, retry")
+            return response, True, leader
+        _remember(user_id, key, digest, response, now + IDEMPOTENCY_TTL_SECONDS)
+        return response, False, leader
+
+    try:
+        response, replayed, leader = _flight.do((user_id, key, digest), attempt, SINGLEFLIGHT_TIMEOUT_SECONDS)
+    except SingleFlightTimeout as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+    # Coalesced duplicates received the leader's response without running the write.
+    if leader != threading.get_ident():
+        metrics.inc("idempotency.coalesced")
+        replayed = True
+    return response, replayed
+
+
+def clear_cache() -> None:
+    """Drop the in-process LRU (the table stays authoritative)."""
+    with _lock:
+        _cache.clear()
+
+
+# Responses cached from the previous database were not stored in the new one.
+on_switch(clear_cache)
@@ -0,0 +1,246 @@
+"""
+Cross-worker cache invalidation bus.
+
+Each uvicorn worker keeps its own in-process caches (catalog, cart views). A
+write handled by one worker must also evict the copies held by the others, with
+no external broker, so the database itself is the bus:
+
+- Writers call publish() inside their write transaction, appending a row to
+  _cache_events. The event commits (or rolls back) atomically with the change.
+- Every worker runs a poller thread that checks ``PRAGMA data_version`` every
+  CACHE_BUS_POLL_SECONDS (a cheap, file-local check that changes only when another
+  connection commits) and, when it changed, reads the new events and calls the
+  subscribed callbacks. Events published by this worker are skipped: its caches
+  were already invalidated by the writer.
+
+Staleness is bounded: cache readers call ensure_fresh(), which polls synchronously
+if no poll has started within CACHE_MAX_STALENESS_SECONDS (e.g. the poller thread
+is starved). A worker that falls further behind than the event retention, or
+cannot read the log, drops its caches entirely. Invalidation lag (commit to
+eviction in this worker) is recorded as the cache_bus.invalidation_lag_seconds timing.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Callable, Iterable, Optional
+
+from app import metrics
+from app.database import SHARD_COUNT, STORAGE_BACKEND, get_connection, on_switch
+
+logger = logging.getLogger(__name__)
+
+CACHE_BUS_POLL_SECONDS = float(os.getenv("CACHE_BUS_POLL_SECONDS", "0.05"))
+CACHE_MAX_STALENESS_SECONDS = float(os.getenv("CACHE_MAX_STALENESS_SECONDS", "1.0"))
+CACHE_EVENTS_RETENTION_SECONDS = float(os.getenv("CACHE_EVENTS_RETENTION_SECONDS", "300"))
+
+_origin: tuple[int, str] = (0, "")
+
+
+def worker_origin() -> str:
+    """Identifier of this worker process (regenerated after a fork)."""
+    global _origin
+    pid = os.getpid()
+    if _origin[0] != pid:
+        _origin = (pid, f"{pid}-{uuid.uuid4().hex[:8]}")
+    return _origin[1]
+
+
+def publish(conn: sqlite3.Connection, topic: str, key: Optional[int] = None) -> None:
+    """Record an invalidation event in the caller's (uncommitted) transaction."""
+    publish_many(conn, topic, [key])
+
+
+def publish_many(conn: sqlite3.Connection, topic: str, keys: Iterable[Optional[int]]) -> None:
+    """Record one invalidation event per key in the caller's transaction."""
+    origin, now = worker_origin(), time.time()
+    conn.executemany(
+        "INSERT INTO _cache_events (topic, key, origin, created_at) VALUES (?, ?, ?, ?)",
+        ((topic, key, origin, now) for key in keys),
+    )
+
+
+class _ShardLog:
+    """Read position in one shard's _cache_events."""
+
+    def __init__(self, shard: int):
+        self.shard = shard
+        self.conn: Optional[sqlite3.Connection] = None
+        self.data_version: Optional[int] = None
+        self.last_id: Optional[int] = None
+
+    def close(self) -> None:
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+class InvalidationBus:
+    def __init__(self, poll_interval: float, max_staleness: float, retention: float):
+        self.poll_interval = poll_interval
+        self.max_staleness = max_staleness
+        self.retention = retention
+        self._subscribers: dict[str, list[Callable[[Optional[int]], None]]] = defaultdict(list)
+        self._reset_handlers: list[Callable[[], None]] = []
+        self._lock = threading.Lock()
+        # The memory backend lives in one process: there are no other workers to hear from.
+        self.enabled = STORAGE_BACKEND == "sqlite"
+        # Writers publish into their own shard, so every shard's log is read.
+        self._logs = [_ShardLog(shard) for shard in range(SHARD_COUNT)]
+        # Monotonic start time of the last successful poll: every commit before it has been seen.
+        self._last_poll = 0.0
+        self._last_prune = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def subscribe(self, topic: str, callback: Callable[[Optional[int]], None]) -> None:
+        """Call callback(key) for each event on topic published by another worker."""
+        self._subscribers[topic].append(callback)
+
+    def on_reset(self, callback: Callable[[], None]) -> None:
+        """Call callback() when this worker may have missed events and must drop everything."""
+        self._reset_handlers.append(callback)
+
+    def poll(self) -> int:
+        """Apply events committed by other workers since the last poll. Returns the number applied."""
+        with self._lock:
+            started = time.monotonic()
+            try:
+                applied = self._poll_locked(started)
+            except sqlite3.Error:
+                logger.exception("Reading cache invalidation events failed")
+                metrics.inc("cache_bus.poll_errors")
+                self._close()
+                self._reset()
+                return 0
+            self._last_poll = started
+            return applied
+
+    def ensure_fresh(self) -> None:
+        """Called before serving from a cache: poll now if the last poll is older than max_staleness."""
+        if self.enabled and time.monotonic() - self._last_poll > self.max_staleness:
+            metrics.inc("cache_bus.sync_polls")
+            self.poll()
+
+    def start(self) -> None:
+        """Start the poller thread (idempotent; no-op when disabled)."""
+        if not self.enabled or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="cache-bus", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        with self._lock:
+            self._close()
+
+    def stats(self) -> dict:
+        return {
+            "running": self._thread is not None and self._thread.is_alive(),
+            "last_event_id": self._last_event_id(),
+            "seconds_since_poll": round(time.monotonic() - self._last_poll, 3) if self._last_poll else None,
+        }
+
+    def switch_database(self) -> None:
+        """Start over on the database use_database() switched to: new log positions, empty caches."""
+        with self._lock:
+            self._close()
+            for log in self._logs:
+                log.last_id = None
+                log.data_version = None
+            self._last_poll = 0.0
+            self._reset()
+
+    def _run(self) -> None:
+        self.poll()
+        while not self._stop.wait(self.poll_interval):
+            self.poll()
+            if time.monotonic() - self._last_prune > self.retention / 10:
+                self._prune()
+
+    def _last_event_id(self) -> Optional[int]:
+        ids = [log.last_id for log in self._logs if log.last_id is not None]
+        return max(ids) if ids else None
+
+    def _poll_locked(self, started: float) -> int:
+        behind = self._last_poll and started - self._last_poll > self.retention
+        if behind:
+            # Fell behind pruning: events may be lost, so drop the caches and start over.
+            self._reset()
+        applied = sum(self._poll_log(log, started, behind) for log in self._logs)
+        if applied:
+            metrics.inc("cache_bus.events_applied", applied)
+        metrics.set_gauge("cache_bus.last_event_id", self._last_event_id())
+        return applied
+
+    def _poll_log(self, log: _ShardLog, started: float, behind: bool) -> int:
+        if log.conn is None:
+            log.conn = get_connection(log.shard)
+            log.data_version = None
+        conn = log.conn
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if log.last_id is None or behind:
+            # First poll (caches start empty) or after a reset: start from the log head.
+            log.last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM _cache_events").fetchone()[0]
+            log.data_version = version
+            return 0
+        if version == log.data_version:
+            return 0
+        log.data_version = version
+        rows = conn.execute(
+            "SELECT id, topic, key, origin, created_at FROM _cache_events WHERE id > ? ORDER BY id",
+            (log.last_id,),
+        ).fetchall()
+        origin, now = worker_origin(), time.time()
+        applied = 0
+        for row in rows:
+            log.last_id = row["id"]
+            if row["origin"] == origin:
+                continue
+            for callback in self._subscribers.get(row["topic"], ()):
+                try:
+                    callback(row["key"])
+                except Exception:
+                    logger.exception("Cache invalidation callback for %s failed", row["topic"])
+            applied += 1
+            metrics.observe("cache_bus.invalidation_lag_seconds", max(now - row["created_at"], 0.0))
+        return applied
+
+    def _prune(self) -> None:
+        """Delete events older than the retention window (any worker may do it)."""
+        self._last_prune = time.monotonic()
+        with self._lock:
+            for log in self._logs:
+                if log.conn is None:
+                    continue
+                try:
+                    log.conn.execute(
+                        "DELETE FROM _cache_events WHERE created_at < ?", (time.time() - self.retention,)
+                    )
+                    log.conn.commit()
+                except sqlite3.Error:
+                    logger.exception("Pruning cache invalidation events failed")
+
+    def _reset(self) -> None:
+        metrics.inc("cache_bus.resets")
+        for callback in self._reset_handlers:
+            try:
+                callback()
+            except Exception:
+                logger.exception("Cache reset callback failed")
+
+    def _close(self) -> None:
+        for log in self._logs:
+            log.close()
+
+
+bus = InvalidationBus(CACHE_BUS_POLL_SECONDS, CACHE_MAX_STALENESS_SECONDS, CACHE_EVENTS_RETENTION_SECONDS)
+on_switch(bus.switch_database)
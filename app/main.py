@@ -1,15 +1,63 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 
-from app.routes import auth_router, health_router, items_router, products_router, cart_router
+from app import concurrency, warmup
+from app.database import STORAGE_BACKEND, check_shard_count, close_pool, get_db
+from app.invalidation import bus
+from app.maintenance import scheduler
+from app.routes import (
+    admin_router,
+    auth_router,
+    cart_router,
+    guest_cart_router,
+    health_router,
+    items_router,
+    orders_router,
+    products_router,
+)
+from app.startup import FirstRequestTimer, record_app_loaded
+from app.stock import reaper
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Refuse to start if SHARD_COUNT changed since migrate.py recorded it. Size the threadpool,
+    warm up in the background (see /health/ready), start polling for cache invalidations
+    from other workers and expiring stock reservations; schedule cart maintenance
+    (SQLite storage only). Stop and close pooled connections on shutdown.
+    """
+    if STORAGE_BACKEND == "sqlite":
+        with get_db(shard=0) as conn:
+            check_shard_count(conn)
+    concurrency.configure_threadpool()
+    warmup.start_warmup()
+    bus.start()
+    if STORAGE_BACKEND == "sqlite":
+        reaper.start()
+        scheduler.start()
+    yield
+    scheduler.stop()
+    reaper.stop()
+    bus.stop()
+    close_pool()
 
-app = FastAPI(title="Backend Exercise API", version="1.0.0")
+
+app = FastAPI(title="Backend Exercise API", version="1.0.0", lifespan=lifespan)
+app.add_middleware(FirstRequestTimer)
 
 # Register routers
 app.include_router(health_router)
 app.include_router(auth_router)
 app.include_router(products_router)
+app.include_router(guest_cart_router)
 app.include_router(cart_router)
 app.include_router(items_router)
+app.include_router(orders_router)
+app.include_router(admin_router)
+
+record_app_loaded()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,289 @@
+"""
+Scheduled cart maintenance: purge idle carts, archive order history, reclaim space.
+
+cart and cart_items would otherwise only grow, filling indexes and the page
+cache with cold rows. Every CART_MAINTENANCE_INTERVAL_SECONDS a background
+thread in each worker runs one pass:
+
+1. Expire: active carts idle (no change, see cart.updated_at) for longer than
+   CART_IDLE_TTL_SECONDS, and carts already marked abandoned, are deleted with
+   their lines; units they still reserve go back to stock. Users of expired
+   active carts get an empty cart.
+2. Archive: checked-out carts older than CART_ARCHIVE_AFTER_SECONDS are copied
+   to the archive database (ARCHIVE_DATABASE_PATH, ATTACHed for the pass) as
+   orders/order_items and deleted from the live tables. The orders export reads
+   both databases.
+3. Vacuum: freed pages are returned to the OS with PRAGMA incremental_vacuum.
+
+All work is done in batches of CART_MAINTENANCE_BATCH_SIZE carts, one short
+transaction each, with CART_MAINTENANCE_PAUSE_SECONDS between batches so live
+writers interleave. Batches are idempotent (archive rows keep their ids and are
+inserted with ON CONFLICT DO NOTHING), so concurrent passes from several workers,
+or a pass interrupted between the two databases' commits, are harmless.
+
+Usage:
+    python -m app.maintenance
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from app import database, metrics
+from app.cart_cache import cart_cache
+from app.database import SHARD_COUNT, get_connection
+from app.invalidation import publish_many
+from app.stock import release_cart_reservations
+
+logger = logging.getLogger(__name__)
+
+# 0 disables the scheduler (passes can still be run from the CLI or the admin API).
+CART_MAINTENANCE_INTERVAL_SECONDS = float(os.getenv("CART_MAINTENANCE_INTERVAL_SECONDS", "3600"))
+CART_IDLE_TTL_SECONDS = int(os.getenv("CART_IDLE_TTL_SECONDS", str(30 * 86400)))
+CART_ARCHIVE_AFTER_SECONDS = int(os.getenv("CART_ARCHIVE_AFTER_SECONDS", str(7 * 86400)))
+CART_MAINTENANCE_BATCH_SIZE = int(os.getenv("CART_MAINTENANCE_BATCH_SIZE", "500"))
+CART_MAINTENANCE_PAUSE_SECONDS = float(os.getenv("CART_MAINTENANCE_PAUSE_SECONDS", "0.05"))
+# Pages freed per incremental_vacuum step (one short write each).
+VACUUM_STEP_PAGES = int(os.getenv("VACUUM_STEP_PAGES", "1000"))
+
+
+def ensure_archive_schema(conn: sqlite3.Connection, schema: str = "archive") -> None:
+    """Create the archive tables in the given (attached) schema if they don't exist."""
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {schema}.orders (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            total_cents INTEGER NOT NULL,
+            checked_out_at INTEGER,
+            archived_at INTEGER NOT NULL
+        )
+    """)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {schema}.order_items (
+            id INTEGER PRIMARY KEY,
+            order_id INTEGER NOT NULL,
+            product_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL,
+            product_name TEXT NOT NULL,
+            unit_price_cents INTEGER NOT NULL
+        )
+    """)
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_order_items_order_id ON order_items (order_id, id)")
+
+
+def _pause(pause: float) -> None:
+    if pause > 0:
+        time.sleep(pause)
+
+
+def expire_idle_carts(
+    conn: sqlite3.Connection, idle_ttl: int, batch_size: int, pause: float, now: Optional[int] = None
+) -> tuple[int, int]:
+    """Delete idle active carts and abandoned carts with their lines. Returns (carts, lines) deleted."""
+    cutoff = (int(time.time()) if now is None else now) - idle_ttl
+    carts = lines = 0
+    while True:
+        # The cart goes first, so the line triggers find no cart to keep current.
+        rows = conn.execute(
+            """
+            DELETE FROM cart WHERE id IN (
+                SELECT id FROM cart WHERE status = 'abandoned'
+                UNION ALL
+                SELECT id FROM cart WHERE status = 'active' AND updated_at < ?
+                LIMIT ?
+            )
+            RETURNING id, user_id, status
+            """,
+            (cutoff, batch_size),
+        ).fetchall()
+        if rows:
+            cart_ids = [row["id"] for row in rows]
+            lines += conn.execute(
+                "DELETE FROM cart_items WHERE cart_id IN (SELECT value FROM json_each(?))", (json.dumps(cart_ids),)
+            ).rowcount
+            # Units still held for these carts go back on sale with the purge, not at the next reaper pass.
+            release_cart_reservations(conn, cart_ids)
+            users = [row["user_id"] for row in rows if row["status"] == "active"]
+            publish_many(conn, "cart", users)
+        conn.commit()
+        for row in rows:
+            if row["status"] == "active":
+                cart_cache.invalidate(row["user_id"])
+        carts += len(rows)
+        if len(rows) < batch_size:
+            return carts, lines
+        _pause(pause)
+
+
+def archive_orders(
+    conn: sqlite3.Connection, archive_after: int, batch_size: int, pause: float, now: Optional[int] = None
+) -> tuple[int, int]:
+    """Move old checked-out carts to the attached archive. Returns (orders, lines) moved."""
+    now = int(time.time()) if now is None else now
+    cutoff = now - archive_after
+    orders = lines = 0
+    while True:
+        ids = [
+            row["id"]
+            for row in conn.execute(
+                "SELECT id FROM cart WHERE status = 'checked_out' AND updated_at < ? ORDER BY updated_at LIMIT ?",
+                (cutoff, batch_size),
+            )
+        ]
+        if not ids:
+            return orders, lines
+        batch = json.dumps(ids)
+        # Copy and delete in separate transactions. One transaction spanning the attached
+        # databases is not atomic in WAL mode: main may commit before the archive, and a
+        # crash in between would lose the orders. Committing the copy first means a crash
+        # leaves them in both databases, and the next pass skips the copy and deletes.
+        conn.execute(
+            """
+            INSERT INTO archive.orders (id, user_id, total_cents, checked_out_at, archived_at)
+            SELECT id, user_id, total_cents, updated_at, ? FROM cart WHERE id IN (SELECT value FROM json_each(?))
+            ON CONFLICT (id) DO NOTHING
+            """,
+            (now, batch),
+        )
+        conn.execute(
+            """
+            INSERT INTO archive.order_items (id, order_id, product_id, quantity, product_name, unit_price_cents)
+            SELECT id, cart_id, product_id, quantity, product_name, unit_price_cents
+            FROM cart_items WHERE cart_id IN (SELECT value FROM json_each(?))
+            ON CONFLICT (id) DO NOTHING
+            """,
+            (batch,),
+        )
+        conn.commit()
+        conn.execute("DELETE FROM cart WHERE id IN (SELECT value FROM json_each(?))", (batch,))
+        lines += conn.execute(
+            "DELETE FROM cart_items WHERE cart_id IN (SELECT value FROM json_each(?))", (batch,)
+        ).rowcount
+        conn.commit()
+        orders += len(ids)
+        if len(ids) < batch_size:
+            return orders, lines
+        _pause(pause)
+
+
+def incremental_vacuum(conn: sqlite3.Connection, schema: str, pause: float) -> int:
+    """Return free pages of a database to the OS, a step at a time. Returns pages freed."""
+    freed = 0
+    while True:
+        free_pages = conn.execute(f"PRAGMA {schema}.freelist_count").fetchone()[0]
+        if free_pages == 0:
+            return freed
+        # executescript steps the pragma to completion; execute() would free a single page.
+        conn.executescript(f"PRAGMA {schema}.incremental_vacuum({VACUUM_STEP_PAGES})")
+        remaining = conn.execute(f"PRAGMA {schema}.freelist_count").fetchone()[0]
+        if remaining >= free_pages:
+            # Not in incremental auto_vacuum mode: nothing can be freed this way.
+            return freed
+        freed += free_pages - remaining
+        _pause(pause)
+
+
+_REPORT_KEYS = (
+    "expired_carts",
+    "expired_lines",
+    "expire_seconds",
+    "archived_orders",
+    "archived_lines",
+    "archive_seconds",
+    "vacuumed_pages",
+    "vacuum_seconds",
+)
+
+
+def run_maintenance(
+    idle_ttl: Optional[int] = None,
+    archive_after: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    pause: Optional[float] = None,
+    now: Optional[int] = None,
+) -> dict:
+    """Run one maintenance pass over every shard. Returns rows moved per step, pages freed and seconds spent."""
+    idle_ttl = CART_IDLE_TTL_SECONDS if idle_ttl is None else idle_ttl
+    archive_after = CART_ARCHIVE_AFTER_SECONDS if archive_after is None else archive_after
+    batch_size = batch_size or CART_MAINTENANCE_BATCH_SIZE
+    pause = CART_MAINTENANCE_PAUSE_SECONDS if pause is None else pause
+    started = time.perf_counter()
+    report = dict.fromkeys(_REPORT_KEYS, 0)
+    for shard in range(SHARD_COUNT):
+        # A dedicated connection: the archive stays attached to it only, never to pooled ones.
+        conn = get_connection(shard)
+        try:
+            conn.execute("ATTACH DATABASE ? AS archive", (database.ARCHIVE_DATABASE_PATH,))
+            conn.execute("PRAGMA archive.journal_mode = WAL")
+            ensure_archive_schema(conn)
+            conn.commit()
+
+            step_started = time.perf_counter()
+            carts, lines = expire_idle_carts(conn, idle_ttl, batch_size, pause, now)
+            report["expired_carts"] += carts
+            report["expired_lines"] += lines
+            report["expire_seconds"] += time.perf_counter() - step_started
+
+            step_started = time.perf_counter()
+            orders, lines = archive_orders(conn, archive_after, batch_size, pause, now)
+            report["archived_orders"] += orders
+            report["archived_lines"] += lines
+            report["archive_seconds"] += time.perf_counter() - step_started
+
+            step_started = time.perf_counter()
+            report["vacuumed_pages"] += incremental_vacuum(conn, "main", pause)
+            report["vacuum_seconds"] += time.perf_counter() - step_started
+        finally:
+            conn.close()
+    for key in ("expire_seconds", "archive_seconds", "vacuum_seconds"):
+        report[key] = round(report[key], 3)
+    report["seconds"] = round(time.perf_counter() - started, 3)
+
+    metrics.inc("maintenance.runs")
+    for key in ("expired_carts", "expired_lines", "archived_orders", "archived_lines", "vacuumed_pages"):
+        metrics.inc(f"maintenance.{key}", report[key])
+    metrics.observe("maintenance.run_seconds", report["seconds"])
+    return report
+
+
+class MaintenanceScheduler:
+    """Background thread running run_maintenance() every interval (disabled when the interval is 0)."""
+
+    def __init__(self, interval: float = CART_MAINTENANCE_INTERVAL_SECONDS):
+        self.interval = interval
+        self.last_report: Optional[dict] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start the scheduler thread (idempotent; the first pass runs one interval after start)."""
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="cart-maintenance", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.last_report = run_maintenance()
+            except sqlite3.Error:
+                logger.exception("Cart maintenance failed")
+                metrics.inc("maintenance.failures")
+
+
+scheduler = MaintenanceScheduler()
+
+
+if __name__ == "__main__":
+    print(json.dumps(run_maintenance(), indent=2))
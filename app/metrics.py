@@ -0,0 +1,60 @@
+"""
+In-process metrics: counters, gauges and timing summaries, exposed at GET /metrics.
+
+Values are per worker process. Everything is guarded by one lock; updates are a
+dict operation, so instrumenting hot paths is cheap.
+"""
+
+import threading
+from collections import defaultdict
+
+_lock = threading.Lock()
+_counters: dict[str, float] = defaultdict(float)
+_gauges: dict[str, float] = {}
+_timings: dict[str, dict] = {}
+
+
+def inc(name: str, value: float = 1) -> None:
+    """Increment a counter."""
+    with _lock:
+        _counters[name] += value
+
+
+def set_gauge(name: str, value: float) -> None:
+    """Set a gauge to its current value."""
+    with _lock:
+        _gauges[name] = value
+
+
+def observe(name: str, seconds: float) -> None:
+    """Record one duration sample in a timing summary (count, total, max)."""
+    with _lock:
+        timing = _timings.get(name)
+        if timing is None:
+            _timings[name] = {"count": 1, "total": seconds, "max": seconds}
+        else:
+            timing["count"] += 1
+            timing["total"] += seconds
+            if seconds > timing["max"]:
+                timing["max"] = seconds
+
+
+def get_counter(name: str) -> float:
+    """Current value of a counter (0 if never incremented)."""
+    with _lock:
+        return _counters.get(name, 0)
+
+
+def get_gauge(name: str):
+    """Current value of a gauge, or None if never set."""
+    with _lock:
+        return _gauges.get(name)
+
+
+def snapshot() -> dict:
+    """Copy of all metrics, suitable for a JSON response."""
+    with _lock:
+        timings = {
+            name: {**t, "avg": t["total"] / t["count"]} for name, t in _timings.items()
+        }
+        return {"counters": dict(_counters), "gauges": dict(_gauges), "timings": timings}
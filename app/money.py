@@ -0,0 +1,22 @@
+"""
+Money helpers. Amounts are stored and summed as integer cents; conversion to and
+from decimal amounts happens only when parsing input and serializing responses.
+"""
+
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+
+def to_cents(amount) -> int:
+    """Parse a decimal amount (str, int or float) into integer cents, rounding half up."""
+    try:
+        value = Decimal(str(amount).strip())
+    except (InvalidOperation, ValueError):
+        raise ValueError(f"invalid amount: {amount!r}")
+    if not value.is_finite():
+        raise ValueError(f"invalid amount: {amount!r}")
+    return int((value * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_cents(cents: int) -> float:
+    """Decimal amount for JSON responses (e.g. 1999 -> 19.99)."""
+    return cents / 100
@@ -0,0 +1,74 @@
+"""
+Dependency probes for GET /health/ready.
+
+Load balancers poll readiness every few seconds per worker, so the database
+probe result is cached for HEALTH_PROBE_TTL_SECONDS; between probes a
+readiness check only reads in-memory counters.
+"""
+
+import os
+import threading
+import time
+from typing import Optional
+
+from app import database, metrics
+
+HEALTH_PROBE_TTL_SECONDS = float(os.getenv("HEALTH_PROBE_TTL_SECONDS", "2"))
+
+_lock = threading.Lock()
+_cached: Optional[dict] = None
+_cached_at = 0.0
+
+
+def _probe_database() -> dict:
+    """One round-trip that touches the database file: read the last applied migration."""
+    started = time.perf_counter()
+    try:
+        with database.get_db() as conn:
+            row = conn.execute("SELECT name FROM _migrations ORDER BY id DESC LIMIT 1").fetchone()
+    except Exception as e:
+        return {"ok": False, "error": str(e), "latency_ms": None, "migration": None}
+    latency_ms = (time.perf_counter() - started) * 1000
+    metrics.observe("health.db_probe", latency_ms / 1000)
+    return {"ok": True, "error": None, "latency_ms": round(latency_ms, 3), "migration": row[0] if row else None}
+
+
+def _wal_bytes() -> int:
+    try:
+        return os.path.getsize(database.DATABASE_PATH + "-wal")
+    except OSError:
+        return 0
+
+
+def get_database_probe() -> dict:
+    """Database probe result, re-probed at most once per TTL."""
+    global _cached, _cached_at
+    with _lock:
+        if _cached is not None and time.monotonic() - _cached_at < HEALTH_PROBE_TTL_SECONDS:
+            metrics.inc("health.probe_cache_hits")
+            return _cached
+        result = {**_probe_database(), "wal_bytes": _wal_bytes()}
+        _cached, _cached_at = result, time.monotonic()
+        metrics.inc("health.probe_cache_misses")
+        return result
+
+
+def is_probe_fresh() -> bool:
+    """True if a cached database probe can be served without touching the database."""
+    return _cached is not None and time.monotonic() - _cached_at < HEALTH_PROBE_TTL_SECONDS
+
+
+def last_database_probe() -> Optional[dict]:
+    """Most recent probe result regardless of age, or None."""
+    return _cached
+
+
+def pool_status() -> dict:
+    stats = database.get_pool().stats()
+    return {**stats, "utilization": round(stats["in_use"] / stats["size"], 3) if stats["size"] else 0.0}
+
+
+def threadpool_status(limiter) -> dict:
+    """Saturation of the anyio thread limiter that runs sync handlers."""
+    in_use, limit = limiter.borrowed_tokens, limiter.total_tokens
+    return {"in_use": in_use, "limit": limit, "saturation": round(in_use / limit, 3) if limit else 0.0}
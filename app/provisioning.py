@@ -0,0 +1,165 @@
+"""
+Bulk user provisioning from CSV or JSONL (B2B onboarding).
+
+Each record has ``email`` and ``password``. Registering users one by one is
+bound by serial bcrypt, so passwords are hashed across a process pool (one
+worker per core by default) a chunk at a time, and each chunk is inserted in one
+transaction per shard. Emails that already exist, or repeat within the file, are reported
+and not hashed. A bad row is reported and skipped; it never aborts the batch.
+
+Usage:
+    python -m app.provisioning users.csv [--format csv|jsonl] [--chunk-size 1000] [--workers N]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import IO, Optional
+
+from pydantic import EmailStr, TypeAdapter, ValidationError
+
+from app.auth import hash_password
+from app.bulk_io import chunked, detect_format, iter_records
+from app.database import SHARD_COUNT, get_db, shard_for_email
+
+PROVISION_CHUNK_SIZE = int(os.getenv("PROVISION_CHUNK_SIZE", "1000"))
+PROVISION_WORKERS = int(os.getenv("PROVISION_WORKERS", str(os.cpu_count() or 1)))
+# Only the first few bad rows are reported individually.
+MAX_REPORTED_ERRORS = 100
+
+_email_adapter = TypeAdapter(EmailStr)
+
+
+def _parse_user(record: dict) -> tuple[str, str]:
+    """Validate one input record; returns (normalized email, password). Raises ValueError."""
+    if "_error" in record:
+        raise ValueError(record["_error"])
+    try:
+        email = _email_adapter.validate_python((record.get("email") or "").strip()).lower()
+    except ValidationError:
+        raise ValueError("email is not a valid email address") from None
+    password = record.get("password")
+    if not isinstance(password, str) or len(password) < 6:
+        raise ValueError("password must be at least 6 characters")
+    return email, password
+
+
+def provision_users(
+    stream: IO[str], fmt: str, chunk_size: Optional[int] = None, workers: Optional[int] = None
+) -> dict:
+    """
+    Create users from a text stream. Returns counts, reported errors, elapsed seconds
+    and users/sec. With workers=1 passwords are hashed in this process.
+    """
+    chunk_size = chunk_size or PROVISION_CHUNK_SIZE
+    workers = workers or PROVISION_WORKERS
+    started = time.perf_counter()
+    created = 0
+    failed = 0
+    errors = []
+    seen: set[str] = set()
+
+    def fail(line_num: int, message: str) -> None:
+        nonlocal failed
+        failed += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({"line": line_num, "error": message})
+
+    # spawn, not fork: the caller may be a threaded server process.
+    executor = (
+        ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        if workers > 1
+        else None
+    )
+    try:
+        for chunk in chunked(iter_records(stream, fmt), chunk_size):
+            rows = []
+            for line_num, record in chunk:
+                try:
+                    email, password = _parse_user(record)
+                except ValueError as e:
+                    fail(line_num, str(e))
+                    continue
+                if email in seen:
+                    fail(line_num, "duplicate email in input")
+                    continue
+                seen.add(email)
+                rows.append((line_num, email, password))
+
+            existing = set()
+            for shard in range(SHARD_COUNT):
+                emails = [email for _, email, _ in rows if shard_for_email(email) == shard]
+                if not emails:
+                    continue
+                with get_db(shard=shard) as conn:
+                    existing.update(
+                        row["email"]
+                        for row in conn.execute(
+                            "SELECT email FROM users WHERE email IN (SELECT value FROM json_each(?))",
+                            (json.dumps(emails),),
+                        )
+                    )
+            new_rows = []
+            for line_num, email, password in rows:
+                if email in existing:
+                    fail(line_num, "email already registered")
+                else:
+                    new_rows.append((line_num, email, password))
+            if not new_rows:
+                continue
+
+            passwords = [password for _, _, password in new_rows]
+            if executor is None:
+                hashes = [hash_password(password) for password in passwords]
+            else:
+                batch = max(1, len(passwords) // (workers * 4))
+                hashes = list(executor.map(hash_password, passwords, chunksize=batch))
+
+            # One transaction per shard touched by the chunk.
+            by_shard: dict[int, list[tuple[int, str, str]]] = {}
+            for (line_num, email, _), hashed in zip(new_rows, hashes):
+                by_shard.setdefault(shard_for_email(email), []).append((line_num, email, hashed))
+            for shard, shard_rows in sorted(by_shard.items()):
+                with get_db(shard=shard) as conn:
+                    for line_num, email, hashed in shard_rows:
+                        try:
+                            conn.execute("INSERT INTO users (email, password) VALUES (?, ?)", (email, hashed))
+                        except sqlite3.IntegrityError:
+                            # Registered concurrently since the existence check; only this row fails.
+                            fail(line_num, "email already registered")
+                        else:
+                            created += 1
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "created": created,
+        "failed": failed,
+        "errors": sorted(errors, key=lambda error: error["line"]),
+        "seconds": round(elapsed, 3),
+        "users_per_sec": round(created / elapsed, 1) if elapsed > 0 else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create users from CSV or JSONL")
+    parser.add_argument("path", help="Input file (.csv, .jsonl) with email and password columns")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="Input format (default: from extension)")
+    parser.add_argument("--chunk-size", type=int, default=None, help="Users per transaction")
+    parser.add_argument("--workers", type=int, default=None, help="Hashing processes (default: CPU count)")
+    args = parser.parse_args()
+
+    with open(args.path, newline="", encoding="utf-8") as f:
+        result = provision_users(f, args.format or detect_format(args.path), args.chunk_size, args.workers)
+    for error in result["errors"]:
+        print(f"line {error['line']}: {error['error']}")
+    print(
+        f"Created {result['created']} users ({result['failed']} failed) "
+        f"in {result['seconds']}s, {result['users_per_sec']} users/sec"
+    )
@@ -0,0 +1,71 @@
+"""
+Storage behind the routes, selected by STORAGE_BACKEND (see app.database).
+
+Routes and the catalog reach users, products, carts, items and idempotency keys
+through the module-level repositories below instead of embedding SQL, so the
+same request path runs on SQLite (production) or entirely in memory (tests,
+benchmarks separating framework overhead from storage cost). Operational jobs
+(imports, exports, maintenance, stock, backfills) work on the SQLite files directly.
+"""
+
+from app.database import STORAGE_BACKEND, on_switch
+from app.repositories.base import (
+    CartRepository,
+    DuplicateEmail,
+    IdempotencyKeyRepository,
+    ItemRepository,
+    ProductNotFound,
+    ProductRepository,
+    Store,
+    UserRepository,
+)
+
+if STORAGE_BACKEND == "memory":
+    from app.repositories.memory import (
+        MemoryCartRepository,
+        MemoryIdempotencyKeyRepository,
+        MemoryItemRepository,
+        MemoryProductRepository,
+        MemoryStore,
+        MemoryUserRepository,
+    )
+
+    memory_store = MemoryStore()
+    # Rows belong to the database in use, like the SQLite backend's (tests switch per test).
+    on_switch(memory_store.reset)
+    users: UserRepository = MemoryUserRepository(memory_store)
+    products: ProductRepository = MemoryProductRepository(memory_store)
+    carts: CartRepository = MemoryCartRepository(memory_store)
+    items: ItemRepository = MemoryItemRepository(memory_store)
+    idempotency_keys: IdempotencyKeyRepository = MemoryIdempotencyKeyRepository(memory_store)
+else:
+    from app.repositories.sqlite import (
+        SqliteCartRepository,
+        SqliteIdempotencyKeyRepository,
+        SqliteItemRepository,
+        SqliteProductRepository,
+        SqliteUserRepository,
+    )
+
+    users = SqliteUserRepository()
+    products = SqliteProductRepository()
+    carts = SqliteCartRepository()
+    items = SqliteItemRepository()
+    idempotency_keys = SqliteIdempotencyKeyRepository()
+
+__all__ = [
+    "STORAGE_BACKEND",
+    "CartRepository",
+    "DuplicateEmail",
+    "IdempotencyKeyRepository",
+    "ItemRepository",
+    "ProductNotFound",
+    "ProductRepository",
+    "Store",
+    "UserRepository",
+    "users",
+    "products",
+    "carts",
+    "items",
+    "idempotency_keys",
+]
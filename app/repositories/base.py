@@ -0,0 +1,124 @@
+"""
+Repository interfaces: the storage operations the routes need, without SQL.
+
+Rows are plain dicts with the column names of the SQLite schema; prices are
+integer cents. Write methods that take a ``store`` call ``store(tx, result)``
+once, inside their transaction, with the backend's transaction handle and the
+value they are about to return (see app.idempotency), so a response stored by
+the callback commits or rolls back with the write.
+"""
+
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Optional
+
+# store(tx, result): called by a write with its result, inside its transaction.
+Store = Callable[[Any, Any], None]
+
+
+class DuplicateEmail(Exception):
+    """A user with this email already exists."""
+
+
+class ProductNotFound(Exception):
+    """No product with this id."""
+
+
+class UserRepository(ABC):
+    @abstractmethod
+    def create(self, email: str, password_hash: str) -> int:
+        """Insert a user (email already normalized) and return its id. Raises DuplicateEmail."""
+
+    @abstractmethod
+    def get_by_email(self, email: str) -> Optional[dict]:
+        """id, email and password (hash) of the user, or None."""
+
+
+class ProductRepository(ABC):
+    @abstractmethod
+    def list_all(self) -> list[dict]:
+        """id, name and price_cents of every product, ordered by id."""
+
+
+class CartRepository(ABC):
+    @abstractmethod
+    def add_item(self, user_id: int, product_id: int, quantity: int, store: Store) -> dict:
+        """
+        Add quantity of a product to the user's active cart (created if needed), snapshotting
+        its name and price. Returns the line's id, product_id and new quantity.
+        Raises ProductNotFound, or InsufficientStock when the units cannot be reserved.
+        """
+
+    @abstractmethod
+    def merge_lines(
+        self, user_id: int, lines: list[tuple[int, int]], guest_cart_id: str, now: float, expired_before: float
+    ) -> tuple[int, list[int]]:
+        """
+        Add each (product_id, quantity) to the user's active cart, like add_item, in one
+        transaction that also records guest_cart_id as merged at now; an id recorded after
+        expired_before merges nothing (older records are pruned). Products that no longer
+        exist are skipped, and so are lines whose stock cannot be reserved. Returns the
+        number of lines added or increased and the product ids left out for lack of stock.
+        """
+
+    @abstractmethod
+    def update_item(self, user_id: int, item_id: int, quantity: int) -> bool:
+        """Set a line's quantity. False if the line is not in the user's active cart. Raises InsufficientStock."""
+
+    @abstractmethod
+    def remove_item(self, user_id: int, item_id: int) -> bool:
+        """Delete a line. False if the line is not in the user's active cart."""
+
+    @abstractmethod
+    def get_active(self, user_id: int) -> Optional[dict]:
+        """
+        The user's active cart as total_cents and lines (id, product_id, product_name,
+        unit_price_cents, quantity, in id order), or None if there is none.
+        """
+
+    @abstractmethod
+    def checkout(self, user_id: int, store: Store) -> Optional[int]:
+        """
+        Mark the active cart checked out and return its total_cents (None if there is no
+        active cart). Raises InsufficientStock, purchasing nothing, if a line is short.
+        """
+
+
+class ItemRepository(ABC):
+    @abstractmethod
+    def list_page(self, after: int, limit: int) -> list[dict]:
+        """Up to limit items (id, name) with id > after, in id order."""
+
+    @abstractmethod
+    def get(self, item_id: int) -> Optional[dict]:
+        """The item, or None."""
+
+    @abstractmethod
+    def create_many(self, names: list[str]) -> list[dict]:
+        """Insert items in one transaction; returns them (id, name) in input order."""
+
+    @abstractmethod
+    def update_many(self, items: list[tuple[int, str]]) -> list[int]:
+        """Rename (id, name) pairs in one transaction. Returns missing ids; if any, nothing is changed."""
+
+    @abstractmethod
+    def delete_many(self, item_ids: list[int]) -> list[int]:
+        """Delete items in one transaction. Returns missing ids (sorted); if any, nothing is deleted."""
+
+
+class IdempotencyKeyRepository(ABC):
+    @abstractmethod
+    def find(self, user_id: int, key: str, since: float) -> Optional[tuple[str, dict, float]]:
+        """(fingerprint, response, created_at) stored for the key after since, or None."""
+
+    @abstractmethod
+    def save(
+        self, tx: Any, user_id: int, key: str, digest: str, response: dict, now: float, expired_before: float
+    ) -> bool:
+        """
+        Store a response in the write's transaction. A row for the key created at or before
+        expired_before is overwritten; a newer one is kept and False is returned.
+        """
+
+    @abstractmethod
+    def prune(self, tx: Any, before: float) -> None:
+        """Delete keys created at or before the given time."""
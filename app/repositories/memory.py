@@ -0,0 +1,287 @@
+"""
+In-memory repositories (STORAGE_BACKEND=memory): every row in dicts of one process.
+
+For tests and benchmarks that should not pay for SQLite I/O, and to profile the
+request path without storage. All repositories share one MemoryStore and each
+operation holds its lock for its whole duration, so operations are atomic and
+serialized like SQLite write transactions. A write computes its changes, calls
+store() (which may raise) and only then applies them, so a failed write leaves
+nothing behind.
+
+The store starts with a copy of the products and items in DATABASE_PATH, if the
+file exists, taken on first use; nothing is written back. Stock tracking,
+sharding and the cross-worker invalidation bus are SQLite features: with this
+backend carts are never short of stock and there is one worker.
+"""
+
+import sqlite3
+import threading
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
+from typing import Generator, Optional
+
+from app import database
+from app.database import connect_read_only, database_exists
+from app.repositories.base import (
+    CartRepository,
+    DuplicateEmail,
+    IdempotencyKeyRepository,
+    ItemRepository,
+    ProductNotFound,
+    ProductRepository,
+    Store,
+    UserRepository,
+)
+
+
+class MemoryStore:
+    """The tables of the memory backend, guarded by one lock."""
+
+    def __init__(self, seed_path: Optional[str] = None):
+        self.seed_path = seed_path
+        self._lock = threading.RLock()
+        self._clear()
+
+    def _clear(self) -> None:
+        self.users: dict[str, dict] = {}  # by email
+        self.products: dict[int, dict] = {}
+        self.carts: dict[int, dict] = {}
+        self.active_carts: dict[int, int] = {}  # user id -> active cart id
+        self.cart_lines: dict[int, dict[int, dict]] = {}  # cart id -> product id -> line
+        self.line_keys: dict[int, tuple[int, int]] = {}  # line id -> (cart id, product id)
+        self.items: dict[int, dict] = {}
+        self.item_ids: list[int] = []  # sorted, for keyset pages
+        self.idempotency_keys: dict[tuple[int, str], tuple[str, dict, float]] = {}
+        self.guest_cart_merges: dict[str, float] = {}  # guest cart id -> merged at
+        self._last_ids: dict[str, int] = {}
+        self._seeded = False
+
+    def reset(self) -> None:
+        """Drop every row; the next operation seeds the store again (from the current DATABASE_PATH)."""
+        with self._lock:
+            self._clear()
+
+    @contextmanager
+    def transaction(self) -> Generator["MemoryStore", None, None]:
+        """Hold the store for one operation (seeding it on first use)."""
+        with self._lock:
+            if not self._seeded:
+                self._seed()
+                self._seeded = True
+            yield self
+
+    def next_id(self, table: str) -> int:
+        self._last_ids[table] = self._last_ids.get(table, 0) + 1
+        return self._last_ids[table]
+
+    def _seed(self) -> None:
+        seed_path = self.seed_path or database.DATABASE_PATH
+        if not database_exists(seed_path):
+            return
+        conn = connect_read_only(seed_path)
+        conn.row_factory = sqlite3.Row
+        try:
+            tables = {row["name"] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            if "products" in tables:
+                for row in conn.execute("SELECT id, name, price_cents FROM products ORDER BY id"):
+                    self.products[row["id"]] = dict(row)
+            if "items" in tables:
+                for row in conn.execute("SELECT id, name FROM items ORDER BY id"):
+                    self.items[row["id"]] = dict(row)
+                    self.item_ids.append(row["id"])
+        finally:
+            conn.close()
+        self._last_ids["products"] = max(self.products, default=0)
+        self._last_ids["items"] = max(self.items, default=0)
+
+
+class MemoryUserRepository(UserRepository):
+    def __init__(self, store: MemoryStore):
+        self.store = store
+
+    def create(self, email: str, password_hash: str) -> int:
+        with self.store.transaction() as db:
+            if email in db.users:
+                raise DuplicateEmail(email)
+            user_id = db.next_id("users")
+            db.users[email] = {"id": user_id, "email": email, "password": password_hash}
+        return user_id
+
+    def get_by_email(self, email: str) -> Optional[dict]:
+        with self.store.transaction() as db:
+            user = db.users.get(email)
+            return dict(user) if user is not None else None
+
+
+class MemoryProductRepository(ProductRepository):
+    def __init__(self, store: MemoryStore):
+        self.store = store
+
+    def list_all(self) -> list[dict]:
+        with self.store.transaction() as db:
+            return [dict(product) for _, product in sorted(db.products.items())]
+
+
+class MemoryCartRepository(CartRepository):
+    def __init__(self, store: MemoryStore):
+        self.store = store
+
+    def _active_line(self, db: MemoryStore, user_id: int, item_id: int) -> Optional[dict]:
+        cart_id, product_id = db.line_keys.get(item_id, (None, None))
+        if cart_id is None or db.active_carts.get(user_id) != cart_id:
+            return None
+        return db.cart_lines[cart_id][product_id]
+
+    def add_item(self, user_id: int, product_id: int, quantity: int, store: Store) -> dict:
+        with self.store.transaction() as db:
+            product = db.products.get(product_id)
+            if product is None:
+                raise ProductNotFound(product_id)
+            cart_id = db.active_carts.get(user_id)
+            line = db.cart_lines[cart_id].get(product_id) if cart_id is not None else None
+            result = {
+                "id": line["id"] if line is not None else db.next_id("cart_items"),
+                "product_id": product_id,
+                "quantity": quantity + (line["quantity"] if line is not None else 0),
+            }
+            store(db, result)
+            if cart_id is None:
+                cart_id = db.next_id("cart")
+                db.carts[cart_id] = {"id": cart_id, "user_id": user_id, "status": "active", "total_cents": 0}
+                db.active_carts[user_id] = cart_id
+                db.cart_lines[cart_id] = {}
+            if line is None:
+                # Snapshot name and price, like the SQLite cart line.
+                line = db.cart_lines[cart_id][product_id] = {
+                    "id": result["id"],
+                    "product_id": product_id,
+                    "product_name": product["name"],
+                    "unit_price_cents": product["price_cents"],
+                    "quantity": 0,
+                }
+                db.line_keys[line["id"]] = (cart_id, product_id)
+            line["quantity"] = result["quantity"]
+            db.carts[cart_id]["total_cents"] += quantity * line["unit_price_cents"]
+        return result
+
+    def merge_lines(
+        self, user_id: int, lines: list[tuple[int, int]], guest_cart_id: str, now: float, expired_before: float
+    ) -> tuple[int, list[int]]:
+        with self.store.transaction() as db:
+            merged_at = db.guest_cart_merges.get(guest_cart_id)
+            if merged_at is not None and merged_at > expired_before:
+                return 0, []
+            db.guest_cart_merges[guest_cart_id] = now
+            merged = 0
+            for product_id, quantity in lines:
+                # Held under the same lock as add_item, so the merge is one atomic operation.
+                if product_id in db.products:
+                    self.add_item(user_id, product_id, quantity, lambda tx, result: None)
+                    merged += 1
+        return merged, []
+
+    def update_item(self, user_id: int, item_id: int, quantity: int) -> bool:
+        with self.store.transaction() as db:
+            line = self._active_line(db, user_id, item_id)
+            if line is None:
+                return False
+            db.carts[db.line_keys[item_id][0]]["total_cents"] += (quantity - line["quantity"]) * line["unit_price_cents"]
+            line["quantity"] = quantity
+        return True
+
+    def remove_item(self, user_id: int, item_id: int) -> bool:
+        with self.store.transaction() as db:
+            line = self._active_line(db, user_id, item_id)
+            if line is None:
+                return False
+            cart_id, product_id = db.line_keys.pop(item_id)
+            del db.cart_lines[cart_id][product_id]
+            db.carts[cart_id]["total_cents"] -= line["quantity"] * line["unit_price_cents"]
+        return True
+
+    def get_active(self, user_id: int) -> Optional[dict]:
+        with self.store.transaction() as db:
+            cart_id = db.active_carts.get(user_id)
+            if cart_id is None:
+                return None
+            lines = sorted((dict(line) for line in db.cart_lines[cart_id].values()), key=lambda line: line["id"])
+            return {"total_cents": db.carts[cart_id]["total_cents"], "lines": lines}
+
+    def checkout(self, user_id: int, store: Store) -> Optional[int]:
+        with self.store.transaction() as db:
+            cart_id = db.active_carts.get(user_id)
+            total_cents = db.carts[cart_id]["total_cents"] if cart_id is not None else None
+            store(db, total_cents)
+            if cart_id is not None:
+                db.carts[cart_id]["status"] = "checked_out"
+                del db.active_carts[user_id]
+        return total_cents
+
+
+class MemoryItemRepository(ItemRepository):
+    def __init__(self, store: MemoryStore):
+        self.store = store
+
+    def list_page(self, after: int, limit: int) -> list[dict]:
+        with self.store.transaction() as db:
+            start = bisect_right(db.item_ids, after)
+            return [dict(db.items[item_id]) for item_id in db.item_ids[start:start + limit]]
+
+    def get(self, item_id: int) -> Optional[dict]:
+        with self.store.transaction() as db:
+            item = db.items.get(item_id)
+            return dict(item) if item is not None else None
+
+    def create_many(self, names: list[str]) -> list[dict]:
+        with self.store.transaction() as db:
+            created = []
+            for name in names:
+                # Ids only grow, so appending keeps item_ids sorted.
+                item = {"id": db.next_id("items"), "name": name}
+                db.items[item["id"]] = item
+                db.item_ids.append(item["id"])
+                created.append(dict(item))
+        return created
+
+    def update_many(self, items: list[tuple[int, str]]) -> list[int]:
+        with self.store.transaction() as db:
+            missing = [item_id for item_id, _ in items if item_id not in db.items]
+            if not missing:
+                for item_id, name in items:
+                    db.items[item_id]["name"] = name
+        return missing
+
+    def delete_many(self, item_ids: list[int]) -> list[int]:
+        with self.store.transaction() as db:
+            missing = sorted({item_id for item_id in item_ids if item_id not in db.items})
+            if not missing:
+                for item_id in set(item_ids):
+                    del db.items[item_id]
+                    del db.item_ids[bisect_left(db.item_ids, item_id)]
+        return missing
+
+
+class MemoryIdempotencyKeyRepository(IdempotencyKeyRepository):
+    def __init__(self, store: MemoryStore):
+        self.store = store
+
+    def find(self, user_id: int, key: str, since: float) -> Optional[tuple[str, dict, float]]:
+        with self.store.transaction() as db:
+            entry = db.idempotency_keys.get((user_id, key))
+        if entry is None or entry[2] <= since:
+            return None
+        return entry
+
+    def save(
+        self, tx: MemoryStore, user_id: int, key: str, digest: str, response: dict, now: float, expired_before: float
+    ) -> bool:
+        entry = tx.idempotency_keys.get((user_id, key))
+        if entry is not None and entry[2] > expired_before:
+            return False
+        tx.idempotency_keys[(user_id, key)] = (digest, response, now)
+        return True
+
+    def prune(self, tx: MemoryStore, before: float) -> None:
+        expired = [key for key, entry in tx.idempotency_keys.items() if entry[2] <= before]
+        for key in expired:
+            del tx.idempotency_keys[key]
@@ -0,0 +1,361 @@
+"""
+SQLite repositories: the production storage (DATABASE_PATH and its shards).
+
+Each method runs in one get_db() transaction on the shard of the user it
+concerns. Cart writes also reserve stock (when reservations are enabled) and
+publish the cart invalidation event in the same transaction, so other workers
+drop their cached view exactly when the change commits. A write that finds
+the user's shard short of stock gathers the missing units from the other
+shards and runs once more.
+"""
+
+import json
+import sqlite3
+from typing import Callable, Optional, TypeVar
+
+from app.database import get_db, shard_for_email, shard_for_user
+from app.invalidation import publish
+from app.repositories.base import (
+    CartRepository,
+    DuplicateEmail,
+    IdempotencyKeyRepository,
+    ItemRepository,
+    ProductNotFound,
+    ProductRepository,
+    Store,
+    UserRepository,
+)
+from app.stock import (
+    InsufficientStock,
+    cart_shortages,
+    gather_stock,
+    is_stock_shortage,
+    reservations_enabled,
+    reserve,
+)
+
+T = TypeVar("T")
+
+# Item ids only count if the line belongs to the user's active cart.
+_USER_ACTIVE_CART = "cart_id IN (SELECT id FROM cart WHERE user_id = ? AND status = 'active')"
+
+
+class SqliteUserRepository(UserRepository):
+    def create(self, email: str, password_hash: str) -> int:
+        try:
+            with get_db(shard=shard_for_email(email)) as conn:
+                # The unique indexes on email decide duplicates (an email always maps to the same shard);
+                # no SELECT first, so no check-then-insert race.
+                row = conn.execute(
+                    "INSERT INTO users (email, password) VALUES (?, ?) RETURNING id",
+                    (email, password_hash),
+                ).fetchone()
+        except sqlite3.IntegrityError:
+            raise DuplicateEmail(email) from None
+        return row["id"]
+
+    def get_by_email(self, email: str) -> Optional[dict]:
+        with get_db(shard=shard_for_email(email)) as conn:
+            row = conn.execute("SELECT id, email, password FROM users WHERE email = ?", (email,)).fetchone()
+        return dict(row) if row is not None else None
+
+
+class SqliteProductRepository(ProductRepository):
+    def list_all(self) -> list[dict]:
+        with get_db() as conn:
+            return [dict(row) for row in conn.execute("SELECT id, name, price_cents FROM products ORDER BY id")]
+
+
+def _get_or_create_active_cart(conn: sqlite3.Connection, user_id: int) -> int:
+    """Return active cart id for user; create one if none exists (one statement)."""
+    # The no-op DO UPDATE makes RETURNING yield the existing cart's id on conflict.
+    row = conn.execute(
+        """
+        INSERT INTO cart (user_id, total_cents, status) VALUES (?, 0, 'active')
+        ON CONFLICT (user_id) WHERE status = 'active' DO UPDATE SET user_id = excluded.user_id
+        RETURNING id
+        """,
+        (user_id,),
+    ).fetchone()
+    return row["id"]
+
+
+def _reserve(conn: sqlite3.Connection, cart_id: int, product_id: int, quantity: int) -> None:
+    """Hold stock for a cart line when reservations are enabled."""
+    if reservations_enabled():
+        reserve(conn, cart_id, product_id, quantity)
+
+
+def _reconcile(conn: sqlite3.Connection, cart_id: int, product_id: int, quantity: int) -> None:
+    """
+    Like _reserve() for a changed or removed line, but with reservations disabled a hold
+    left from when they were enabled is released (one lookup when there is none).
+    """
+    reserve(conn, cart_id, product_id, quantity if reservations_enabled() else 0)
+
+
+def _with_gathered_stock(user_id: int, write: Callable[[], T]) -> T:
+    """Run a stock-taking cart write; when the user's shard is short, gather the other shards' units and retry once."""
+    try:
+        return write()
+    except InsufficientStock as e:
+        if not gather_stock(shard_for_user(user_id), e.shortfalls):
+            raise
+    return write()
+
+
+class SqliteCartRepository(CartRepository):
+    def add_item(self, user_id: int, product_id: int, quantity: int, store: Store) -> dict:
+        return _with_gathered_stock(user_id, lambda: self._add_item(user_id, product_id, quantity, store))
+
+    def _add_item(self, user_id: int, product_id: int, quantity: int, store: Store) -> dict:
+        with get_db(user_id) as conn:
+            cart_id = _get_or_create_active_cart(conn, user_id)
+            # Snapshot name and price from products; no row means no such product.
+            line = conn.execute(
+                """
+                INSERT INTO cart_items (cart_id, product_id, quantity, product_name, unit_price_cents)
+                SELECT ?, id, ?, name, price_cents FROM products WHERE id = ?
+                ON CONFLICT (cart_id, product_id) DO UPDATE SET quantity = quantity + excluded.quantity
+                RETURNING id, quantity
+                """,
+                (cart_id, quantity, product_id),
+            ).fetchone()
+            if line is None:
+                raise ProductNotFound(product_id)
+            _reserve(conn, cart_id, product_id, line["quantity"])
+            publish(conn, "cart", user_id)
+            result = {"id": line["id"], "product_id": product_id, "quantity": line["quantity"]}
+            store(conn, result)
+        return result
+
+    def merge_lines(
+        self, user_id: int, lines: list[tuple[int, int]], guest_cart_id: str, now: float, expired_before: float
+    ) -> tuple[int, list[int]]:
+        try:
+            return self._merge_lines(user_id, lines, guest_cart_id, now, expired_before, skip_short=False)
+        except InsufficientStock as e:
+            gather_stock(shard_for_user(user_id), e.shortfalls)
+        # Whatever the other shards could not cover is left out.
+        return self._merge_lines(user_id, lines, guest_cart_id, now, expired_before, skip_short=True)
+
+    def _merge_lines(
+        self,
+        user_id: int,
+        lines: list[tuple[int, int]],
+        guest_cart_id: str,
+        now: float,
+        expired_before: float,
+        skip_short: bool,
+    ) -> tuple[int, list[int]]:
+        """The merge; lines short of stock are rolled back one by one, then skipped or raised together."""
+        merged = 0
+        short: dict[int, int] = {}
+        with get_db(user_id) as conn:
+            conn.execute("DELETE FROM guest_cart_merges WHERE merged_at <= ?", (expired_before,))
+            # The primary key decides replays: a second merge of the same cart inserts nothing.
+            recorded = conn.execute(
+                """
+                INSERT INTO guest_cart_merges (guest_cart_id, user_id, merged_at) VALUES (?, ?, ?)
+                ON CONFLICT (guest_cart_id) DO NOTHING
+                RETURNING 1
+                """,
+                (guest_cart_id, user_id, now),
+            ).fetchone()
+            if recorded is None:
+                return 0, []
+            cart_id = _get_or_create_active_cart(conn, user_id)
+            for product_id, quantity in lines:
+                conn.execute("SAVEPOINT merge_line")
+                try:
+                    line = conn.execute(
+                        """
+                        INSERT INTO cart_items (cart_id, product_id, quantity, product_name, unit_price_cents)
+                        SELECT ?, id, ?, name, price_cents FROM products WHERE id = ?
+                        ON CONFLICT (cart_id, product_id) DO UPDATE SET quantity = quantity + excluded.quantity
+                        RETURNING quantity
+                        """,
+                        (cart_id, quantity, product_id),
+                    ).fetchone()
+                    if line is None:
+                        continue
+                    _reserve(conn, cart_id, product_id, line["quantity"])
+                    merged += 1
+                except InsufficientStock as e:
+                    conn.execute("ROLLBACK TO merge_line")
+                    short.update(e.shortfalls)
+                finally:
+                    conn.execute("RELEASE merge_line")
+            if short and not skip_short:
+                raise InsufficientStock(short)
+            if merged:
+                publish(conn, "cart", user_id)
+        return merged, list(short)
+
+    def update_item(self, user_id: int, item_id: int, quantity: int) -> bool:
+        return _with_gathered_stock(user_id, lambda: self._update_item(user_id, item_id, quantity))
+
+    def _update_item(self, user_id: int, item_id: int, quantity: int) -> bool:
+        with get_db(user_id) as conn:
+            row = conn.execute(
+                f"UPDATE cart_items SET quantity = ? WHERE id = ? AND {_USER_ACTIVE_CART} RETURNING cart_id, product_id",
+                (quantity, item_id, user_id),
+            ).fetchone()
+            if row is None:
+                return False
+            _reconcile(conn, row["cart_id"], row["product_id"], quantity)
+            publish(conn, "cart", user_id)
+        return True
+
+    def remove_item(self, user_id: int, item_id: int) -> bool:
+        with get_db(user_id) as conn:
+            row = conn.execute(
+                f"DELETE FROM cart_items WHERE id = ? AND {_USER_ACTIVE_CART} RETURNING cart_id, product_id",
+                (item_id, user_id),
+            ).fetchone()
+            if row is None:
+                return False
+            _reconcile(conn, row["cart_id"], row["product_id"], 0)
+            publish(conn, "cart", user_id)
+        return True
+
+    def get_active(self, user_id: int) -> Optional[dict]:
+        with get_db(user_id) as conn:
+            # Lines carry a product snapshot, so this reads cart and cart_items alone (no products join).
+            rows = conn.execute(
+                """
+                SELECT c.total_cents, ci.id, ci.product_id, ci.product_name, ci.unit_price_cents, ci.quantity
+                FROM cart c
+                LEFT JOIN cart_items ci ON ci.cart_id = c.id
+                WHERE c.user_id = ? AND c.status = 'active'
+                ORDER BY ci.id
+                """,
+                (user_id,),
+            ).fetchall()
+        if not rows:
+            return None
+        lines = [
+            {
+                "id": r["id"],
+                "product_id": r["product_id"],
+                "product_name": r["product_name"],
+                "unit_price_cents": r["unit_price_cents"],
+                "quantity": r["quantity"],
+            }
+            for r in rows
+            if r["id"] is not None
+        ]
+        return {"total_cents": rows[0]["total_cents"], "lines": lines}
+
+    def checkout(self, user_id: int, store: Store) -> Optional[int]:
+        return _with_gathered_stock(user_id, lambda: self._checkout(user_id, store))
+
+    def _checkout(self, user_id: int, store: Store) -> Optional[int]:
+        try:
+            with get_db(user_id) as conn:
+                # Stock of tracked products is deducted by the trigger from migration 011.
+                row = conn.execute(
+                    "UPDATE cart SET status = 'checked_out' WHERE user_id = ? AND status = 'active' RETURNING total_cents",
+                    (user_id,),
+                ).fetchone()
+                total_cents = row["total_cents"] if row is not None else None
+                if row is not None:
+                    publish(conn, "cart", user_id)
+                store(conn, total_cents)
+        except sqlite3.IntegrityError as e:
+            if not is_stock_shortage(e):
+                raise
+            # The checkout was rolled back; name the short lines in the error.
+            with get_db(user_id) as conn:
+                short = cart_shortages(conn, user_id)
+            raise InsufficientStock(short)
+        return total_cents
+
+
+class SqliteItemRepository(ItemRepository):
+    def list_page(self, after: int, limit: int) -> list[dict]:
+        with get_db() as conn:
+            rows = conn.execute("SELECT id, name FROM items WHERE id > ? ORDER BY id LIMIT ?", (after, limit))
+            return [dict(row) for row in rows]
+
+    def get(self, item_id: int) -> Optional[dict]:
+        with get_db() as conn:
+            row = conn.execute("SELECT id, name FROM items WHERE id = ?", (item_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def create_many(self, names: list[str]) -> list[dict]:
+        with get_db() as conn:
+            cursor = conn.cursor()
+            created = []
+            for name in names:
+                cursor.execute("INSERT INTO items (name) VALUES (?)", (name,))
+                created.append({"id": cursor.lastrowid, "name": name})
+        return created
+
+    def update_many(self, items: list[tuple[int, str]]) -> list[int]:
+        with get_db() as conn:
+            cursor = conn.cursor()
+            missing = []
+            for item_id, name in items:
+                # A single statement; rowcount tells us whether the item existed.
+                cursor.execute("UPDATE items SET name = ? WHERE id = ?", (name, item_id))
+                if cursor.rowcount == 0:
+                    missing.append(item_id)
+            if missing:
+                conn.rollback()
+        return missing
+
+    def delete_many(self, item_ids: list[int]) -> list[int]:
+        with get_db() as conn:
+            deleted = {
+                row["id"]
+                for row in conn.execute(
+                    "DELETE FROM items WHERE id IN (SELECT value FROM json_each(?)) RETURNING id",
+                    (json.dumps(item_ids),),
+                )
+            }
+            missing = sorted(set(item_ids) - deleted)
+            if missing:
+                conn.rollback()
+        return missing
+
+
+class SqliteIdempotencyKeyRepository(IdempotencyKeyRepository):
+    def find(self, user_id: int, key: str, since: float) -> Optional[tuple[str, dict, float]]:
+        with get_db(user_id) as conn:
+            row = conn.execute(
+                """
+                SELECT fingerprint, response, created_at FROM idempotency_keys
+                WHERE user_id = ? AND key = ? AND created_at > ?
+                """,
+                (user_id, key, since),
+            ).fetchone()
+        if row is None:
+            return None
+        return row["fingerprint"], json.loads(row["response"]), row["created_at"]
+
+    def save(
+        self,
+        tx: sqlite3.Connection,
+        user_id: int,
+        key: str,
+        digest: str,
+        response: dict,
+        now: float,
+        expired_before: float,
+    ) -> bool:
+        row = tx.execute(
+            """
+            INSERT INTO idempotency_keys (user_id, key, fingerprint, response, created_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (user_id, key) DO UPDATE SET
+                fingerprint = excluded.fingerprint, response = excluded.response, created_at = excluded.created_at
+            WHERE idempotency_keys.created_at <= ?
+            RETURNING 1
+            """,
+            (user_id, key, digest, json.dumps(response), now, expired_before),
+        ).fetchone()
+        return row is not None
+
+    def prune(self, tx: sqlite3.Connection, before: float) -> None:
+        tx.execute("DELETE FROM idempotency_keys WHERE created_at <= ?", (before,))
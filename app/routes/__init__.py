@@ -3,5 +3,17 @@ from app.routes.items import router as items_router
 from app.routes.auth import router as auth_router
 from app.routes.products import router as products_router
 from app.routes.cart import router as cart_router
+from app.routes.guest_cart import router as guest_cart_router
+from app.routes.orders import router as orders_router
+from app.routes.admin import router as admin_router
 
-__all__ = ["health_router", "items_router", "auth_router", "products_router", "cart_router"]
+__all__ = [
+    "health_router",
+    "items_router",
+    "auth_router",
+    "products_router",
+    "cart_router",
+    "guest_cart_router",
+    "orders_router",
+    "admin_router",
+]
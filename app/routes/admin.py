@@ -0,0 +1,115 @@
+"""
+Admin API: operator-only bulk operations. Requires the X-Admin-Key header.
+"""
+
+import io
+import tempfile
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
+
+from app.auth import require_admin
+from app.backup import BackupInProgress, get_status, run_backup
+from app.bulk_io import FORMATS
+from app.catalog_import import import_catalog
+from app.database import STORAGE_BACKEND
+from app.maintenance import run_maintenance
+from app.provisioning import provision_users
+from app.stock import distribute_stock
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+# Uploads larger than this are spooled to a temporary file instead of memory.
+_SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+
+class StockRequest(BaseModel):
+    available: int = Field(ge=0)
+
+
+class BackupRequest(BaseModel):
+    vacuum: bool = False
+
+
+def require_sqlite_storage() -> None:
+    """
+    Operational jobs write the SQLite files directly. On the memory backend the routes
+    would never see their changes, so they are refused instead of reporting success.
+    """
+    if STORAGE_BACKEND != "sqlite":
+        raise HTTPException(
+            status_code=501, detail=f"Not available with STORAGE_BACKEND={STORAGE_BACKEND}: it writes the SQLite files"
+        )
+
+
+async def _run_upload(request: Request, format: str, func):
+    """Spool the raw request body, then run func(text_stream, format) in the threadpool."""
+    if format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(FORMATS)}")
+    with tempfile.SpooledTemporaryFile(max_size=_SPOOL_MAX_BYTES) as upload:
+        async for chunk in request.stream():
+            upload.write(chunk)
+        upload.seek(0)
+        text = io.TextIOWrapper(upload, encoding="utf-8", newline="")
+        return await run_in_threadpool(func, text, format)
+
+
+@router.post("/products/import", dependencies=[Depends(require_sqlite_storage)])
+async def import_products(request: Request, format: str = Query("csv", description="csv or jsonl")):
+    """
+    Bulk import products from the raw request body (CSV with a header row, or JSONL).
+    Rows with an id are upserted, rows without one are inserted. Returns counts and rows/sec.
+    """
+    return await _run_upload(request, format, import_catalog)
+
+
+@router.post("/users/import", dependencies=[Depends(require_sqlite_storage)])
+async def import_users(request: Request, format: str = Query("csv", description="csv or jsonl")):
+    """
+    Bulk create users from the raw request body (email and password per row). Passwords
+    are hashed on all cores. Bad or duplicate rows are reported and skipped.
+    Returns counts, errors and users/sec.
+    """
+    return await _run_upload(request, format, provision_users)
+
+
+@router.put("/products/{product_id}/stock", dependencies=[Depends(require_sqlite_storage)])
+def put_product_stock(product_id: int, body: StockRequest):
+    """
+    Set the units available for sale (units held by cart reservations are not included).
+    The product's stock is tracked from then on: checkout fails with 409 once it runs out.
+    With several shards the units are split evenly between them.
+    """
+    if not distribute_stock(product_id, body.available):
+        raise HTTPException(status_code=404, detail="Product not found")
+    return {"product_id": product_id, "available": body.available}
+
+
+@router.post("/maintenance", dependencies=[Depends(require_sqlite_storage)])
+def run_cart_maintenance():
+    """
+    Run a cart maintenance pass now (normally scheduled): purge idle and abandoned carts,
+    archive old orders and reclaim free pages. Returns rows moved and time spent per step.
+    """
+    return run_maintenance()
+
+
+@router.post("/backup")
+def post_backup(body: Optional[BackupRequest] = None):
+    """
+    Back up every database into a new directory under BACKUP_DIR while the service keeps
+    serving: the online backup API in small steps, or compacted copies with "vacuum": true.
+    Returns the files written, bytes and bytes/sec. 409 if a backup is already running.
+    """
+    try:
+        return run_backup(vacuum=body is not None and body.vacuum)
+    except BackupInProgress:
+        raise HTTPException(status_code=409, detail="A backup is already running")
+
+
+@router.get("/backup")
+def get_backup_status():
+    """Progress of the running backup (pages copied, bytes/sec) and the report of the last one."""
+    return get_status()
@@ -2,13 +2,24 @@
 Authentication routes: register and login with JWT.
 """
 
-from fastapi import APIRouter, HTTPException, status
+from typing import Optional
 
+from fastapi import APIRouter, Cookie, Depends, HTTPException, Response, status
+
+from app import guest_cart, repositories
 from app.auth import create_access_token, hash_password, verify_password
-from app.database import get_db
+from app.concurrency import limit_concurrency
+from app.guest_cart import InvalidGuestCart
+from app.repositories import DuplicateEmail
+from app.routes.guest_cart import GUEST_CART_COOKIE
 from pydantic import BaseModel, EmailStr
 
-router = APIRouter(prefix="/auth", tags=["authentication"])
+# Password hashing is CPU-bound; a burst must not take the threads of other routes.
+router = APIRouter(
+    prefix="/auth",
+    tags=["authentication"],
+    dependencies=[Depends(limit_concurrency("auth"))],
+)
 
 
 class RegisterRequest(BaseModel):
@@ -19,11 +30,16 @@ class RegisterRequest(BaseModel):
 class LoginRequest(BaseModel):
     email: EmailStr
     password: str
+    # Token from the guest cart API; its lines are merged into the user's cart.
+    guest_cart: Optional[str] = None
 
 
 class TokenResponse(BaseModel):
     access_token: str
     token_type: str = "bearer"
+    merged_items: int = 0
+    # Products of the guest cart left out because their stock could not be reserved.
+    unmerged_products: list[int] = []
 
 
 class UserResponse(BaseModel):
@@ -34,7 +50,7 @@ class UserResponse(BaseModel):
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
 def register(body: RegisterRequest):
     """
-    Register a new user. Email must be unique.
+    Register a new user. Email must be unique (case-insensitive).
     Password is stored hashed.
     """
     if len(body.password) < 6:
@@ -42,36 +58,36 @@ def register(body: RegisterRequest):
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Password must be at least 6 characters",
         )
-    with get_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT id FROM users WHERE email = ?", (body.email.lower(),))
-        if cursor.fetchone() is not None:
-            raise HTTPException(
-                status_code=status.HTTP_409_CONFLICT,
-                detail="Email already registered",
-            )
-        hashed = hash_password(body.password)
-        cursor.execute(
-            "INSERT INTO users (email, password) VALUES (?, ?)",
-            (body.email.lower(), hashed),
-        )
-        user_id = cursor.lastrowid
-    return {"id": user_id, "email": body.email.lower()}
+    email = body.email.lower()
+    # Hash before borrowing a connection: bcrypt takes hundreds of milliseconds of CPU.
+    hashed = hash_password(body.password)
+    try:
+        # Storage decides duplicates atomically; no lookup first, so no check-then-insert race.
+        user_id = repositories.users.create(email, hashed)
+    except DuplicateEmail:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Email already registered",
+        ) from None
+    return {"id": user_id, "email": email}
 
 
 @router.post("/login", response_model=TokenResponse)
-def login(body: LoginRequest):
+def login(
+    body: LoginRequest,
+    response: Response,
+    guest_cart_cookie: Optional[str] = Cookie(None, alias=GUEST_CART_COOKIE),
+):
     """
     Login with email and password. Returns a JWT access token.
     Use the token in the Authorization header: Bearer <token>
+    A guest cart (guest_cart in the body, or the guest_cart cookie) is merged into the
+    user's active cart in one transaction, once (a replayed token merges nothing);
+    merged_items counts its lines. Lines whose units cannot be reserved are left out and
+    listed in unmerged_products; a stock shortage never blocks login. An invalid
+    guest_cart is a 400; an invalid cookie is dropped.
     """
-    with get_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT id, email, password FROM users WHERE email = ?",
-            (body.email.lower(),),
-        )
-        row = cursor.fetchone()
+    row = repositories.users.get_by_email(body.email.lower())
     if row is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -83,5 +99,20 @@ def login(body: LoginRequest):
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password",
         )
+    merged, short = 0, []
+    guest_token = body.guest_cart or guest_cart_cookie
+    if guest_token:
+        try:
+            merged, short = guest_cart.merge(user_id, guest_token)
+        except InvalidGuestCart:
+            # A stale cookie is sent by the browser on its own and must not block login.
+            if body.guest_cart:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid or expired guest cart")
+        response.delete_cookie(GUEST_CART_COOKIE)
     access_token = create_access_token(data={"sub": str(user_id)})
-    return {"access_token": access_token, "token_type": "bearer"}
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "merged_items": merged,
+        "unmerged_products": short,
+    }
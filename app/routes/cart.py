@@ -2,11 +2,21 @@
 Cart API (JWT-protected). Add items, view cart, update/remove items, checkout.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
 from pydantic import BaseModel
 
+from app import repositories
 from app.auth import get_current_user_id
-from app.database import get_db
+from app.cart_cache import cart_cache
+from app.concurrency import limit_concurrency
+from app.idempotency import Store, fingerprint, run_idempotent
+from app.invalidation import bus
+from app.money import from_cents
+from app.repositories import ProductNotFound
+from app.singleflight import SINGLEFLIGHT_TIMEOUT_SECONDS, SingleFlightTimeout
+from app.stock import InsufficientStock
 
 router = APIRouter(prefix="/cart", tags=["cart"])
 
@@ -20,150 +30,94 @@ class UpdateItemRequest(BaseModel):
     quantity: int
 
 
-def _get_or_create_active_cart(conn, user_id: int) -> int:
-    """Return active cart id for user; create one if none exists."""
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT id FROM cart WHERE user_id = ? AND status = 'active' LIMIT 1",
-        (user_id,),
-    )
-    row = cursor.fetchone()
-    if row:
-        return row["id"]
-    cursor.execute(
-        "INSERT INTO cart (user_id, total, status) VALUES (?, 0, 'active')",
-        (user_id,),
-    )
-    return cursor.lastrowid
-
-
-def _recalc_cart_total(conn, cart_id: int) -> None:
-    """Update cart.total from sum of (product price * quantity) for all items."""
-    cursor = conn.cursor()
-    cursor.execute(
-        """
-        UPDATE cart SET total = (
-            SELECT COALESCE(SUM(p.price * ci.quantity), 0)
-            FROM cart_items ci
-            JOIN products p ON p.id = ci.product_id
-            WHERE ci.cart_id = ?
-        ) WHERE id = ?
-        """,
-        (cart_id, cart_id),
-    )
+# Retried writes carrying the same key are replayed from the first response (see app.idempotency).
+IdempotencyKey = Header(None, alias="Idempotency-Key", description="Client-chosen key; retries are replayed")
+REPLAY_HEADER = "Idempotent-Replayed"
 
 
-def _ensure_cart_owned_by_user(conn, cart_id: int, user_id: int) -> None:
-    """Raise 404 if cart does not exist or does not belong to user."""
-    cursor = conn.cursor()
-    cursor.execute("SELECT id FROM cart WHERE id = ? AND user_id = ?", (cart_id, user_id))
-    if cursor.fetchone() is None:
-        raise HTTPException(status_code=404, detail="Cart not found")
-
-
-def _ensure_item_in_user_cart(conn, item_id: int, user_id: int) -> tuple[int, int]:
-    """Raise 404 if item not found or not in user's active cart. Returns (cart_id, product_id)."""
-    cursor = conn.cursor()
-    cursor.execute(
-        """
-        SELECT ci.cart_id, ci.product_id FROM cart_items ci
-        JOIN cart c ON c.id = ci.cart_id
-        WHERE ci.id = ? AND c.user_id = ? AND c.status = 'active'
-        """,
-        (item_id, user_id),
-    )
-    row = cursor.fetchone()
-    if row is None:
-        raise HTTPException(status_code=404, detail="Cart item not found")
-    return row["cart_id"], row["product_id"]
+def _insufficient_stock(e: InsufficientStock) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
 
 
-@router.post("/items", status_code=status.HTTP_201_CREATED)
+@router.post(
+    "/items",
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(limit_concurrency("cart_write"))],
+)
 def add_cart_item(
     body: AddItemRequest,
+    response: Response,
     user_id: int = Depends(get_current_user_id),
+    idempotency_key: Optional[str] = IdempotencyKey,
 ):
-    """Add item to cart (product_id, quantity). Creates active cart if needed."""
+    """
+    Add item to cart (product_id, quantity). Creates active cart if needed.
+    Adding a product already in the cart increases its quantity; cart.total_cents
+    is kept current by triggers on cart_items. With stock reservations enabled the
+    units are held for the cart (409 if not available). With an Idempotency-Key,
+    a retry returns the first response and does not add the quantity again.
+    """
     if body.quantity < 1:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Quantity must be at least 1",
         )
-    with get_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, price FROM products WHERE id = ?", (body.product_id,))
-        product = cursor.fetchone()
-        if product is None:
-            raise HTTPException(status_code=404, detail="Product not found")
-
-        cart_id = _get_or_create_active_cart(conn, user_id)
-
-        cursor.execute(
-            "SELECT id, quantity FROM cart_items WHERE cart_id = ? AND product_id = ?",
-            (cart_id, body.product_id),
-        )
-        existing = cursor.fetchone()
-        if existing:
-            new_qty = existing["quantity"] + body.quantity
-            cursor.execute(
-                "UPDATE cart_items SET quantity = ? WHERE id = ?",
-                (new_qty, existing["id"]),
-            )
-            item_id = existing["id"]
-        else:
-            cursor.execute(
-                "INSERT INTO cart_items (cart_id, product_id, quantity) VALUES (?, ?, ?)",
-                (cart_id, body.product_id, body.quantity),
-            )
-            item_id = cursor.lastrowid
 
-        _recalc_cart_total(conn, cart_id)
+    def write(store: Store) -> dict:
+        try:
+            result = repositories.carts.add_item(user_id, body.product_id, body.quantity, store)
+        except ProductNotFound:
+            raise HTTPException(status_code=404, detail="Product not found")
+        except InsufficientStock as e:
+            raise _insufficient_stock(e)
+        cart_cache.invalidate(user_id)
+        return result
 
-    return {"id": item_id, "product_id": body.product_id, "quantity": body.quantity if not existing else new_qty}
+    result, replayed = run_idempotent(
+        user_id, idempotency_key, fingerprint("POST /cart/items", body.model_dump()), write
+    )
+    if replayed:
+        response.headers[REPLAY_HEADER] = "true"
+    return result
+
+
+def _empty_cart_view() -> dict:
+    return {"items": [], "total": 0.0, "status": "active"}
+
+
+def _load_cart_view(user_id: int) -> dict:
+    """Read the user's active cart (items and total) from storage."""
+    cart = repositories.carts.get_active(user_id)
+    if cart is None:
+        return _empty_cart_view()
+    items = [
+        {
+            "id": line["id"],
+            "product_id": line["product_id"],
+            "product_name": line["product_name"],
+            "price": from_cents(line["unit_price_cents"]),
+            "quantity": line["quantity"],
+            "subtotal": from_cents(line["unit_price_cents"] * line["quantity"]),
+        }
+        for line in cart["lines"]
+    ]
+    return {"items": items, "total": from_cents(cart["total_cents"]), "status": "active"}
 
 
 @router.get("")
 def get_cart(user_id: int = Depends(get_current_user_id)):
-    """View current cart details and total."""
-    with get_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT id, total, status FROM cart WHERE user_id = ? AND status = 'active' LIMIT 1",
-            (user_id,),
-        )
-        cart_row = cursor.fetchone()
-        if cart_row is None:
-            return {"items": [], "total": 0.0, "status": "active"}
-
-        cart_id = cart_row["id"]
-        cursor.execute(
-            """
-            SELECT ci.id, ci.product_id, p.name AS product_name, p.price, ci.quantity,
-                   (p.price * ci.quantity) AS subtotal
-            FROM cart_items ci
-            JOIN products p ON p.id = ci.product_id
-            WHERE ci.cart_id = ?
-            ORDER BY ci.id
-            """,
-            (cart_id,),
-        )
-        rows = cursor.fetchall()
-        items = [
-            {
-                "id": r["id"],
-                "product_id": r["product_id"],
-                "product_name": r["product_name"],
-                "price": r["price"],
-                "quantity": r["quantity"],
-                "subtotal": r["subtotal"],
-            }
-            for r in rows
-        ]
-        total = float(cart_row["total"])
-    return {"items": items, "total": total, "status": "active"}
-
-
-@router.put("/items/{item_id}")
+    """
+    View current cart details and total. Served from the per-user cart cache when warm;
+    concurrent misses for the same user share one storage read.
+    """
+    bus.ensure_fresh()
+    try:
+        return cart_cache.load(user_id, _load_cart_view, SINGLEFLIGHT_TIMEOUT_SECONDS)
+    except SingleFlightTimeout as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+
+
+@router.put("/items/{item_id}", dependencies=[Depends(limit_concurrency("cart_write"))])
 def update_cart_item(
     item_id: int,
     body: UpdateItemRequest,
@@ -175,45 +129,64 @@ def update_cart_item(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Quantity must be at least 1",
         )
-    with get_db() as conn:
-        _ensure_item_in_user_cart(conn, item_id, user_id)
-        cursor = conn.cursor()
-        cursor.execute("UPDATE cart_items SET quantity = ? WHERE id = ?", (body.quantity, item_id))
-        cursor.execute("SELECT cart_id FROM cart_items WHERE id = ?", (item_id,))
-        row = cursor.fetchone()
-        if row:
-            _recalc_cart_total(conn, row["cart_id"])
+    try:
+        found = repositories.carts.update_item(user_id, item_id, body.quantity)
+    except InsufficientStock as e:
+        raise _insufficient_stock(e)
+    if not found:
+        raise HTTPException(status_code=404, detail="Cart item not found")
+    cart_cache.invalidate(user_id)
     return {"id": item_id, "quantity": body.quantity}
 
 
-@router.delete("/items/{item_id}", status_code=status.HTTP_204_NO_CONTENT)
+@router.delete(
+    "/items/{item_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    dependencies=[Depends(limit_concurrency("cart_write"))],
+)
 def remove_cart_item(
     item_id: int,
     user_id: int = Depends(get_current_user_id),
 ):
     """Remove item from cart."""
-    with get_db() as conn:
-        cart_id, _ = _ensure_item_in_user_cart(conn, item_id, user_id)
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM cart_items WHERE id = ?", (item_id,))
-        _recalc_cart_total(conn, cart_id)
+    if not repositories.carts.remove_item(user_id, item_id):
+        raise HTTPException(status_code=404, detail="Cart item not found")
+    cart_cache.invalidate(user_id)
     return None
 
 
-@router.post("/checkout")
-def checkout(user_id: int = Depends(get_current_user_id)):
-    """Purchase items and clear cart (set cart status to checked_out)."""
-    with get_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT id FROM cart WHERE user_id = ? AND status = 'active' LIMIT 1",
-            (user_id,),
-        )
-        row = cursor.fetchone()
-        if row is None:
-            return {"message": "Cart is empty", "total": 0.0}
-        cart_id = row["id"]
-        cursor.execute("SELECT total FROM cart WHERE id = ?", (cart_id,))
-        total = cursor.fetchone()["total"]
-        cursor.execute("UPDATE cart SET status = 'checked_out' WHERE id = ?", (cart_id,))
-    return {"message": "Checkout successful", "total": float(total)}
+def _checkout_result(total_cents: Optional[int]) -> dict:
+    if total_cents is None:
+        return {"message": "Cart is empty", "total": 0.0}
+    return {"message": "Checkout successful", "total": from_cents(total_cents)}
+
+
+@router.post("/checkout", dependencies=[Depends(limit_concurrency("cart_write"))])
+def checkout(
+    response: Response,
+    user_id: int = Depends(get_current_user_id),
+    idempotency_key: Optional[str] = IdempotencyKey,
+):
+    """
+    Purchase items and clear cart (set cart status to checked_out). Stock of tracked
+    products is deducted in the same statement (trigger from migration 011); if any
+    line is short, nothing is purchased and the response is 409.
+    With an Idempotency-Key, a retry returns the first checkout's response.
+    """
+
+    def write(store: Store) -> dict:
+        try:
+            total_cents = repositories.carts.checkout(
+                user_id, lambda tx, total_cents: store(tx, _checkout_result(total_cents))
+            )
+        except InsufficientStock as e:
+            raise _insufficient_stock(e)
+        if total_cents is not None:
+            # Write-through: after checkout the user's cart is empty.
+            cart_cache.set(user_id, _empty_cart_view())
+        return _checkout_result(total_cents)
+
+    result, replayed = run_idempotent(user_id, idempotency_key, fingerprint("POST /cart/checkout", {}), write)
+    if replayed:
+        response.headers[REPLAY_HEADER] = "true"
+    return result
@@ -0,0 +1,118 @@
+"""
+Guest cart API (no login). The cart travels in a signed token; no request writes to the database.
+
+The token is read from the X-Guest-Cart header or the guest_cart cookie. Every
+change returns the new token in the body (guest_cart) and sets it as the cookie.
+Send it as guest_cart to /auth/login to move the lines into the user's cart.
+"""
+
+from typing import Optional
+
+from fastapi import APIRouter, Cookie, Depends, Header, HTTPException, Response, status
+from pydantic import BaseModel
+
+from app import catalog, guest_cart
+from app.guest_cart import GUEST_CART_MAX_LINES, GUEST_CART_TTL_DAYS, InvalidGuestCart
+from app.singleflight import SingleFlightTimeout
+
+router = APIRouter(prefix="/cart/guest", tags=["cart"])
+
+GUEST_CART_COOKIE = "guest_cart"
+
+
+class AddGuestItemRequest(BaseModel):
+    product_id: int
+    quantity: int
+
+
+class UpdateGuestItemRequest(BaseModel):
+    quantity: int
+
+
+def guest_cart_token(
+    x_guest_cart: Optional[str] = Header(None, alias="X-Guest-Cart"),
+    cookie: Optional[str] = Cookie(None, alias=GUEST_CART_COOKIE),
+) -> Optional[str]:
+    """The guest cart token sent by the client, if any (the header wins over the cookie)."""
+    return x_guest_cart or cookie
+
+
+def _read(token: Optional[str]) -> tuple[Optional[str], dict[int, int]]:
+    try:
+        return guest_cart.read(token)
+    except InvalidGuestCart:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid or expired guest cart")
+
+
+def _view(lines: dict[int, int]) -> dict:
+    try:
+        return guest_cart.view(lines)
+    except SingleFlightTimeout as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+
+
+def _changed(response: Response, cart_id: Optional[str], lines: dict[int, int]) -> dict:
+    """Sign the new cart (keeping its id), set it as the cookie and return the view with the token."""
+    token = guest_cart.encode(lines, cart_id)
+    response.set_cookie(
+        GUEST_CART_COOKIE, token, max_age=int(GUEST_CART_TTL_DAYS * 86400), httponly=True, samesite="lax"
+    )
+    return {**_view(lines), "guest_cart": token}
+
+
+def _check_quantity(quantity: int) -> None:
+    if quantity < 1:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Quantity must be at least 1")
+
+
+@router.get("")
+def get_guest_cart(token: Optional[str] = Depends(guest_cart_token)):
+    """View the guest cart, priced from the current catalog."""
+    return _view(_read(token)[1])
+
+
+@router.post("/items", status_code=status.HTTP_201_CREATED)
+def add_guest_cart_item(
+    body: AddGuestItemRequest, response: Response, token: Optional[str] = Depends(guest_cart_token)
+):
+    """Add a product to the guest cart (adding it again increases its quantity). Returns the new token."""
+    _check_quantity(body.quantity)
+    cart_id, lines = _read(token)
+    try:
+        product = catalog.get_product(body.product_id)
+    except SingleFlightTimeout as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+    if product is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    if body.product_id not in lines and len(lines) >= GUEST_CART_MAX_LINES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A guest cart holds at most {GUEST_CART_MAX_LINES} products; log in to add more",
+        )
+    lines[body.product_id] = lines.get(body.product_id, 0) + body.quantity
+    return _changed(response, cart_id, lines)
+
+
+@router.put("/items/{product_id}")
+def update_guest_cart_item(
+    product_id: int,
+    body: UpdateGuestItemRequest,
+    response: Response,
+    token: Optional[str] = Depends(guest_cart_token),
+):
+    """Set the quantity of a product in the guest cart. Returns the new token."""
+    _check_quantity(body.quantity)
+    cart_id, lines = _read(token)
+    if product_id not in lines:
+        raise HTTPException(status_code=404, detail="Cart item not found")
+    lines[product_id] = body.quantity
+    return _changed(response, cart_id, lines)
+
+
+@router.delete("/items/{product_id}")
+def remove_guest_cart_item(product_id: int, response: Response, token: Optional[str] = Depends(guest_cart_token)):
+    """Remove a product from the guest cart. Returns the new token."""
+    cart_id, lines = _read(token)
+    if lines.pop(product_id, None) is None:
+        raise HTTPException(status_code=404, detail="Cart item not found")
+    return _changed(response, cart_id, lines)
@@ -1,9 +1,57 @@
-from fastapi import APIRouter
+from anyio.to_thread import current_default_thread_limiter
+from fastapi import APIRouter, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+
+from app import concurrency, metrics, probes, warmup
 
 router = APIRouter()
 
 
 @router.get("/health")
 def health_check():
-    """Health check endpoint."""
+    """Health check endpoint (liveness)."""
     return {"status": "healthy"}
+
+
+@router.get("/health/ready")
+async def readiness_check():
+    """
+    Readiness with dependency checks: database round-trip, pool and threadpool usage,
+    WAL size and last applied migration. Returns 503 until startup warm-up has finished,
+    when the database probe fails, or when the threadpool is saturated.
+    The database probe is cached for HEALTH_PROBE_TTL_SECONDS.
+    """
+    if not warmup.is_ready():
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"status": "warming_up"},
+        )
+    threadpool = probes.threadpool_status(current_default_thread_limiter())
+    saturated = threadpool["saturation"] >= 1
+    if probes.is_probe_fresh():
+        database = probes.get_database_probe()
+    elif saturated:
+        # Waiting for a thread would hang the check; report the last known result.
+        database = probes.last_database_probe()
+    else:
+        database = await run_in_threadpool(probes.get_database_probe)
+
+    database_ok = database is not None and database["ok"]
+    body = {
+        "status": "ready" if database_ok and not saturated else "unavailable",
+        "warmup_seconds": metrics.get_gauge("warmup.duration_seconds"),
+        "database": database,
+        "pool": probes.pool_status(),
+        "threadpool": threadpool,
+        "concurrency": concurrency.stats(),
+    }
+    if body["status"] != "ready":
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content=body)
+    return body
+
+
+@router.get("/metrics")
+def get_metrics():
+    """In-process metrics of this worker (counters, gauges, timings)."""
+    return metrics.snapshot()
@@ -1,10 +1,17 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+import os
 
-from app.database import get_db
+from fastapi import APIRouter, HTTPException, Query
+from pydantic import BaseModel, Field
+
+from app import repositories
 
 router = APIRouter(prefix="/items", tags=["items"])
 
+ITEMS_PAGE_SIZE = int(os.getenv("ITEMS_PAGE_SIZE", "100"))
+ITEMS_MAX_PAGE_SIZE = 1000
+# Upper bound on rows per bulk request (each bulk request is one transaction).
+ITEMS_BULK_MAX = int(os.getenv("ITEMS_BULK_MAX", "1000"))
+
 
 class ItemCreate(BaseModel):
     name: str
@@ -19,19 +26,78 @@ class ItemResponse(BaseModel):
     name: str
 
 
+class BulkCreateRequest(BaseModel):
+    items: list[ItemCreate] = Field(..., min_length=1, max_length=ITEMS_BULK_MAX)
+
+
+class BulkUpdateRequest(BaseModel):
+    items: list[ItemResponse] = Field(..., min_length=1, max_length=ITEMS_BULK_MAX)
+
+
+class BulkDeleteRequest(BaseModel):
+    ids: list[int] = Field(..., min_length=1, max_length=ITEMS_BULK_MAX)
+
+
 @router.get("")
-def list_items():
+def list_items(
+    after: int = Query(0, description="Return items with id greater than this (keyset cursor)"),
+    limit: int = Query(ITEMS_PAGE_SIZE, ge=1, le=ITEMS_MAX_PAGE_SIZE),
+):
     """
-    List all items from the database.
-    Uses raw SQL query (no ORM).
+    List items in id order, one page at a time.
+    Pass the returned next_after as ?after= to fetch the next page; it is null on the last page.
     """
     try:
-        with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT id, name FROM items ORDER BY id")
-            rows = cursor.fetchall()
-            items = [{"id": row["id"], "name": row["name"]} for row in rows]
-            return {"items": items}
+        # One extra row tells us whether another page exists.
+        rows = repositories.items.list_page(after, limit + 1)
+        items = rows[:limit]
+        next_after = items[-1]["id"] if len(rows) > limit else None
+        return {"items": items, "next_after": next_after}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
+@router.post("/bulk", status_code=201)
+def bulk_create_items(body: BulkCreateRequest):
+    """
+    Create many items in one transaction. Returns the created items in request order.
+    """
+    try:
+        return {"items": repositories.items.create_many([item.name for item in body.items])}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
+@router.put("/bulk")
+def bulk_update_items(body: BulkUpdateRequest):
+    """
+    Rename many items in one transaction.
+    If any id does not exist, nothing is updated and 404 lists the missing ids.
+    """
+    try:
+        missing = repositories.items.update_many([(item.id, item.name) for item in body.items])
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Items not found: {missing}")
+        return {"items": [{"id": item.id, "name": item.name} for item in body.items]}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
+@router.post("/bulk/delete", status_code=204)
+def bulk_delete_items(body: BulkDeleteRequest):
+    """
+    Delete many items in one transaction.
+    If any id does not exist, nothing is deleted and 404 lists the missing ids.
+    """
+    try:
+        missing = repositories.items.delete_many(body.ids)
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Items not found: {missing}")
+        return None
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
@@ -40,16 +106,12 @@ def list_items():
 def get_item(item_id: int):
     """
     Get a single item by ID.
-    Uses raw SQL query (no ORM).
     """
     try:
-        with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT id, name FROM items WHERE id = ?", (item_id,))
-            row = cursor.fetchone()
-            if row is None:
-                raise HTTPException(status_code=404, detail="Item not found")
-            return {"id": row["id"], "name": row["name"]}
+        item = repositories.items.get(item_id)
+        if item is None:
+            raise HTTPException(status_code=404, detail="Item not found")
+        return item
     except HTTPException:
         raise
     except Exception as e:
@@ -60,14 +122,9 @@ def get_item(item_id: int):
 def create_item(item: ItemCreate):
     """
     Create a new item.
-    Uses raw SQL query (no ORM).
     """
     try:
-        with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute("INSERT INTO items (name) VALUES (?)", (item.name,))
-            item_id = cursor.lastrowid
-            return {"id": item_id, "name": item.name}
+        return repositories.items.create_many([item.name])[0]
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
@@ -76,18 +133,11 @@ def create_item(item: ItemCreate):
 def update_item(item_id: int, item: ItemUpdate):
     """
     Update an existing item.
-    Uses raw SQL query (no ORM).
     """
     try:
-        with get_db() as conn:
-            cursor = conn.cursor()
-            # Check if item exists
-            cursor.execute("SELECT id FROM items WHERE id = ?", (item_id,))
-            if cursor.fetchone() is None:
-                raise HTTPException(status_code=404, detail="Item not found")
-            # Update the item
-            cursor.execute("UPDATE items SET name = ? WHERE id = ?", (item.name, item_id))
-            return {"id": item_id, "name": item.name}
+        if repositories.items.update_many([(item_id, item.name)]):
+            raise HTTPException(status_code=404, detail="Item not found")
+        return {"id": item_id, "name": item.name}
     except HTTPException:
         raise
     except Exception as e:
@@ -98,18 +148,11 @@ def update_item(item_id: int, item: ItemUpdate):
 def delete_item(item_id: int):
     """
     Delete an item.
-    Uses raw SQL query (no ORM).
     """
     try:
-        with get_db() as conn:
-            cursor = conn.cursor()
-            # Check if item exists
-            cursor.execute("SELECT id FROM items WHERE id = ?", (item_id,))
-            if cursor.fetchone() is None:
-                raise HTTPException(status_code=404, detail="Item not found")
-            # Delete the item
-            cursor.execute("DELETE FROM items WHERE id = ?", (item_id,))
-            return None
+        if repositories.items.delete_many([item_id]):
+            raise HTTPException(status_code=404, detail="Item not found")
+        return None
     except HTTPException:
         raise
     except Exception as e:
@@ -0,0 +1,20 @@
+"""
+Orders API (admin). Bulk export of purchase history (checked-out carts).
+"""
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+
+from app import exports
+from app.auth import require_admin
+
+router = APIRouter(prefix="/orders", tags=["orders"], dependencies=[Depends(require_admin)])
+
+
+@router.get("/export")
+def export_orders(after: int = Query(0, description="Resume after this order id")):
+    """
+    Stream purchase history as NDJSON: one checked-out cart per line with its items,
+    ordered by id. Requires X-Admin-Key. Resume with ?after=<last id received>.
+    """
+    return StreamingResponse(exports.iter_orders(after), media_type="application/x-ndjson")
@@ -2,9 +2,16 @@
 Products API (read-only). List available products with prices.
 """
 
-from fastapi import APIRouter, HTTPException
+from typing import Optional
 
-from app.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from app import catalog, exports
+from app.catalog_index import get_index
+from app.concurrency import limit_concurrency
+from app.money import to_cents
+from app.singleflight import SingleFlightTimeout
 from pydantic import BaseModel
 
 router = APIRouter(prefix="/products", tags=["products"])
@@ -16,20 +23,42 @@ class ProductResponse(BaseModel):
     price: float
 
 
-@router.get("", response_model=list[ProductResponse])
-def list_products():
+@router.get(
+    "",
+    response_model=list[ProductResponse],
+    dependencies=[Depends(limit_concurrency("catalog_read"))],
+)
+def list_products(
+    min_price: Optional[float] = Query(None, ge=0, description="Only products priced at least this"),
+    max_price: Optional[float] = Query(None, ge=0, description="Only products priced at most this"),
+    sort: str = Query("id", pattern="^(id|price)$", description="Order by id or by price (then id)"),
+    limit: Optional[int] = Query(None, ge=1, description="Return at most this many products"),
+):
     """
-    List all available products with id, name, and price.
-    Read-only; products are seeded via migrations.
+    List available products with id, name, and price.
+    Read-only; products are seeded via migrations. Served from the in-memory catalog cache;
+    price filters, sort=price and limit are answered from the columnar catalog index.
     """
     try:
-        with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT id, name, price FROM products ORDER BY id")
-            rows = cursor.fetchall()
-            return [
-                {"id": row["id"], "name": row["name"], "price": row["price"]}
-                for row in rows
-            ]
+        if min_price is None and max_price is None and sort == "id" and limit is None:
+            return catalog.get_products()
+        return get_index().query(
+            min_cents=None if min_price is None else to_cents(min_price),
+            max_cents=None if max_price is None else to_cents(max_price),
+            sort=sort,
+            limit=limit,
+        )
+    except SingleFlightTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
+@router.get("/export")
+def export_products(after: int = Query(0, description="Resume after this product id")):
+    """
+    Stream the full catalog as NDJSON (one product per line, ordered by id).
+    Memory use is constant regardless of catalog size; resume an interrupted
+    download with ?after=<last id received>.
+    """
+    return StreamingResponse(exports.iter_products(after), media_type="application/x-ndjson")
@@ -0,0 +1,80 @@
+"""
+Single-flight request coalescing for cache-miss loads.
+
+When a cache entry is missing, every concurrent request for it would run the same
+query. SingleFlight.do(key, fn) lets the first caller (the leader) run fn while
+later callers for the same key wait for its result, so a stampede after an
+invalidation or a restart costs one query per key instead of one per request.
+An exception raised by fn is re-raised in every waiter. Waiters give up after a
+timeout with SingleFlightTimeout; the load itself carries on.
+
+After a write, forget(key) detaches the in-flight load so that readers arriving
+later start a fresh one instead of joining a load that may predate the write.
+"""
+
+import os
+import threading
+from typing import Any, Callable, Hashable, Optional
+
+from app import metrics
+
+SINGLEFLIGHT_TIMEOUT_SECONDS = float(os.getenv("SINGLEFLIGHT_TIMEOUT_SECONDS", "10"))
+
+
+class SingleFlightTimeout(TimeoutError):
+    pass
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+        """Run fn once for all concurrent callers with the same key and return its result to each."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+        if leader:
+            metrics.inc(f"singleflight.{self.name}.loads")
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    if self._calls.get(key) is call:
+                        del self._calls[key]
+                call.done.set()
+        else:
+            metrics.inc(f"singleflight.{self.name}.coalesced")
+            if not call.done.wait(timeout):
+                metrics.inc(f"singleflight.{self.name}.timeouts")
+                raise SingleFlightTimeout(f"Timed out after {timeout}s waiting for {self.name} load")
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def forget(self, key: Hashable) -> None:
+        """Let later callers for key start a new load; current waiters still get the running one."""
+        with self._lock:
+            self._calls.pop(key, None)
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
@@ -0,0 +1,93 @@
+"""
+Startup instrumentation: time from process start to first request served, and a
+per-module import-time breakdown.
+
+Run ``python -m app.startup`` to print the slowest imports of ``app.main``.
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+from app import metrics
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _process_start_time() -> float:
+    """Wall-clock time the current process started (from /proc on Linux, else now)."""
+    try:
+        with open("/proc/self/stat") as f:
+            # Fields after the ")" closing the command name; starttime is field 22 overall.
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        boot_time = time.time() - uptime
+        return boot_time + int(fields[19]) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return time.time()
+
+
+PROCESS_STARTED_AT = _process_start_time()
+
+
+def record_app_loaded() -> None:
+    """Record how long it took from process start until the app module finished importing."""
+    metrics.set_gauge("startup.app_loaded_seconds", time.time() - PROCESS_STARTED_AT)
+
+
+class FirstRequestTimer:
+    """ASGI middleware recording seconds from process start until the first response completes."""
+
+    def __init__(self, app):
+        self.app = app
+        self.recorded = False
+
+    async def __call__(self, scope, receive, send):
+        if self.recorded or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_and_record(message):
+            await send(message)
+            if (
+                not self.recorded
+                and message["type"] == "http.response.body"
+                and not message.get("more_body", False)
+            ):
+                self.recorded = True
+                metrics.set_gauge("startup.first_request_seconds", time.time() - PROCESS_STARTED_AT)
+
+        await self.app(scope, receive, send_and_record)
+
+
+def import_breakdown(module: str = "app.main") -> list[tuple[str, float]]:
+    """
+    Import module in a fresh interpreter with -X importtime.
+    Returns (module name, cumulative milliseconds), slowest first.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        timings.append((name.strip(), int(cumulative) / 1000))
+    return sorted(timings, key=lambda t: t[1], reverse=True)
+
+
+def import_time_ms(module: str = "app.main") -> float:
+    """Cumulative import time of module (and everything it pulls in) in a fresh interpreter."""
+    return next(ms for name, ms in import_breakdown(module) if name == module)
+
+
+if __name__ == "__main__":
+    for name, ms in import_breakdown()[:25]:
+        print(f"{ms:10.1f} ms  {name}")
@@ -0,0 +1,284 @@
+"""
+Product stock: atomic decrements at checkout and optional soft reservations.
+
+product_stock.available is the number of units that can still be sold; products
+without a row are not stock-tracked. Every change is a single relative UPDATE
+(``available = available - ?``) guarded by the column's CHECK (available >= 0),
+never a read-then-write, so a flash sale on one SKU costs each buyer one short
+write and an oversell is impossible: a decrement past zero fails its statement
+and the caller's transaction rolls back.
+
+At checkout the trigger from migration 011 deducts every line inside the
+checkout UPDATE itself. With STOCK_RESERVATION_SECONDS > 0, adding to the cart
+also reserves the units (deducting them at once) for that long; checkout then
+only deducts what is not reserved, and expired reservations are returned to
+stock in bulk by a reaper thread.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+from app import metrics
+from app.database import SHARD_COUNT, get_db
+
+logger = logging.getLogger(__name__)
+
+# 0 disables reservations: stock is only deducted at checkout.
+STOCK_RESERVATION_SECONDS = float(os.getenv("STOCK_RESERVATION_SECONDS", "0"))
+STOCK_REAPER_INTERVAL_SECONDS = float(os.getenv("STOCK_REAPER_INTERVAL_SECONDS", "30"))
+STOCK_REAPER_BATCH_SIZE = int(os.getenv("STOCK_REAPER_BATCH_SIZE", "1000"))
+
+
+class InsufficientStock(Exception):
+    """Not enough units available for the given products (product id -> units missing)."""
+
+    def __init__(self, shortfalls: dict[int, int]):
+        self.shortfalls = shortfalls
+        self.product_ids = list(shortfalls)
+        super().__init__(f"Insufficient stock for product(s): {', '.join(map(str, self.product_ids))}")
+
+
+def is_stock_shortage(error: sqlite3.IntegrityError) -> bool:
+    """Whether an IntegrityError is product_stock's CHECK rejecting a decrement past zero."""
+    return "CHECK constraint failed" in str(error) and "available" in str(error)
+
+
+def reservations_enabled() -> bool:
+    return STOCK_RESERVATION_SECONDS > 0
+
+
+def set_stock(conn: sqlite3.Connection, product_id: int, available: int) -> bool:
+    """Set the units available for a product (starts tracking it). False if there is no such product."""
+    row = conn.execute(
+        """
+        INSERT INTO product_stock (product_id, available) SELECT id, ? FROM products WHERE id = ?
+        ON CONFLICT (product_id) DO UPDATE SET available = excluded.available
+        RETURNING product_id
+        """,
+        (available, product_id),
+    ).fetchone()
+    return row is not None
+
+
+def distribute_stock(product_id: int, available: int) -> bool:
+    """
+    Set a product's stock. With several shards it is split evenly and each shard
+    sells its own share, so checkouts do not coordinate across files; a shard
+    that runs short pulls the units it is missing from the others (see gather_stock()).
+    """
+    share, extra = divmod(available, SHARD_COUNT)
+    for shard in range(SHARD_COUNT):
+        with get_db(shard=shard) as conn:
+            if not set_stock(conn, product_id, share + (1 if shard < extra else 0)):
+                return False
+    return True
+
+
+def _take_stock(shard: int, product_id: int, units: int) -> int:
+    """Take up to `units` of a product's stock from one shard; returns the units taken."""
+    with get_db(shard=shard) as conn:
+        while units > 0:
+            # A relative decrement, only if the shard still has the units; else take what it has now.
+            taken = conn.execute(
+                "UPDATE product_stock SET available = available - ? WHERE product_id = ? AND available >= ?",
+                (units, product_id, units),
+            ).rowcount
+            if taken:
+                return units
+            row = conn.execute("SELECT available FROM product_stock WHERE product_id = ?", (product_id,)).fetchone()
+            units = min(units, row["available"]) if row is not None else 0
+    return 0
+
+
+def gather_stock(shard: int, shortfalls: dict[int, int]) -> int:
+    """
+    Move the missing units of products (product id -> units) from the other shards to
+    `shard`, for a shard that ran short: a product then only sells out once every shard
+    has. Only the shortfall moves, so the other shards keep selling their own share.
+    Units are taken before they are added, so an interruption in between can undersell
+    but never oversell. Returns the units moved (0 with a single shard).
+    """
+    moved = 0
+    for product_id, missing in shortfalls.items():
+        units = 0
+        # Donors in turn after this shard, so concurrent gatherers start at different files.
+        for step in range(1, SHARD_COUNT):
+            if units >= missing:
+                break
+            units += _take_stock((shard + step) % SHARD_COUNT, product_id, missing - units)
+        if units:
+            with get_db(shard=shard) as conn:
+                conn.execute(
+                    "UPDATE product_stock SET available = available + ? WHERE product_id = ?", (units, product_id)
+                )
+            moved += units
+    if moved:
+        metrics.inc("stock.units_gathered", moved)
+    return moved
+
+
+def cart_shortages(conn: sqlite3.Connection, user_id: int) -> dict[int, int]:
+    """Units missing (by product id) where the unreserved quantity of an active cart line exceeds the stock."""
+    rows = conn.execute(
+        """
+        SELECT ci.product_id, ci.quantity - COALESCE(r.quantity, 0) - s.available AS missing
+        FROM cart c
+        JOIN cart_items ci ON ci.cart_id = c.id
+        JOIN product_stock s ON s.product_id = ci.product_id
+        LEFT JOIN stock_reservations r ON r.cart_id = c.id AND r.product_id = ci.product_id
+        WHERE c.user_id = ? AND c.status = 'active'
+          AND ci.quantity - COALESCE(r.quantity, 0) > s.available
+        ORDER BY ci.product_id
+        """,
+        (user_id,),
+    ).fetchall()
+    return {row["product_id"]: row["missing"] for row in rows}
+
+
+def reserve(conn: sqlite3.Connection, cart_id: int, product_id: int, quantity: int) -> None:
+    """
+    Make the cart's reservation for a product cover `quantity` units (0 releases it),
+    deducting or returning only the difference, and restart its expiry. Runs in the
+    caller's transaction. Raises InsufficientStock; untracked products are not reserved.
+    """
+    held = conn.execute(
+        "SELECT quantity FROM stock_reservations WHERE cart_id = ? AND product_id = ?",
+        (cart_id, product_id),
+    ).fetchone()
+    delta = quantity - (held["quantity"] if held else 0)
+    if delta:
+        try:
+            tracked = conn.execute(
+                "UPDATE product_stock SET available = available - ? WHERE product_id = ? RETURNING 1",
+                (delta, product_id),
+            ).fetchone()
+        except sqlite3.IntegrityError as e:
+            if is_stock_shortage(e):
+                metrics.inc("stock.reservation_rejected")
+                row = conn.execute("SELECT available FROM product_stock WHERE product_id = ?", (product_id,)).fetchone()
+                raise InsufficientStock({product_id: delta - row["available"]})
+            raise
+        if tracked is None:
+            return
+    if quantity > 0:
+        conn.execute(
+            """
+            INSERT INTO stock_reservations (cart_id, product_id, quantity, expires_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT (cart_id, product_id) DO UPDATE SET
+                quantity = excluded.quantity, expires_at = excluded.expires_at
+            """,
+            (cart_id, product_id, quantity, time.time() + STOCK_RESERVATION_SECONDS),
+        )
+    elif held:
+        conn.execute("DELETE FROM stock_reservations WHERE cart_id = ? AND product_id = ?", (cart_id, product_id))
+
+
+def expire_reservations(now: Optional[float] = None, batch_size: Optional[int] = None) -> int:
+    """
+    Return the units of expired reservations to stock, one transaction per batch
+    (a DELETE ... RETURNING and one relative UPDATE per product). Returns reservations expired.
+    """
+    now = time.time() if now is None else now
+    batch_size = batch_size or STOCK_REAPER_BATCH_SIZE
+    expired = 0
+    for shard in range(SHARD_COUNT):
+        expired += _expire_shard(shard, now, batch_size)
+    if expired:
+        metrics.inc("stock.reservations_expired", expired)
+    return expired
+
+
+def _restock(conn: sqlite3.Connection, rows: list[sqlite3.Row]) -> None:
+    """Return deleted reservations (product_id, quantity rows) to stock, one relative UPDATE per product."""
+    units = Counter()
+    for row in rows:
+        units[row["product_id"]] += row["quantity"]
+    conn.executemany(
+        "UPDATE product_stock SET available = available + ? WHERE product_id = ?",
+        [(quantity, product_id) for product_id, quantity in units.items()],
+    )
+
+
+def release_cart_reservations(conn: sqlite3.Connection, cart_ids: list[int]) -> int:
+    """Delete the reservations of carts and return their units to stock, in the caller's transaction. Returns rows."""
+    rows = conn.execute(
+        """
+        DELETE FROM stock_reservations WHERE cart_id IN (SELECT value FROM json_each(?))
+        RETURNING product_id, quantity
+        """,
+        (json.dumps(cart_ids),),
+    ).fetchall()
+    _restock(conn, rows)
+    return len(rows)
+
+
+def _expire_shard(shard: int, now: float, batch_size: int) -> int:
+    expired = 0
+    while True:
+        with get_db(shard=shard) as conn:
+            rows = conn.execute(
+                """
+                DELETE FROM stock_reservations WHERE (cart_id, product_id) IN (
+                    SELECT cart_id, product_id FROM stock_reservations WHERE expires_at <= ? LIMIT ?
+                )
+                RETURNING product_id, quantity
+                """,
+                (now, batch_size),
+            ).fetchall()
+            _restock(conn, rows)
+        expired += len(rows)
+        if len(rows) < batch_size:
+            return expired
+
+
+def has_reservations() -> bool:
+    """Whether any shard holds reservations (possibly taken before reservations were disabled)."""
+    for shard in range(SHARD_COUNT):
+        with get_db(shard=shard) as conn:
+            if conn.execute("SELECT EXISTS (SELECT 1 FROM stock_reservations)").fetchone()[0]:
+                return True
+    return False
+
+
+class ReservationReaper:
+    """
+    Background thread expiring reservations every interval. With reservations disabled
+    it keeps returning those taken before, until none are left.
+    """
+
+    def __init__(self, interval: float = STOCK_REAPER_INTERVAL_SECONDS):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start the reaper thread (idempotent)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="stock-reaper", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                # A read first: with nothing held, a pass takes no write lock.
+                if reservations_enabled() or has_reservations():
+                    expire_reservations()
+            except sqlite3.Error:
+                logger.exception("Expiring stock reservations failed")
+
+
+reaper = ReservationReaper()
@@ -0,0 +1,104 @@
+"""
+Startup warm-up and readiness.
+
+The first requests after a deploy would otherwise pay for opening database
+connections, loading the catalog, a cold page cache, building the bcrypt
+context and importing the JWT library. The lifespan handler in app.main starts
+warm-up in a background thread; GET /health/ready answers 503 until it has
+finished, so the load balancer only routes traffic to warmed workers.
+"""
+
+import logging
+import threading
+import time
+
+from app import catalog, metrics
+from app.auth import create_access_token, decode_access_token, hash_password
+from app.database import SHARD_COUNT, STORAGE_BACKEND, get_db, get_pool
+
+logger = logging.getLogger(__name__)
+
+# Tables whose indexes are read on the hot request paths.
+HOT_TABLES = ("users", "products", "cart", "cart_items")
+
+_ready = threading.Event()
+_started = False
+_start_lock = threading.Lock()
+
+
+def is_ready() -> bool:
+    return _ready.is_set()
+
+
+def wait_until_ready(timeout: float) -> bool:
+    """Block until warm-up has finished. Returns False on timeout."""
+    return _ready.wait(timeout)
+
+
+def _prefill_pools() -> None:
+    for shard in range(SHARD_COUNT):
+        get_pool(shard).prefill()
+
+
+def _preread_indexes() -> None:
+    """Scan each index of the hot tables once so its pages are in the OS page cache."""
+    for shard in range(SHARD_COUNT):
+        _preread_shard_indexes(shard)
+
+
+def _preread_shard_indexes(shard: int) -> None:
+    with get_db(shard=shard) as conn:
+        for table in HOT_TABLES:
+            for index in conn.execute("SELECT name, partial FROM pragma_index_list(?)", (table,)).fetchall():
+                if index["partial"]:
+                    continue  # cannot serve a query without its WHERE clause ("no query solution")
+                column = conn.execute(
+                    "SELECT name FROM pragma_index_info(?) ORDER BY seqno LIMIT 1", (index["name"],)
+                ).fetchone()
+                if column is None or column["name"] is None:
+                    continue  # expression index
+                conn.execute(f'SELECT COUNT("{column["name"]}") FROM "{table}" INDEXED BY "{index["name"]}"')
+            conn.execute(f'SELECT COUNT(*) FROM "{table}"')
+
+
+def _warm_auth() -> None:
+    """Build the bcrypt context and JWT machinery with one dummy hash and token round-trip."""
+    hash_password("warm-up")
+    decode_access_token(create_access_token({"sub": "0"}))
+
+
+WARMUP_STEPS = (
+    ("connections", _prefill_pools),
+    ("catalog", catalog.get_products),
+    ("indexes", _preread_indexes),
+    ("auth", _warm_auth),
+)
+# Steps that warm the SQLite files, skipped with the memory backend.
+SQLITE_STEPS = ("connections", "indexes")
+
+
+def run_warmup() -> None:
+    """Run every warm-up step, then mark the worker ready. A failing step is logged and skipped."""
+    started = time.perf_counter()
+    for name, step in WARMUP_STEPS:
+        if STORAGE_BACKEND != "sqlite" and name in SQLITE_STEPS:
+            continue
+        step_started = time.perf_counter()
+        try:
+            step()
+        except Exception:
+            logger.exception("Warm-up step %s failed", name)
+            metrics.inc("warmup.failures")
+        metrics.observe(f"warmup.step.{name}", time.perf_counter() - step_started)
+    metrics.set_gauge("warmup.duration_seconds", time.perf_counter() - started)
+    _ready.set()
+
+
+def start_warmup() -> None:
+    """Start warm-up in a background thread (once per process)."""
+    global _started
+    with _start_lock:
+        if _started:
+            return
+        _started = True
+    threading.Thread(target=run_warmup, name="warmup", daemon=True).start()
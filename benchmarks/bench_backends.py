@@ -0,0 +1,123 @@
+"""
+Benchmark: framework overhead vs. storage cost, per storage backend.
+
+Times common operations twice on each STORAGE_BACKEND: as full HTTP requests
+through the app (routing, validation, JWT, caches, storage) and as the bare
+repository call the route makes. The memory backend's request time is almost
+all framework; the SQLite minus memory difference is what SQLite I/O costs. The
+backend is chosen at import time, so each one runs in a fresh process on a
+scratch database. Reports mean microseconds per operation.
+
+Usage:
+    python benchmarks/bench_backends.py [--iterations 2000]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+OPERATIONS = ("add to cart", "view cart (cache miss)", "rename item", "list items")
+
+
+def _mean_us(call: Callable[[int], object], iterations: int) -> float:
+    call(0)
+    started = time.perf_counter()
+    for n in range(iterations):
+        call(n)
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def run_child(iterations: int) -> dict:
+    """Time every operation on the backend in STORAGE_BACKEND."""
+    from migrate import run_migrations
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        run_migrations("upgrade")
+
+    from fastapi.testclient import TestClient
+
+    from app import repositories
+    from app.auth import create_access_token
+    from app.cart_cache import cart_cache
+    from app.main import app
+
+    # A dummy hash: bcrypt would dominate, and login is not measured.
+    user_id = repositories.users.create("bench@example.com", "x")
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': str(user_id)})}"}
+    product_ids = [product["id"] for product in repositories.products.list_all()][:20]
+    item_id = repositories.items.create_many(["bench item"])[0]["id"]
+
+    def no_store(tx, result):
+        pass
+
+    def view_cart(n: int):
+        cart_cache.invalidate(user_id)
+        return client.get("/cart", headers=headers)
+
+    with TestClient(app) as client:
+        requests = {
+            "add to cart": lambda n: client.post(
+                "/cart/items", json={"product_id": product_ids[n % len(product_ids)], "quantity": 1}, headers=headers
+            ),
+            "view cart (cache miss)": view_cart,
+            "rename item": lambda n: client.put(f"/items/{item_id}", json={"name": f"bench item {n}"}),
+            "list items": lambda n: client.get("/items?limit=20"),
+        }
+        storage = {
+            "add to cart": lambda n: repositories.carts.add_item(
+                user_id, product_ids[n % len(product_ids)], 1, no_store
+            ),
+            "view cart (cache miss)": lambda n: repositories.carts.get_active(user_id),
+            "rename item": lambda n: repositories.items.update_many([(item_id, f"bench item {n}")]),
+            "list items": lambda n: repositories.items.list_page(0, 21),
+        }
+        return {
+            name: {"request": _mean_us(requests[name], iterations), "storage": _mean_us(storage[name], iterations)}
+            for name in OPERATIONS
+        }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.iterations)))
+        return
+
+    results = {}
+    for backend in ("sqlite", "memory"):
+        tmp = tempfile.mkdtemp()
+        env = {**os.environ, "STORAGE_BACKEND": backend, "DATABASE_PATH": os.path.join(tmp, "bench.db")}
+        command = [sys.executable, os.path.abspath(__file__), "--child", "--iterations", str(args.iterations)]
+        output = subprocess.run(command, env=env, cwd=ROOT, capture_output=True, text=True, check=True).stdout
+        results[backend] = json.loads(output.splitlines()[-1])
+
+    print(f"mean microseconds per operation, {args.iterations} iterations")
+    print(
+        f"{'operation':<24} {'sqlite req':>11} {'memory req':>11} {'sqlite store':>13} {'memory store':>13}"
+        f" {'framework':>10}"
+    )
+    for name in OPERATIONS:
+        sqlite, memory = results["sqlite"][name], results["memory"][name]
+        framework = memory["request"] - memory["storage"]
+        print(
+            f"{name:<24} {sqlite['request']:>11.0f} {memory['request']:>11.0f} {sqlite['storage']:>13.1f}"
+            f" {memory['storage']:>13.1f} {framework:>10.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark: /cart latency while an online backup runs.
+
+Fills a scratch database (WAL mode, as in production) with padding rows, then
+sends cart requests (add an item, view the cart) through the app while idle,
+during a stepped backup API copy, and during VACUUM INTO. Reports p50/p99
+request latency for each phase and the backup's bytes/sec. The backup runs in
+a thread of the same process, as the admin endpoint would.
+
+Usage:
+    python benchmarks/bench_backup.py [--padding-mb 64] [--requests 400]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def _cart_latencies(client, headers, product_id, requests, until=None) -> list[float]:
+    latencies = []
+    for _ in range(requests):
+        if until is not None and until.is_set():
+            break
+        for method, path, body in (
+            ("POST", "/cart/items", {"product_id": product_id, "quantity": 1}),
+            ("GET", "/cart", None),
+        ):
+            started = time.perf_counter()
+            client.request(method, path, json=body, headers=headers).raise_for_status()
+            latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--padding-mb", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=400, help="Cart request pairs per phase")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ["DATABASE_PATH"] = os.path.join(tmp, "bench.db")
+    from migrate import run_migrations
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        run_migrations("upgrade")
+
+    from fastapi.testclient import TestClient
+
+    from app import backup
+    from app.auth import create_access_token
+    from app.database import get_db
+    from app.main import app
+
+    with get_db() as conn:
+        conn.executemany("INSERT INTO items (name) VALUES (?)", [("x" * 1000,)] * (args.padding_mb * 1000))
+        user_id = conn.execute(
+            "INSERT INTO users (email, password) VALUES ('bench@example.com', 'x') RETURNING id"
+        ).fetchone()[0]
+        product_id = conn.execute("SELECT id FROM products ORDER BY id LIMIT 1").fetchone()[0]
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': str(user_id)})}"}
+
+    print(f"{args.padding_mb} MB database, {args.requests} add+view pairs per phase, {os.cpu_count()} CPU(s)")
+    print(f"{'phase':<22} {'p50 ms':>7} {'p99 ms':>7} {'requests':>9} {'MB/s':>7}")
+    with TestClient(app) as client:
+        phases = [("idle", None), ("backup API, stepped", False), ("VACUUM INTO", True)]
+        for n, (name, vacuum) in enumerate(phases):
+            report, done = {}, threading.Event()
+            thread = None
+            if vacuum is not None:
+
+                def run(vacuum=vacuum, directory=os.path.join(tmp, f"backup{n}")):
+                    report.update(backup.run_backup(directory, vacuum=vacuum))
+                    done.set()
+
+                thread = threading.Thread(target=run)
+                thread.start()
+            latencies = _cart_latencies(client, headers, product_id, args.requests, done if thread else None)
+            if thread is not None:
+                thread.join()
+            percentiles = statistics.quantiles(latencies, n=100)
+            rate = f"{report['bytes_per_sec'] / 1e6:>7.1f}" if report else f"{'':>7}"
+            p50, p99 = percentiles[49] * 1000, percentiles[98] * 1000
+            print(f"{name:<22} {p50:>7.2f} {p99:>7.2f} {len(latencies):>9} {rate}")
+
+
+if __name__ == "__main__":
+    main()
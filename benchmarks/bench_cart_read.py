@@ -0,0 +1,103 @@
+"""
+Benchmark: cart read with products JOIN vs. snapshot columns on cart_items.
+
+Builds a scratch database with a large catalog and carts of increasing size, then
+times the old read path (cart_items JOIN products) against the join-free one.
+
+Usage:
+    python benchmarks/bench_cart_read.py [--products 100000] [--iterations 200]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+JOIN_QUERY = """
+    SELECT ci.id, ci.product_id, p.name AS product_name, p.price, ci.quantity,
+           (p.price * ci.quantity) AS subtotal
+    FROM cart_items ci
+    JOIN products p ON p.id = ci.product_id
+    WHERE ci.cart_id = ?
+    ORDER BY ci.id
+"""
+SNAPSHOT_QUERY = """
+    SELECT id, product_id, product_name, unit_price AS price, quantity,
+           (unit_price * quantity) AS subtotal
+    FROM cart_items
+    WHERE cart_id = ?
+    ORDER BY id
+"""
+JOIN_TOTAL = """
+    SELECT COALESCE(SUM(p.price * ci.quantity), 0)
+    FROM cart_items ci JOIN products p ON p.id = ci.product_id WHERE ci.cart_id = ?
+"""
+SNAPSHOT_TOTAL = "SELECT COALESCE(SUM(unit_price * quantity), 0) FROM cart_items WHERE cart_id = ?"
+
+
+def build(path: str, products: int, cart_sizes: list[int]) -> None:
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE products (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, price REAL NOT NULL);
+        CREATE TABLE cart_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            cart_id INTEGER NOT NULL,
+            product_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL,
+            product_name TEXT,
+            unit_price REAL,
+            UNIQUE(cart_id, product_id)
+        );
+    """)
+    conn.executemany(
+        "INSERT INTO products (name, price) VALUES (?, ?)",
+        ((f"Product {i} " + "x" * 40, round(random.uniform(1, 500), 2)) for i in range(products)),
+    )
+    for cart_id, size in enumerate(cart_sizes, start=1):
+        for product_id in random.sample(range(1, products + 1), size):
+            name, price = conn.execute("SELECT name, price FROM products WHERE id = ?", (product_id,)).fetchone()
+            conn.execute(
+                "INSERT INTO cart_items (cart_id, product_id, quantity, product_name, unit_price) VALUES (?, ?, ?, ?, ?)",
+                (cart_id, product_id, random.randint(1, 5), name, price),
+            )
+    conn.commit()
+    conn.close()
+
+
+def time_query(conn: sqlite3.Connection, sql: str, cart_id: int, iterations: int) -> float:
+    """Mean microseconds per execution (including fetching all rows)."""
+    conn.execute(sql, (cart_id,)).fetchall()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        conn.execute(sql, (cart_id,)).fetchall()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    cart_sizes = [10, 100, 500, 2000]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        build(path, args.products, cart_sizes)
+        conn = sqlite3.connect(path)
+        print(f"{'lines':>6} {'join read':>12} {'snapshot':>12} {'speedup':>8} {'join total':>12} {'snap total':>12}")
+        for cart_id, size in enumerate(cart_sizes, start=1):
+            join_us = time_query(conn, JOIN_QUERY, cart_id, args.iterations)
+            snap_us = time_query(conn, SNAPSHOT_QUERY, cart_id, args.iterations)
+            join_total = time_query(conn, JOIN_TOTAL, cart_id, args.iterations)
+            snap_total = time_query(conn, SNAPSHOT_TOTAL, cart_id, args.iterations)
+            print(
+                f"{size:>6} {join_us:>10.1f}us {snap_us:>10.1f}us {join_us / snap_us:>7.2f}x"
+                f" {join_total:>10.1f}us {snap_total:>10.1f}us"
+            )
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
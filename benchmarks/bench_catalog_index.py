@@ -0,0 +1,100 @@
+"""
+Benchmark: price-range and top-N queries on the columnar catalog index vs. SQLite.
+
+Builds a synthetic catalog, reports the index's memory use per million products,
+and times "products between X and Y sorted by price" and "N cheapest" against the
+same queries on an indexed SQLite table.
+
+Usage:
+    python benchmarks/bench_catalog_index.py [--products 1000000] [--iterations 200]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.catalog_index import CatalogIndex  # noqa: E402
+
+RANGE_SQL = """
+    SELECT id, name, price_cents FROM products
+    WHERE price_cents BETWEEN ? AND ? ORDER BY price_cents, id LIMIT ?
+"""
+CHEAPEST_SQL = "SELECT id, name, price_cents FROM products ORDER BY price_cents, id LIMIT ?"
+
+
+def mean_us(fn, iterations: int) -> float:
+    fn()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--products", type=int, default=1000000)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    products = [
+        {"id": i, "name": f"Product {i}", "price_cents": random.randint(100, 50000)}
+        for i in range(1, args.products + 1)
+    ]
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    index = CatalogIndex(products, version=1)
+    build_seconds = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    stats = index.stats()
+    print(f"products: {len(index)}, build: {build_seconds:.2f}s, peak during build: {peak / 2**20:.1f} MiB")
+    print(
+        f"index: {stats['bytes'] / 2**20:.1f} MiB, "
+        f"{stats['bytes_per_million_products'] / 2**20:.1f} MiB per million products"
+    )
+
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE products (id INTEGER PRIMARY KEY, name TEXT NOT NULL, price_cents INTEGER NOT NULL)")
+    conn.executemany(
+        "INSERT INTO products VALUES (?, ?, ?)", ((p["id"], p["name"], p["price_cents"]) for p in products)
+    )
+    conn.execute("CREATE INDEX idx_products_price ON products (price_cents, id)")
+
+    low, high, limit = 10000, 12000, args.limit
+    cases = [
+        (
+            f"range {low}-{high} sort=price limit={limit}",
+            lambda: index.query(low, high, sort="price", limit=limit),
+            lambda: conn.execute(RANGE_SQL, (low, high, limit)).fetchall(),
+        ),
+        (
+            f"cheapest {limit}",
+            lambda: index.query(sort="price", limit=limit),
+            lambda: conn.execute(CHEAPEST_SQL, (limit,)).fetchall(),
+        ),
+        (
+            f"count in range {low}-{high}",
+            lambda: len(index.price_range(low, high)),
+            lambda: conn.execute(
+                "SELECT COUNT(*) FROM products WHERE price_cents BETWEEN ? AND ?", (low, high)
+            ).fetchone(),
+        ),
+    ]
+    print(f"{'query':<40} {'index':>10} {'sqlite':>10} {'speedup':>8}")
+    for name, index_fn, sql_fn in cases:
+        index_us = mean_us(index_fn, args.iterations)
+        sql_us = mean_us(sql_fn, args.iterations)
+        print(f"{name:<40} {index_us:>8.1f}us {sql_us:>8.1f}us {sql_us / index_us:>7.1f}x")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
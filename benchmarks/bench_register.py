@@ -0,0 +1,99 @@
+"""
+Benchmark: sign-up spike throughput, check-then-insert vs. hash-first single insert.
+
+Runs N registrations from a pool of threads sharing a small connection pool
+(as request threads share app.database's pool) against a scratch database:
+
+- old: borrow a connection, SELECT the email, bcrypt-hash, INSERT
+- new: bcrypt-hash, borrow a connection, INSERT (the unique index decides duplicates)
+
+Reports users/sec and how long each registration holds a connection.
+
+Usage:
+    python benchmarks/bench_register.py [--users 200] [--threads 16] [--connections 4]
+"""
+
+import argparse
+import os
+import queue
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.auth import hash_password  # noqa: E402
+
+SCHEMA = """
+    CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, email TEXT NOT NULL UNIQUE, password TEXT NOT NULL);
+    CREATE UNIQUE INDEX idx_users_email_lower ON users (lower(email));
+"""
+
+
+def register_old(pool: queue.Queue, email: str) -> float:
+    conn = pool.get()
+    held = time.perf_counter()
+    try:
+        if conn.execute("SELECT id FROM users WHERE email = ?", (email,)).fetchone() is None:
+            conn.execute("INSERT INTO users (email, password) VALUES (?, ?)", (email, hash_password("secret123")))
+        conn.commit()
+    finally:
+        held = time.perf_counter() - held
+        pool.put(conn)
+    return held
+
+
+def register_new(pool: queue.Queue, email: str) -> float:
+    hashed = hash_password("secret123")
+    conn = pool.get()
+    held = time.perf_counter()
+    try:
+        conn.execute("INSERT INTO users (email, password) VALUES (?, ?) RETURNING id", (email, hashed)).fetchone()
+        conn.commit()
+    except sqlite3.IntegrityError:
+        conn.rollback()
+    finally:
+        held = time.perf_counter() - held
+        pool.put(conn)
+    return held
+
+
+def run(flow, users: int, threads: int, connections: int) -> tuple[float, float]:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        setup = sqlite3.connect(path)
+        setup.executescript(SCHEMA)
+        setup.execute("PRAGMA journal_mode = WAL")
+        setup.close()
+        pool: queue.Queue = queue.Queue()
+        for _ in range(connections):
+            conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+            pool.put(conn)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            held = list(executor.map(lambda i: flow(pool, f"user{i}@example.com"), range(users)))
+        elapsed = time.perf_counter() - started
+        while not pool.empty():
+            pool.get().close()
+    return users / elapsed, sum(held) / len(held) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--connections", type=int, default=4)
+    args = parser.parse_args()
+
+    hash_password("warm-up")
+    print(f"{args.users} sign-ups, {args.threads} threads, {args.connections} pooled connections")
+    print(f"{'flow':<28} {'users/sec':>10} {'conn held':>12}")
+    for name, flow in (("select + hash + insert", register_old), ("hash, then single insert", register_new)):
+        rate, held_ms = run(flow, args.users, args.threads, args.connections)
+        print(f"{name:<28} {rate:>10.1f} {held_ms:>10.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Benchmark: cart write throughput by shard count.
+
+Many users add items to their carts concurrently through the real add-to-cart
+path. With one shard every write queues on the single database's write lock;
+with several, users' writes land in their own shard file and only contend with
+writers of the same shard. SHARD_COUNT is read at import time, so each shard
+count runs in a fresh process on its own scratch databases. Reports cart
+writes/sec and p99 write latency.
+
+Usage:
+    python benchmarks/bench_shard_writes.py [--shards 1,2,4,8] [--users 400] [--writes 4000] [--threads 32]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def run_child(users: int, writes: int, threads: int) -> dict:
+    """Measure one shard count (the one in SHARD_COUNT) and return its results."""
+    from migrate import run_migrations
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        run_migrations("upgrade")
+
+    from fastapi import Response
+
+    from app.database import SHARD_COUNT, get_db, shard_for_email
+    from app.routes.cart import AddItemRequest, add_cart_item
+
+    user_ids = []
+    for n in range(users):
+        email = f"writer{n}@example.com"
+        with get_db(shard=shard_for_email(email)) as conn:
+            user_ids.append(
+                conn.execute("INSERT INTO users (email, password) VALUES (?, 'x') RETURNING id", (email,)).fetchone()[0]
+            )
+    with get_db() as conn:
+        product_ids = [row[0] for row in conn.execute("SELECT id FROM products ORDER BY id LIMIT 20")]
+
+    def write(n: int) -> float:
+        started = time.perf_counter()
+        body = AddItemRequest(product_id=product_ids[n % len(product_ids)], quantity=1)
+        add_cart_item(body, Response(), user_id=user_ids[n % len(user_ids)], idempotency_key=None)
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        latencies = list(pool.map(write, range(writes)))
+    elapsed = time.perf_counter() - started
+    return {
+        "shards": SHARD_COUNT,
+        "writes_per_sec": writes / elapsed,
+        "p99_ms": statistics.quantiles(latencies, n=100)[98] * 1000,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--shards", default="1,2,4,8", help="Comma-separated shard counts")
+    parser.add_argument("--users", type=int, default=400)
+    parser.add_argument("--writes", type=int, default=4000)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.users, args.writes, args.threads)))
+        return
+
+    print(f"{args.writes} cart writes by {args.users} users, {args.threads} threads, {os.cpu_count()} CPU(s)")
+    print(f"{'shards':>6} {'writes/s':>10} {'p99 ms':>8}")
+    for shards in [int(s) for s in args.shards.split(",")]:
+        tmp = tempfile.mkdtemp()
+        env = {
+            **os.environ,
+            "DATABASE_PATH": os.path.join(tmp, "bench.db"),
+            "SHARD_COUNT": str(shards),
+            "DB_POOL_SIZE": str(args.threads),
+        }
+        command = [
+            sys.executable, os.path.abspath(__file__), "--child",
+            "--users", str(args.users), "--writes", str(args.writes), "--threads", str(args.threads),
+        ]
+        output = subprocess.run(command, env=env, cwd=ROOT, capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.splitlines()[-1])
+        print(f"{result['shards']:>6} {result['writes_per_sec']:>10.0f} {result['p99_ms']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark: database load during a cache-miss stampede, with and without single-flight.
+
+Simulates N concurrent GET /products (catalog invalidated) and N concurrent GET /cart
+for one user (cart view invalidated) on a scratch database, and counts the queries
+issued and the wall time until every caller has its result.
+
+Usage:
+    python benchmarks/bench_stampede.py [--callers 200] [--products 20000]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def stampede(fn, callers: int) -> float:
+    barrier = threading.Barrier(callers)
+
+    def call():
+        barrier.wait()
+        return fn()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=callers) as pool:
+        for future in [pool.submit(call) for _ in range(callers)]:
+            future.result()
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--callers", type=int, default=200)
+    parser.add_argument("--products", type=int, default=20000)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ["DATABASE_PATH"] = os.path.join(tmp, "bench.db")
+    os.environ["DB_POOL_SIZE"] = str(args.callers)
+
+    from migrate import run_migrations
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        run_migrations("upgrade")
+
+    from app import catalog
+    from app.cart_cache import CartCache
+    from app.database import get_db
+    from app.routes.cart import _load_cart_view
+
+    with get_db() as conn:
+        conn.executemany(
+            "INSERT INTO products (name, price_cents) VALUES (?, ?)",
+            ((f"Product {i}", 100 + i) for i in range(args.products)),
+        )
+        conn.execute("INSERT INTO users (email, password) VALUES ('bench@example.com', 'x')")
+        user_id = conn.execute("SELECT id FROM users WHERE email = 'bench@example.com'").fetchone()[0]
+        cart_id = conn.execute(
+            "INSERT INTO cart (user_id, total_cents, status) VALUES (?, 0, 'active')", (user_id,)
+        ).lastrowid
+        conn.executemany(
+            "INSERT INTO cart_items (cart_id, product_id, quantity, product_name, unit_price_cents)"
+            " VALUES (?, ?, 1, 'p', 100)",
+            ((cart_id, product_id) for product_id in range(1, 201)),
+        )
+
+    queries = {"n": 0}
+    original_load = catalog._load
+
+    def counted_catalog_load():
+        queries["n"] += 1
+        return original_load()
+
+    def counted_cart_load(uid):
+        queries["n"] += 1
+        return _load_cart_view(uid)
+
+    catalog._load = counted_catalog_load
+    cart_cache = CartCache(10**6)
+    cases = [
+        ("catalog, every miss queries", counted_catalog_load),
+        ("catalog, single-flight", catalog.get_products),
+        ("cart, every miss queries", lambda: counted_cart_load(user_id)),
+        ("cart, single-flight", lambda: cart_cache.load(user_id, counted_cart_load)),
+    ]
+    print(f"{args.callers} concurrent callers")
+    print(f"{'case':<32} {'queries':>8} {'wall':>10}")
+    for name, fn in cases:
+        catalog.invalidate()
+        cart_cache.invalidate(user_id)
+        queries["n"] = 0
+        elapsed = stampede(fn, args.callers)
+        print(f"{name:<32} {queries['n']:>8} {elapsed * 1000:>8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Benchmark: checkouts of one hot SKU by many concurrent buyers.
+
+Every buyer has one unit of the same product in their cart and there is stock for
+half of them. Compares a naive read-check-write of the stock row (SELECT, then
+UPDATE to the computed value, retried on "database is locked") with the real
+checkout path, whose trigger applies a relative, CHECK-guarded decrement inside
+the checkout UPDATE. Reports checkouts/sec, units sold, oversold and left in stock
+(naive decrements overwrite each other), and lock retries.
+
+Usage:
+    python benchmarks/bench_stock_contention.py [--buyers 2000] [--threads 32]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--buyers", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=32)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ["DATABASE_PATH"] = os.path.join(tmp, "bench.db")
+    os.environ["DB_POOL_SIZE"] = str(args.threads)
+
+    from migrate import run_migrations
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        run_migrations("upgrade")
+
+    from app.database import get_db
+    from app.stock import is_stock_shortage, set_stock
+
+    with get_db() as conn:
+        product_id = conn.execute("INSERT INTO products (name, price_cents) VALUES ('Hot SKU', 999) RETURNING id").fetchone()[0]
+        conn.executemany(
+            "INSERT INTO users (email, password) VALUES (?, 'x')",
+            ((f"buyer{i}@example.com",) for i in range(args.buyers)),
+        )
+        user_ids = [row[0] for row in conn.execute("SELECT id FROM users ORDER BY id")]
+
+    def reset(stock: int) -> None:
+        with get_db() as conn:
+            conn.execute("DELETE FROM cart_items")
+            conn.execute("DELETE FROM cart")
+            conn.executemany(
+                "INSERT INTO cart (user_id, total_cents, status) VALUES (?, 0, 'active')", ((u,) for u in user_ids)
+            )
+            conn.execute(
+                "INSERT INTO cart_items (cart_id, product_id, quantity, product_name, unit_price_cents)"
+                " SELECT id, ?, 1, 'Hot SKU', 999 FROM cart",
+                (product_id,),
+            )
+            set_stock(conn, product_id, stock)
+
+    retries = {"n": 0}
+    retries_lock = threading.Lock()
+
+    def naive_checkout(user_id: int) -> bool:
+        while True:
+            try:
+                with get_db() as conn:
+                    available = conn.execute(
+                        "SELECT available FROM product_stock WHERE product_id = ?", (product_id,)
+                    ).fetchone()[0]
+                    if available < 1:
+                        return False
+                    conn.execute(
+                        "UPDATE product_stock SET available = ? WHERE product_id = ?", (available - 1, product_id)
+                    )
+                    conn.execute("UPDATE cart SET status = 'checked_out' WHERE user_id = ? AND status = 'active'", (user_id,))
+                return True
+            except sqlite3.OperationalError:
+                # A deferred transaction that read first cannot upgrade to a writer once another commits.
+                with retries_lock:
+                    retries["n"] += 1
+
+    def atomic_checkout(user_id: int) -> bool:
+        try:
+            with get_db() as conn:
+                conn.execute(
+                    "UPDATE cart SET status = 'checked_out' WHERE user_id = ? AND status = 'active' RETURNING total_cents",
+                    (user_id,),
+                ).fetchone()
+            return True
+        except sqlite3.IntegrityError as e:
+            if not is_stock_shortage(e):
+                raise
+            return False
+
+    stock = args.buyers // 2
+    print(f"{args.buyers} buyers, {args.threads} threads, {stock} units of one SKU")
+    print(f"{'case':<26} {'checkouts/s':>12} {'sold':>6} {'oversold':>9} {'left':>6} {'retries':>8}")
+    for name, checkout in [("naive read-check-write", naive_checkout), ("conditional decrement", atomic_checkout)]:
+        reset(stock)
+        retries["n"] = 0
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            sold = sum(pool.map(checkout, user_ids))
+        elapsed = time.perf_counter() - started
+        with get_db() as conn:
+            left = conn.execute("SELECT available FROM product_stock WHERE product_id = ?", (product_id,)).fetchone()[0]
+        oversold = max(sold - stock, 0)
+        print(f"{name:<26} {args.buyers / elapsed:>12.0f} {sold:>6} {oversold:>9} {left:>6} {retries['n']:>8}")
+
+
+if __name__ == "__main__":
+    main()
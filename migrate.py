@@ -2,15 +2,32 @@
 Database Migration Runner
 
 This script runs all pending migrations in order or reverts them.
+With SHARD_COUNT > 1 every action runs on all shard files in parallel,
+one process per shard.
 """
 
 import os
+import sys
 import glob
 import importlib.util
 import argparse
 import sqlite3
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
 
-from app.database import DATABASE_PATH
+from app import database
+from app.database import (
+    SHARD_COUNT,
+    SHARD_ID_BITS,
+    SHARDED_TABLES,
+    ShardCountMismatch,
+    check_shard_count,
+    is_memory_database,
+    shard_path,
+)
+
+# Marks the per-shard processes started by run_on_all_shards().
+SHARD_WORKER_ENV = "MIGRATE_SHARD_WORKER"
 
 
 def get_migration_files():
@@ -30,24 +47,123 @@ def load_migration_module(filepath):
     return module
 
 
+def seed_shard_id_range(shard):
+    """Start the AUTOINCREMENT sequences of the sharded tables at the shard's id range."""
+    base = shard << SHARD_ID_BITS
+    conn = sqlite3.connect(shard_path(shard), uri=True)
+    try:
+        for table in SHARDED_TABLES:
+            row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone()
+            if row is None:
+                conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)", (table, base))
+            elif row[0] < base:
+                conn.execute("UPDATE sqlite_sequence SET seq = ? WHERE name = ?", (base, table))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def check_recorded_shard_count():
+    """Refuse to migrate with another SHARD_COUNT than the one recorded in shard 0."""
+    conn = sqlite3.connect(shard_path(0), uri=True)
+    try:
+        check_shard_count(conn)
+    except ShardCountMismatch as e:
+        raise SystemExit(str(e))
+    finally:
+        conn.close()
+
+
+def record_shard_count(action):
+    """Record SHARD_COUNT in shard 0 after an upgrade; forget it after a downgrade (no users left to place)."""
+    conn = sqlite3.connect(shard_path(0), uri=True)
+    try:
+        if action == "upgrade":
+            conn.execute("CREATE TABLE IF NOT EXISTS _meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            conn.execute("INSERT OR IGNORE INTO _meta (key, value) VALUES ('shard_count', ?)", (str(SHARD_COUNT),))
+        else:
+            conn.execute("DROP TABLE IF EXISTS _meta")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def run_on_all_shards(action):
+    """Run this script's action against every shard file in parallel, then report per shard."""
+    if is_memory_database(database.DATABASE_PATH):
+        raise SystemExit("in-memory databases live in one process: migrate them with SHARD_COUNT=1")
+
+    def run(shard):
+        env = {**os.environ, "DATABASE_PATH": shard_path(shard), "SHARD_COUNT": "1", SHARD_WORKER_ENV: "1"}
+        return subprocess.run(
+            [sys.executable, os.path.abspath(__file__), action], env=env, capture_output=True, text=True
+        )
+
+    with ThreadPoolExecutor(max_workers=SHARD_COUNT) as pool:
+        results = list(pool.map(run, range(SHARD_COUNT)))
+    failed = []
+    for shard, result in enumerate(results):
+        for line in (result.stdout + result.stderr).splitlines():
+            print(f"[shard {shard}] {line}")
+        if result.returncode != 0:
+            failed.append(shard)
+    if failed:
+        raise SystemExit(f"{action} failed on shard(s): {', '.join(map(str, failed))}")
+    if action == "upgrade":
+        for shard in range(SHARD_COUNT):
+            seed_shard_id_range(shard)
+
+
 def run_migrations(action="upgrade"):
     """Run all migrations."""
-    migration_files = get_migration_files()
-    
-    if action == "downgrade":
-        migration_files = reversed(migration_files)
-    
-    for filepath in migration_files:
+    # The per-shard processes see SHARD_COUNT=1; the parent keeps the record.
+    top_level = SHARD_WORKER_ENV not in os.environ
+    if top_level and action == "upgrade":
+        check_recorded_shard_count()
+    if SHARD_COUNT > 1:
+        run_on_all_shards(action)
+    else:
+        migration_files = get_migration_files()
+        if action == "downgrade":
+            migration_files = reversed(migration_files)
+        for filepath in migration_files:
+            module = load_migration_module(filepath)
+            if action == "upgrade":
+                module.upgrade()
+            elif action == "downgrade":
+                module.downgrade()
+    if top_level:
+        record_shard_count(action)
+
+
+def run_backfills():
+    """Run the pending backfills of applied migrations (those defining backfill())."""
+    if SHARD_COUNT > 1:
+        run_on_all_shards("backfill")
+        return
+    conn = sqlite3.connect(database.DATABASE_PATH, uri=True)
+    try:
+        applied = {row[0] for row in conn.execute("SELECT name FROM _migrations")}
+    except sqlite3.OperationalError:
+        applied = set()
+    finally:
+        conn.close()
+
+    for filepath in get_migration_files():
+        name = os.path.basename(filepath).replace(".py", "")
+        if name not in applied:
+            continue
         module = load_migration_module(filepath)
-        if action == "upgrade":
-            module.upgrade()
-        elif action == "downgrade":
-            module.downgrade()
+        if hasattr(module, "backfill"):
+            module.backfill()
 
 
 def list_migrations():
     """List all migrations and their status."""
-    conn = sqlite3.connect(DATABASE_PATH)
+    if SHARD_COUNT > 1:
+        run_on_all_shards("list")
+        return
+    conn = sqlite3.connect(database.DATABASE_PATH, uri=True)
     cursor = conn.cursor()
     
     # Ensure migrations table exists
@@ -84,13 +200,18 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Database migration runner")
     parser.add_argument(
         "action",
-        choices=["upgrade", "downgrade", "list"],
-        help="Migration action: upgrade (apply all), downgrade (revert all), list (show status)"
+        choices=["upgrade", "downgrade", "list", "backfill"],
+        help=(
+            "Migration action: upgrade (apply all), downgrade (revert all), list (show status), "
+            "backfill (run pending batched backfills)"
+        ),
     )
     
     args = parser.parse_args()
     
     if args.action == "list":
         list_migrations()
+    elif args.action == "backfill":
+        run_backfills()
     else:
         run_migrations(args.action)
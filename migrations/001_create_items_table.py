@@ -16,7 +16,7 @@ from app.database import DATABASE_PATH
 
 def upgrade():
     """Apply the migration."""
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = sqlite3.connect(DATABASE_PATH, uri=True)
     cursor = conn.cursor()
     
     # Create migrations tracking table if it doesn't exist
@@ -61,7 +61,7 @@ def upgrade():
 
 def downgrade():
     """Revert the migration."""
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = sqlite3.connect(DATABASE_PATH, uri=True)
     cursor = conn.cursor()
     
     # Drop items table
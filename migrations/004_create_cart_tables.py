@@ -15,7 +15,7 @@ from app.database import DATABASE_PATH
 
 def upgrade():
     """Apply the migration."""
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = sqlite3.connect(DATABASE_PATH, uri=True)
     cursor = conn.cursor()
 
     cursor.execute("""
@@ -63,7 +63,7 @@ def upgrade():
 
 def downgrade():
     """Revert the migration."""
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = sqlite3.connect(DATABASE_PATH, uri=True)
     cursor = conn.cursor()
 
     cursor.execute("DROP TABLE IF EXISTS cart_items")
@@ -0,0 +1,103 @@
+"""
+Migration: Add product snapshots to cart items
+Version: 005
+Description: Adds product_name and unit_price to cart_items so cart reads and totals
+come from cart_items alone. Lines of active carts are filled in upgrade(); checked-out
+history is filled by the batched backfill (python migrate.py backfill).
+"""
+
+import sqlite3
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.backfill import ensure_backfill_table, run_backfill
+from app.database import DATABASE_PATH
+
+MIGRATION_NAME = "005_add_cart_item_snapshots"
+
+_SNAPSHOT_SET = """
+    product_name = (SELECT p.name FROM products p WHERE p.id = cart_items.product_id),
+    unit_price = (SELECT p.price FROM products p WHERE p.id = cart_items.product_id)
+"""
+
+
+def upgrade():
+    """Apply the migration."""
+    conn = sqlite3.connect(DATABASE_PATH, uri=True)
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS _migrations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    cursor.execute("SELECT 1 FROM _migrations WHERE name = ?", (MIGRATION_NAME,))
+    if cursor.fetchone():
+        print(f"Migration {MIGRATION_NAME} already applied. Skipping.")
+        conn.close()
+        return
+
+    cursor.execute("ALTER TABLE cart_items ADD COLUMN product_name TEXT")
+    cursor.execute("ALTER TABLE cart_items ADD COLUMN unit_price REAL")
+
+    # Active carts are read on every GET /cart, so their lines are filled now.
+    cursor.execute(f"""
+        UPDATE cart_items SET {_SNAPSHOT_SET}
+        WHERE cart_id IN (SELECT id FROM cart WHERE status = 'active')
+    """)
+
+    cursor.execute("INSERT INTO _migrations (name) VALUES (?)", (MIGRATION_NAME,))
+
+    conn.commit()
+    conn.close()
+    print(f"Migration {MIGRATION_NAME} applied successfully.")
+
+
+def backfill():
+    """Fill snapshots of the remaining (checked-out) cart lines in batches."""
+    rows = run_backfill(
+        MIGRATION_NAME,
+        "cart_items",
+        f"UPDATE cart_items SET {_SNAPSHOT_SET} WHERE id > ? AND id <= ? AND unit_price IS NULL",
+    )
+    print(f"Backfill {MIGRATION_NAME}: {rows} rows processed.")
+
+
+def downgrade():
+    """Revert the migration."""
+    conn = sqlite3.connect(DATABASE_PATH, uri=True)
+    cursor = conn.cursor()
+
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(cart_items)")}
+    for column in ("unit_price", "product_name"):
+        if column in columns:
+            cursor.execute(f"ALTER TABLE cart_items DROP COLUMN {column}")
+    ensure_backfill_table(conn)
+    cursor.execute("DELETE FROM _backfills WHERE name = ?", (MIGRATION_NAME,))
+    cursor.execute("DELETE FROM _migrations WHERE name = ?", (MIGRATION_NAME,))
+
+    conn.commit()
+    conn.close()
+    print(f"Migration {MIGRATION_NAME} reverted successfully.")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run database migration")
+    parser.add_argument(
+        "action",
+        choices=["upgrade", "downgrade"],
+        help="Migration action to perform"
+    )
+    args = parser.parse_args()
+
+    if args.action == "upgrade":
+        upgrade()
+    elif args.action == "downgrade":
+        downgrade()
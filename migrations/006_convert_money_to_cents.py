@@ -0,0 +1,175 @@
+"""
+Migration: Store money as integer cents
+Version: 006
+Description: Replaces REAL money columns with INTEGER minor units:
+products.price -> price_cents, cart.total -> total_cents,
+cart_items.unit_price -> unit_price_cents. Values are converted in batches;
+then products and cart_items are rebuilt without the REAL columns and with
+their cents columns NOT NULL (ALTER TABLE cannot add the constraint).
+"""
+
+import sqlite3
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.backfill import ensure_backfill_table, run_backfill
+from app.database import DATABASE_PATH
+
+MIGRATION_NAME = "006_convert_money_to_cents"
+SNAPSHOT_BACKFILL = "005_add_cart_item_snapshots"
+
+_PRODUCT = "(SELECT p.{column} FROM products p WHERE p.id = cart_items.product_id)"
+
+# Final shapes of the rebuilt tables: (definition, columns copied over).
+_REBUILT_TABLES = {
+    "products": (
+        """
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        price_cents INTEGER NOT NULL
+        """,
+        "id, name, price_cents",
+    ),
+    "cart_items": (
+        """
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        cart_id INTEGER NOT NULL,
+        product_id INTEGER NOT NULL,
+        quantity INTEGER NOT NULL,
+        product_name TEXT,
+        unit_price_cents INTEGER NOT NULL,
+        FOREIGN KEY (cart_id) REFERENCES cart(id),
+        FOREIGN KEY (product_id) REFERENCES products(id),
+        UNIQUE(cart_id, product_id)
+        """,
+        "id, cart_id, product_id, quantity, product_name, unit_price_cents",
+    ),
+}
+
+
+def _columns(cursor, table):
+    return {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+
+
+def _rebuild(cursor, table):
+    """Copy a table into its final shape and swap it in (the caller commits)."""
+    definition, columns = _REBUILT_TABLES[table]
+    cursor.execute(f"DROP TABLE IF EXISTS {table}_new")
+    cursor.execute(f"CREATE TABLE {table}_new ({definition})")
+    cursor.execute(f"INSERT INTO {table}_new ({columns}) SELECT {columns} FROM {table}")
+    cursor.execute(f"DROP TABLE {table}")
+    cursor.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+
+
+def upgrade():
+    """Apply the migration."""
+    conn = sqlite3.connect(DATABASE_PATH, uri=True)
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS _migrations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    cursor.execute("SELECT 1 FROM _migrations WHERE name = ?", (MIGRATION_NAME,))
+    if cursor.fetchone():
+        print(f"Migration {MIGRATION_NAME} already applied. Skipping.")
+        conn.close()
+        return
+
+    # Columns may already exist if a previous run was interrupted during conversion.
+    if "price_cents" not in _columns(cursor, "products"):
+        cursor.execute("ALTER TABLE products ADD COLUMN price_cents INTEGER")
+    if "total_cents" not in _columns(cursor, "cart"):
+        cursor.execute("ALTER TABLE cart ADD COLUMN total_cents INTEGER NOT NULL DEFAULT 0")
+    if "unit_price_cents" not in _columns(cursor, "cart_items"):
+        cursor.execute("ALTER TABLE cart_items ADD COLUMN unit_price_cents INTEGER")
+    conn.commit()
+
+    run_backfill(
+        f"{MIGRATION_NAME}:products",
+        "products",
+        "UPDATE products SET price_cents = CAST(ROUND(price * 100) AS INTEGER) WHERE id > ? AND id <= ?",
+    )
+    run_backfill(
+        f"{MIGRATION_NAME}:cart",
+        "cart",
+        "UPDATE cart SET total_cents = CAST(ROUND(total * 100) AS INTEGER) WHERE id > ? AND id <= ?",
+    )
+    # Also completes the 005 snapshot backfill for lines it has not reached yet.
+    run_backfill(
+        f"{MIGRATION_NAME}:cart_items",
+        "cart_items",
+        f"""
+        UPDATE cart_items SET
+            unit_price_cents = CAST(ROUND(COALESCE(unit_price, {_PRODUCT.format(column="price")}) * 100) AS INTEGER),
+            product_name = COALESCE(product_name, {_PRODUCT.format(column="name")})
+        WHERE id > ? AND id <= ?
+        """,
+    )
+
+    ensure_backfill_table(conn)
+    cursor.execute("INSERT OR IGNORE INTO _backfills (name) VALUES (?)", (SNAPSHOT_BACKFILL,))
+    cursor.execute(
+        "UPDATE _backfills SET completed_at = CURRENT_TIMESTAMP WHERE name = ? AND completed_at IS NULL",
+        (SNAPSHOT_BACKFILL,),
+    )
+    cursor.execute("ALTER TABLE cart DROP COLUMN total")
+    _rebuild(cursor, "products")
+    _rebuild(cursor, "cart_items")
+
+    cursor.execute("INSERT INTO _migrations (name) VALUES (?)", (MIGRATION_NAME,))
+
+    conn.commit()
+    conn.close()
+    print(f"Migration {MIGRATION_NAME} applied successfully.")
+
+
+def downgrade():
+    """Revert the migration."""
+    conn = sqlite3.connect(DATABASE_PATH, uri=True)
+    cursor = conn.cursor()
+
+    conversions = [
+        ("products", "price_cents", "price", "REAL NOT NULL DEFAULT 0"),
+        ("cart", "total_cents", "total", "REAL NOT NULL DEFAULT 0"),
+        ("cart_items", "unit_price_cents", "unit_price", "REAL"),
+    ]
+    for table, cents_column, real_column, real_type in conversions:
+        columns = _columns(cursor, table)
+        if cents_column not in columns:
+            continue
+        if real_column not in columns:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {real_column} {real_type}")
+        cursor.execute(f"UPDATE {table} SET {real_column} = {cents_column} / 100.0")
+        cursor.execute(f"ALTER TABLE {table} DROP COLUMN {cents_column}")
+
+    ensure_backfill_table(conn)
+    cursor.execute("DELETE FROM _backfills WHERE name LIKE ?", (f"{MIGRATION_NAME}:%",))
+    cursor.execute("DELETE FROM _migrations WHERE name = ?", (MIGRATION_NAME,))
+
+    conn.commit()
+    conn.close()
+    print(f"Migration {MIGRATION_NAME} reverted successfully.")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run database migration")
+    parser.add_argument(
+        "action",
+        choices=["upgrade", "downgrade"],
+        help="Migration action to perform"
+    )
+    args = parser.parse_args()
+
+    if args.action == "upgrade":
+        upgrade()
+    elif args.action == "downgrade":
+        downgrade()
@@ -0,0 +1,117 @@
+"""
+Migration: Support single-statement cart mutations
+Version: 008
+Description: A unique partial index allows at most one active cart per user, so
+the active cart can be fetched-or-created with one INSERT ... ON CONFLICT ... RETURNING.
+Extra active carts left by earlier races are marked 'abandoned' first (the oldest
+one, which reads used to pick, stays active). Triggers on cart_items keep
+cart.total_cents current, so writers no longer recalculate it.
+"""
+
+import sqlite3
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import DATABASE_PATH
+
+MIGRATION_NAME = "008_add_cart_upsert_support"
+
+_LINE_TOTAL = "COALESCE({row}.unit_price_cents, 0) * {row}.quantity"
+
+
+def upgrade():
+    """Apply the migration."""
+    conn = sqlite3.connect(DATABASE_PATH, uri=True)
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS _migrations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    cursor.execute("SELECT 1 FROM _migrations WHERE name = ?", (MIGRATION_NAME,))
+    if cursor.fetchone():
+        print(f"Migration {MIGRATION_NAME} already applied. Skipping.")
+        conn.close()
+        return
+
+    cursor.execute("""
+        UPDATE cart SET status = 'abandoned'
+        WHERE status = 'active'
+          AND id > (SELECT MIN(c.id) FROM cart c WHERE c.user_id = cart.user_id AND c.status = 'active')
+    """)
+    cursor.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_cart_one_active_per_user ON cart (user_id) WHERE status = 'active'"
+    )
+
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_cart_items_total_insert AFTER INSERT ON cart_items
+        BEGIN
+            UPDATE cart SET total_cents = total_cents + {_LINE_TOTAL.format(row="NEW")} WHERE id = NEW.cart_id;
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_cart_items_total_update
+        AFTER UPDATE OF quantity, unit_price_cents ON cart_items
+        BEGIN
+            UPDATE cart
+            SET total_cents = total_cents - {_LINE_TOTAL.format(row="OLD")} + {_LINE_TOTAL.format(row="NEW")}
+            WHERE id = NEW.cart_id;
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_cart_items_total_delete AFTER DELETE ON cart_items
+        BEGIN
+            UPDATE cart SET total_cents = total_cents - {_LINE_TOTAL.format(row="OLD")} WHERE id = OLD.cart_id;
+        END
+    """)
+    # Start the incremental totals from exact values.
+    cursor.execute("""
+        UPDATE cart SET total_cents = (
+            SELECT COALESCE(SUM(unit_price_cents * quantity), 0) FROM cart_items WHERE cart_id = cart.id
+        )
+        WHERE status = 'active'
+    """)
+
+    cursor.execute("INSERT INTO _migrations (name) VALUES (?)", (MIGRATION_NAME,))
+
+    conn.commit()
+    conn.close()
+    print(f"Migration {MIGRATION_NAME} applied successfully.")
+
+
+def downgrade():
+    """Revert the migration."""
+    conn = sqlite3.connect(DATABASE_PATH, uri=True)
+    cursor = conn.cursor()
+
+    for trigger in ("trg_cart_items_total_insert", "trg_cart_items_total_update", "trg_cart_items_total_delete"):
+        cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    cursor.execute("DROP INDEX IF EXISTS idx_cart_one_active_per_user")
+    cursor.execute("DELETE FROM _migrations WHERE name = ?", (MIGRATION_NAME,))
+
+    conn.commit()
+    conn.close()
+    print(f"Migration {MIGRATION_NAME} reverted successfully.")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run database migration")
+    parser.add_argument(
+        "action",
+        choices=["upgrade", "downgrade"],
+        help="Migration action to perform"
+    )
+    args = parser.parse_args()
+
+    if args.action == "upgrade":
+        upgrade()
+    elif args.action == "downgrade":
+        downgrade()
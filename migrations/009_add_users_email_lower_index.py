@@ -0,0 +1,88 @@
+"""
+Migration: Enforce case-insensitive unique emails
+Version: 009
+Description: Registration relies on the unique constraint instead of a SELECT
+before the INSERT. Emails are stored lowercased, but the UNIQUE constraint on
+users.email is case-sensitive; a unique index on lower(email) makes the
+constraint hold for rows written by any path. Existing emails are lowercased
+first; case-insensitive duplicates must be resolved by hand.
+"""
+
+import sqlite3
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import DATABASE_PATH
+
+MIGRATION_NAME = "009_add_users_email_lower_index"
+
+
+def upgrade():
+    """Apply the migration."""
+    conn = sqlite3.connect(DATABASE_PATH, uri=True)
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS _migrations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    cursor.execute("SELECT 1 FROM _migrations WHERE name = ?", (MIGRATION_NAME,))
+    if cursor.fetchone():
+        print(f"Migration {MIGRATION_NAME} already applied. Skipping.")
+        conn.close()
+        return
+
+    duplicates = cursor.execute(
+        "SELECT lower(email) FROM users GROUP BY lower(email) HAVING COUNT(*) > 1"
+    ).fetchall()
+    if duplicates:
+        conn.close()
+        raise SystemExit(
+            f"Migration {MIGRATION_NAME}: users with case-insensitive duplicate emails must be merged first: "
+            + ", ".join(row[0] for row in duplicates)
+        )
+
+    cursor.execute("UPDATE users SET email = lower(email) WHERE email != lower(email)")
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_users_email_lower ON users (lower(email))")
+
+    cursor.execute("INSERT INTO _migrations (name) VALUES (?)", (MIGRATION_NAME,))
+
+    conn.commit()
+    conn.close()
+    print(f"Migration {MIGRATION_NAME} applied successfully.")
+
+
+def downgrade():
+    """Revert the migration."""
+    conn = sqlite3.connect(DATABASE_PATH, uri=True)
+    cursor = conn.cursor()
+
+    cursor.execute("DROP INDEX IF EXISTS idx_users_email_lower")
+    cursor.execute("DELETE FROM _migrations WHERE name = ?", (MIGRATION_NAME,))
+
+    conn.commit()
+    conn.close()
+    print(f"Migration {MIGRATION_NAME} reverted successfully.")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run database migration")
+    parser.add_argument(
+        "action",
+        choices=["upgrade", "downgrade"],
+        help="Migration action to perform"
+    )
+    args = parser.parse_args()
+
+    if args.action == "upgrade":
+        upgrade()
+    elif args.action == "downgrade":
+        downgrade()
@@ -0,0 +1,115 @@
+"""
+Migration: Create stock tables
+Version: 011
+Description: product_stock holds the units available for sale per product
+(products without a row are not stock-tracked); its CHECK constraint makes any
+decrement below zero fail the statement. stock_reservations holds soft
+reservations taken at add-to-cart time, already deducted from available.
+A trigger on the checkout status change deducts the unreserved part of each
+cart line and consumes the cart's reservations, inside the checkout statement.
+"""
+
+import sqlite3
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import DATABASE_PATH
+
+MIGRATION_NAME = "011_create_stock_tables"
+
+
+def upgrade():
+    """Apply the migration."""
+    conn = sqlite3.connect(DATABASE_PATH, uri=True)
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS _migrations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    cursor.execute("SELECT 1 FROM _migrations WHERE name = ?", (MIGRATION_NAME,))
+    if cursor.fetchone():
+        print(f"Migration {MIGRATION_NAME} already applied. Skipping.")
+        conn.close()
+        return
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS product_stock (
+            product_id INTEGER PRIMARY KEY,
+            available INTEGER NOT NULL CHECK (available >= 0),
+            FOREIGN KEY (product_id) REFERENCES products(id)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS stock_reservations (
+            cart_id INTEGER NOT NULL,
+            product_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL CHECK (quantity > 0),
+            expires_at REAL NOT NULL,
+            PRIMARY KEY (cart_id, product_id)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_stock_reservations_expires_at ON stock_reservations (expires_at)"
+    )
+    # Reserved units were deducted when reserved; only the rest of each line is deducted here.
+    # A shortage trips the CHECK and aborts the checkout UPDATE itself.
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_cart_checkout_stock
+        AFTER UPDATE OF status ON cart
+        WHEN OLD.status = 'active' AND NEW.status = 'checked_out'
+        BEGIN
+            UPDATE product_stock SET available = available - (
+                SELECT ci.quantity - COALESCE(r.quantity, 0)
+                FROM cart_items ci
+                LEFT JOIN stock_reservations r ON r.cart_id = ci.cart_id AND r.product_id = ci.product_id
+                WHERE ci.cart_id = NEW.id AND ci.product_id = product_stock.product_id
+            )
+            WHERE product_id IN (SELECT product_id FROM cart_items WHERE cart_id = NEW.id);
+            DELETE FROM stock_reservations WHERE cart_id = NEW.id;
+        END
+    """)
+
+    cursor.execute("INSERT INTO _migrations (name) VALUES (?)", (MIGRATION_NAME,))
+
+    conn.commit()
+    conn.close()
+    print(f"Migration {MIGRATION_NAME} applied successfully.")
+
+
+def downgrade():
+    """Revert the migration."""
+    conn = sqlite3.connect(DATABASE_PATH, uri=True)
+    cursor = conn.cursor()
+
+    cursor.execute("DROP TRIGGER IF EXISTS trg_cart_checkout_stock")
+    cursor.execute("DROP TABLE IF EXISTS stock_reservations")
+    cursor.execute("DROP TABLE IF EXISTS product_stock")
+    cursor.execute("DELETE FROM _migrations WHERE name = ?", (MIGRATION_NAME,))
+
+    conn.commit()
+    conn.close()
+    print(f"Migration {MIGRATION_NAME} reverted successfully.")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run database migration")
+    parser.add_argument(
+        "action",
+        choices=["upgrade", "downgrade"],
+        help="Migration action to perform"
+    )
+    args = parser.parse_args()
+
+    if args.action == "upgrade":
+        upgrade()
+    elif args.action == "downgrade":
+        downgrade()
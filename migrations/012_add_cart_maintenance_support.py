@@ -0,0 +1,104 @@
+"""
+Migration: Add cart maintenance support
+Version: 012
+Description: cart.updated_at (unix seconds) records the last change to a cart:
+set on creation, on every line insert/update/delete and on status changes, all
+by triggers. An index on (status, updated_at) lets the maintenance job find idle
+active carts and old checked-out carts without scanning. The database is switched
+to auto_vacuum=INCREMENTAL so space freed by purging can be returned to the OS
+with PRAGMA incremental_vacuum; switching needs one full VACUUM, run here.
+"""
+
+import sqlite3
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import DATABASE_PATH
+
+MIGRATION_NAME = "012_add_cart_maintenance_support"
+
+_TOUCH_TRIGGERS = {
+    "trg_cart_touch_insert": "AFTER INSERT ON cart",
+    "trg_cart_touch_status": "AFTER UPDATE OF status ON cart",
+    "trg_cart_items_touch_insert": "AFTER INSERT ON cart_items",
+    "trg_cart_items_touch_update": "AFTER UPDATE OF quantity ON cart_items",
+    "trg_cart_items_touch_delete": "AFTER DELETE ON cart_items",
+}
+
+
+def upgrade():
+    """Apply the migration."""
+    conn = sqlite3.connect(DATABASE_PATH, uri=True)
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS _migrations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    cursor.execute("SELECT 1 FROM _migrations WHERE name = ?", (MIGRATION_NAME,))
+    if cursor.fetchone():
+        print(f"Migration {MIGRATION_NAME} already applied. Skipping.")
+        conn.close()
+        return
+
+    cursor.execute("ALTER TABLE cart ADD COLUMN updated_at INTEGER")
+    # Existing carts start their idle clock now.
+    cursor.execute("UPDATE cart SET updated_at = unixepoch()")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_cart_status_updated_at ON cart (status, updated_at)")
+    for name, event in _TOUCH_TRIGGERS.items():
+        row = "OLD" if "DELETE" in event else "NEW"
+        cart_id = f"{row}.id" if event.endswith(" cart") else f"{row}.cart_id"
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {name} {event}
+            BEGIN
+                UPDATE cart SET updated_at = unixepoch() WHERE id = {cart_id};
+            END
+        """)
+
+    cursor.execute("INSERT INTO _migrations (name) VALUES (?)", (MIGRATION_NAME,))
+
+    conn.commit()
+    if cursor.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        cursor.execute("VACUUM")
+    conn.close()
+    print(f"Migration {MIGRATION_NAME} applied successfully.")
+
+
+def downgrade():
+    """Revert the migration."""
+    conn = sqlite3.connect(DATABASE_PATH, uri=True)
+    cursor = conn.cursor()
+
+    for name in _TOUCH_TRIGGERS:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+    cursor.execute("DROP INDEX IF EXISTS idx_cart_status_updated_at")
+    cursor.execute("ALTER TABLE cart DROP COLUMN updated_at")
+    cursor.execute("DELETE FROM _migrations WHERE name = ?", (MIGRATION_NAME,))
+
+    conn.commit()
+    conn.close()
+    print(f"Migration {MIGRATION_NAME} reverted successfully.")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run database migration")
+    parser.add_argument(
+        "action",
+        choices=["upgrade", "downgrade"],
+        help="Migration action to perform"
+    )
+    args = parser.parse_args()
+
+    if args.action == "upgrade":
+        upgrade()
+    elif args.action == "downgrade":
+        downgrade()
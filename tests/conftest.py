@@ -1,14 +1,28 @@
 """
 Pytest configuration and shared fixtures for API tests.
-Uses a separate test database so the main app.db is not modified.
+
+Tests run on in-memory SQLite databases, never on app.db: migrations are applied
+once per session to a template, and every test gets its own copy of it (and an
+empty order archive), so tests do not see each other's rows and nothing is left
+on disk. pytest-xdist workers (pytest -n auto) are separate processes with their
+own in-memory databases.
+Run with STORAGE_BACKEND=memory to test the API on the in-memory repositories;
+tests marked sqlite_only (SQL, triggers, files, operational jobs) are then skipped,
+and those marked memory_only run.
 """
 
+import itertools
 import os
 import sys
+import uuid
+from typing import Optional
 
-# Use a test database before any app/database imports
-TEST_DB = os.path.join(os.path.dirname(__file__), "test_app.db")
-os.environ["DATABASE_PATH"] = TEST_DB
+# Use the template database before any app/database imports
+TEMPLATE_DB = "file:/test_template?vfs=memdb"
+os.environ["DATABASE_PATH"] = TEMPLATE_DB
+os.environ.pop("ARCHIVE_DATABASE_PATH", None)
+ADMIN_KEY = "test-admin-key"
+os.environ["ADMIN_API_KEY"] = ADMIN_KEY
 
 # Ensure project root is on path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -16,24 +30,47 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import pytest
 from fastapi.testclient import TestClient
 
-# Run migrations against test DB (imports use DATABASE_PATH from env)
+# Run migrations against the template (imports use DATABASE_PATH from env)
 from migrate import run_migrations
 
+from app import database
+from app.database import STORAGE_BACKEND
 from app.main import app
 
+_test_ids = itertools.count(1)
 
-def _ensure_migrations():
-    """Run migrations on the test database (idempotent)."""
-    run_migrations("upgrade")
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "sqlite_only: needs the SQLite storage backend")
+    config.addinivalue_line("markers", "memory_only: tests the memory storage backend's limits")
+
+
+def pytest_collection_modifyitems(config, items):
+    skipped = "memory_only" if STORAGE_BACKEND == "sqlite" else "sqlite_only"
+    skip = pytest.mark.skip(reason=f"needs another STORAGE_BACKEND (running on {STORAGE_BACKEND})")
+    for item in items:
+        if skipped in item.keywords:
+            item.add_marker(skip)
 
 
 @pytest.fixture(scope="session")
 def _migrate():
-    """Run migrations once per test session."""
-    _ensure_migrations()
+    """Run migrations once per test session, on the template."""
+    run_migrations("upgrade")
     yield
 
 
+@pytest.fixture(autouse=True)
+def _database(_migrate):
+    """Run the test on a fresh copy of the migrated template."""
+    path = f"file:/test_{next(_test_ids)}?vfs=memdb"
+    database.clone_database(TEMPLATE_DB, path)
+    database.use_database(path)
+    yield path
+    database.drop_database(database.ARCHIVE_DATABASE_PATH)
+    database.drop_database(path)
+
+
 @pytest.fixture
 def client(_migrate):
     """FastAPI TestClient using the test database."""
@@ -43,12 +80,41 @@ def client(_migrate):
 
 @pytest.fixture
 def auth_headers(client):
-    """Register a user (or use existing), login, and return Authorization headers with JWT."""
+    """Register a user, login, and return Authorization headers with JWT."""
     email = "authtest@example.com"
     password = "password123"
     client.post("/auth/register", json={"email": email, "password": password})
-    # If already registered (409), login still works
     r = client.post("/auth/login", json={"email": email, "password": password})
     r.raise_for_status()
     token = r.json()["access_token"]
     return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def register_user(client):
+    """Factory: register a user with a unique email and password "pass123"; returns the email."""
+
+    def register() -> str:
+        email = f"user_{uuid.uuid4().hex}@example.com"
+        client.post("/auth/register", json={"email": email, "password": "pass123"}).raise_for_status()
+        return email
+
+    return register
+
+
+@pytest.fixture
+def fresh_auth_headers(client, register_user):
+    """Factory: log in and return Authorization headers; registers a new user unless given an email."""
+
+    def login(email: Optional[str] = None) -> dict:
+        r = client.post("/auth/login", json={"email": email or register_user(), "password": "pass123"})
+        r.raise_for_status()
+        return {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+    return login
+
+
+@pytest.fixture
+def admin_headers():
+    """Headers for operator-only (admin) endpoints."""
+    return {"X-Admin-Key": ADMIN_KEY}
@@ -1,7 +1,13 @@
 """Tests for the authentication APIs: register and login."""
 
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest
 
+from app import database
+from app.database import trace_statements
+
 
 class TestRegister:
     """POST /auth/register"""
@@ -52,6 +58,29 @@ class TestRegister:
         )
         assert response.status_code == 422
 
+    def test_register_concurrent_duplicates_one_wins(self, client):
+        """Concurrent sign-ups with one email: exactly one 201, the rest 409 (never 500)."""
+        payload = {"email": "race@example.com", "password": "secret123"}
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            codes = list(pool.map(lambda _: client.post("/auth/register", json=payload).status_code, range(4)))
+        assert sorted(codes) == [201, 409, 409, 409]
+
+    @pytest.mark.sqlite_only
+    def test_register_is_one_statement(self, client):
+        with trace_statements() as statements:
+            response = client.post("/auth/register", json={"email": "onestmt@example.com", "password": "secret123"})
+        assert response.status_code == 201
+        assert len(statements) == 1 and statements[0].lstrip().startswith("INSERT"), statements
+
+    @pytest.mark.sqlite_only
+    def test_email_unique_regardless_of_case(self, client):
+        """The lower(email) index rejects case variants even when written outside the API."""
+        client.post("/auth/register", json={"email": "casecheck@example.com", "password": "secret123"})
+        conn = sqlite3.connect(database.DATABASE_PATH, uri=True)
+        with pytest.raises(sqlite3.IntegrityError):
+            conn.execute("INSERT INTO users (email, password) VALUES ('CaseCheck@Example.com', 'x')")
+        conn.close()
+
 
 class TestLogin:
     """POST /auth/login"""
@@ -0,0 +1,145 @@
+"""Tests for online backups (backup API steps and VACUUM INTO) and the admin endpoint."""
+
+import sqlite3
+import statistics
+import threading
+import time
+
+import pytest
+
+from app import backup, database
+from app.database import get_db
+
+# Backups copy the SQLite databases.
+pytestmark = pytest.mark.sqlite_only
+
+
+def _count(path, table):
+    conn = sqlite3.connect(path)
+    try:
+        assert conn.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def file_database(_database, tmp_path):
+    """Run the test on a WAL-mode database file (a copy of its in-memory clone), as in production."""
+    path = str(tmp_path / "app.db")
+    database.clone_database(_database, path)
+    database.use_database(path, str(tmp_path / "app_archive.db"))
+    yield path
+    database.use_database(_database)
+
+
+class TestBackup:
+    def test_copies_every_database_in_steps(self, client, fresh_auth_headers, tmp_path):
+        fresh_auth_headers()
+        progress = []
+        report = backup.run_backup(str(tmp_path / "out"), pages_per_step=2, pause=0, on_progress=progress.append)
+        [copy] = report["files"]
+        assert report["method"] == "backup" and copy["steps"] > 1
+        assert _count(copy["path"], "users") == 1
+        assert copy["bytes"] == report["bytes"] > 0
+        assert progress[-1]["pages_done"] == progress[-1]["pages_total"] == copy["pages"]
+        assert backup.get_status()["last_report"] == report
+
+    def test_vacuum_into_writes_compacted_copy(self, client, file_database, tmp_path):
+        with get_db() as conn:
+            conn.executemany("INSERT INTO items (name) VALUES (?)", [("x" * 1000,)] * 500)
+        with get_db() as conn:
+            conn.execute("DELETE FROM items WHERE length(name) = 1000")
+        report = backup.run_backup(str(tmp_path / "out"), vacuum=True)
+        plain = backup.run_backup(str(tmp_path / "plain"), pause=0)
+        assert report["method"] == "vacuum_into"
+        assert report["files"][0]["bytes"] < plain["files"][0]["bytes"]
+        assert _count(report["files"][0]["path"], "products") == _count(plain["files"][0]["path"], "products")
+
+    def test_snapshot_is_consistent_while_writers_commit(self, client, fresh_auth_headers, file_database, tmp_path):
+        """In WAL mode the copy is the state when it started, and commits during it do not restart it."""
+        headers = fresh_auth_headers()
+        product_id = client.get("/products").json()[0]["id"]
+        with get_db() as conn:
+            conn.executemany("INSERT INTO items (name) VALUES (?)", [("x" * 1000,)] * 500)
+            items = conn.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+
+        def write(report):
+            client.post("/cart/items", json={"product_id": product_id, "quantity": 1}, headers=headers)
+            with get_db() as conn:
+                conn.execute("INSERT INTO items (name) VALUES ('during backup')")
+
+        report = backup.run_backup(str(tmp_path / "out"), pages_per_step=8, pause=0, on_progress=write)
+        [copy] = report["files"]
+        assert copy["restarts"] == 0 and copy["steps"] > 10
+        assert _count(copy["path"], "items") == items
+
+
+class TestBackupEndpoint:
+    def test_requires_admin_key(self, client):
+        assert client.post("/admin/backup").status_code in (401, 403)
+
+    def test_backup_and_status(self, client, admin_headers, tmp_path, monkeypatch):
+        monkeypatch.setattr(backup, "BACKUP_DIR", str(tmp_path))
+        response = client.post("/admin/backup", json={"vacuum": True}, headers=admin_headers)
+        assert response.status_code == 200
+        report = response.json()
+        assert report["method"] == "vacuum_into" and report["directory"].startswith(str(tmp_path))
+        status = client.get("/admin/backup", headers=admin_headers).json()
+        assert status == {"running": False, "progress": None, "last_report": report}
+
+    def test_concurrent_backup_is_rejected(self, client, admin_headers, tmp_path, monkeypatch):
+        monkeypatch.setattr(backup, "BACKUP_DIR", str(tmp_path))
+        with backup._running:
+            assert client.post("/admin/backup", headers=admin_headers).status_code == 409
+
+
+def _cart_latencies(client, headers, product_id, requests):
+    latencies = []
+    for _ in range(requests):
+        for method, path, body in (
+            ("POST", "/cart/items", {"product_id": product_id, "quantity": 1}),
+            ("GET", "/cart", None),
+        ):
+            started = time.perf_counter()
+            assert client.request(method, path, json=body, headers=headers).status_code in (200, 201)
+            latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def test_cart_p99_is_not_affected_by_running_backup(client, fresh_auth_headers, file_database, tmp_path):
+    headers = fresh_auth_headers()
+    product_id = client.get("/products").json()[0]["id"]
+    with get_db() as conn:
+        conn.executemany("INSERT INTO items (name) VALUES (?)", [("x" * 1000,)] * 4000)
+    idle = _cart_latencies(client, headers, product_id, 100)
+
+    # Back up again and again until the measurement is over, so it never runs without a backup.
+    copying, measured = threading.Event(), threading.Event()
+    reports, errors = [], []
+
+    def back_up():
+        try:
+            while not measured.is_set():
+                directory = str(tmp_path / f"out{len(reports)}")
+                reports.append(
+                    backup.run_backup(directory, pages_per_step=4, pause=0.005, on_progress=lambda _: copying.set())
+                )
+        except Exception as e:
+            errors.append(e)
+            copying.set()
+
+    thread = threading.Thread(target=back_up)
+    thread.start()
+    try:
+        assert copying.wait(10)
+        during = _cart_latencies(client, headers, product_id, 100)
+    finally:
+        measured.set()
+        thread.join()
+    if errors:
+        raise errors[0]
+    assert reports and all(report["files"][0]["steps"] > 1 for report in reports)
+    idle_p99 = statistics.quantiles(idle, n=100)[98]
+    during_p99 = statistics.quantiles(during, n=100)[98]
+    assert during_p99 < 2 * idle_p99 + 0.02, (idle_p99, during_p99)
@@ -1,6 +1,5 @@
 """Tests for the Cart API (JWT-protected)."""
 
-import uuid
 import pytest
 
 
@@ -13,16 +12,6 @@ def _get_first_product_id(client):
     return products[0]["id"]
 
 
-def _fresh_auth_headers(client):
-    """Register a new user and return Authorization headers (for isolated cart state)."""
-    email = f"cart_{uuid.uuid4().hex}@example.com"
-    client.post("/auth/register", json={"email": email, "password": "pass123"})
-    r = client.post("/auth/login", json={"email": email, "password": "pass123"})
-    r.raise_for_status()
-    token = r.json()["access_token"]
-    return {"Authorization": f"Bearer {token}"}
-
-
 class TestCartAuth:
     """Cart endpoints require JWT."""
 
@@ -73,8 +62,8 @@ class TestAddCartItem:
 class TestGetCart:
     """GET /cart"""
 
-    def test_get_cart_empty_returns_empty_list(self, client):
-        headers = _fresh_auth_headers(client)
+    def test_get_cart_empty_returns_empty_list(self, client, fresh_auth_headers):
+        headers = fresh_auth_headers()
         response = client.get("/cart", headers=headers)
         assert response.status_code == 200
         data = response.json()
@@ -82,8 +71,8 @@ class TestGetCart:
         assert data["total"] == 0.0
         assert data["status"] == "active"
 
-    def test_get_cart_after_add_shows_items_and_total(self, client):
-        headers = _fresh_auth_headers(client)
+    def test_get_cart_after_add_shows_items_and_total(self, client, fresh_auth_headers):
+        headers = fresh_auth_headers()
         product_id = _get_first_product_id(client)
         client.post(
             "/cart/items",
@@ -195,3 +184,110 @@ class TestCheckout:
         get_r = client.get("/cart", headers=auth_headers)
         assert get_r.json()["items"] == []
         assert get_r.json()["total"] == 0.0
+
+
+@pytest.mark.sqlite_only
+class TestCartStatements:
+    """Each cart endpoint runs a minimal, fixed number of SQL statements."""
+
+    @pytest.fixture
+    def headers(self, client, fresh_auth_headers):
+        from app import warmup
+
+        # Warm-up runs queries through get_db() too; keep it out of the traces.
+        assert warmup.wait_until_ready(30)
+        return fresh_auth_headers()
+
+    def _statements(self, call):
+        from app.database import trace_statements
+
+        with trace_statements() as statements:
+            response = call()
+        return response, statements
+
+    def test_add_item_statements(self, client, headers):
+        product_id = _get_first_product_id(client)
+        response, statements = self._statements(
+            lambda: client.post("/cart/items", json={"product_id": product_id, "quantity": 1}, headers=headers)
+        )
+        assert response.status_code == 201
+        # Active cart upsert, line upsert, invalidation event.
+        assert len(statements) == 3, statements
+        response, statements = self._statements(
+            lambda: client.post("/cart/items", json={"product_id": product_id, "quantity": 2}, headers=headers)
+        )
+        assert response.json()["quantity"] == 3
+        assert len(statements) == 3, statements
+
+    def test_update_remove_checkout_statements(self, client, headers):
+        product_id = _get_first_product_id(client)
+        item_id = client.post(
+            "/cart/items", json={"product_id": product_id, "quantity": 1}, headers=headers
+        ).json()["id"]
+        response, statements = self._statements(
+            lambda: client.put(f"/cart/items/{item_id}", json={"quantity": 4}, headers=headers)
+        )
+        assert response.status_code == 200
+        # Line write, reservation lookup (a hold left from before reservations were disabled is released), event.
+        assert len(statements) == 3, statements
+        response, statements = self._statements(lambda: client.get("/cart", headers=headers))
+        assert response.json()["items"][0]["quantity"] == 4
+        assert len(statements) == 1, statements
+        response, statements = self._statements(lambda: client.delete(f"/cart/items/{item_id}", headers=headers))
+        assert response.status_code == 204
+        assert len(statements) == 3, statements
+        client.post("/cart/items", json={"product_id": product_id, "quantity": 1}, headers=headers)
+        response, statements = self._statements(lambda: client.post("/cart/checkout", headers=headers))
+        assert response.json()["message"] == "Checkout successful"
+        assert len(statements) == 2, statements
+
+    def test_not_found_runs_one_statement(self, client, headers):
+        response, statements = self._statements(
+            lambda: client.put("/cart/items/999999", json={"quantity": 1}, headers=headers)
+        )
+        assert response.status_code == 404
+        assert len(statements) == 1, statements
+
+
+class TestCartConsistency:
+    def test_concurrent_adds_lose_no_quantity(self, client, fresh_auth_headers):
+        from concurrent.futures import ThreadPoolExecutor
+
+        headers = fresh_auth_headers()
+        product_id = _get_first_product_id(client)
+        add = lambda _: client.post(  # noqa: E731
+            "/cart/items", json={"product_id": product_id, "quantity": 1}, headers=headers
+        ).status_code
+        # Stay within the cart_write concurrency limit, so no request is turned away.
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            assert set(pool.map(add, range(40))) == {201}
+        cart = client.get("/cart", headers=headers).json()
+        assert len(cart["items"]) == 1
+        assert cart["items"][0]["quantity"] == 40
+        assert cart["total"] == round(cart["items"][0]["price"] * 40, 2)
+
+    def test_totals_follow_line_changes(self, client, fresh_auth_headers):
+        headers = fresh_auth_headers()
+        products = client.get("/products").json()[:3]
+        ids = [
+            client.post("/cart/items", json={"product_id": p["id"], "quantity": 2}, headers=headers).json()["id"]
+            for p in products
+        ]
+        client.put(f"/cart/items/{ids[0]}", json={"quantity": 5}, headers=headers)
+        client.delete(f"/cart/items/{ids[1]}", headers=headers)
+        cart = client.get("/cart", headers=headers).json()
+        assert cart["total"] == round(sum(item["subtotal"] for item in cart["items"]), 2)
+
+    @pytest.mark.sqlite_only
+    def test_one_active_cart_per_user(self, client, fresh_auth_headers):
+        import sqlite3
+
+        from app import database
+
+        headers = fresh_auth_headers()
+        client.post("/cart/items", json={"product_id": _get_first_product_id(client), "quantity": 1}, headers=headers)
+        conn = sqlite3.connect(database.DATABASE_PATH, uri=True)
+        user_id = conn.execute("SELECT user_id FROM cart ORDER BY id DESC LIMIT 1").fetchone()[0]
+        with pytest.raises(sqlite3.IntegrityError):
+            conn.execute("INSERT INTO cart (user_id, total_cents, status) VALUES (?, 0, 'active')", (user_id,))
+        conn.close()
@@ -0,0 +1,112 @@
+"""Tests for the per-user cart read-model cache."""
+
+import threading
+
+from app import metrics
+from app.auth import decode_access_token
+from app.cart_cache import CartCache
+
+
+def _view(lines):
+    return {"items": [{"id": i} for i in range(lines)], "total": 0.0, "status": "active"}
+
+
+class TestCartCacheUnit:
+    def test_lru_evicts_by_line_weight(self):
+        cache = CartCache(max_weight=6)
+        cache.set(1, _view(2))  # weight 3
+        cache.set(2, _view(2))  # weight 3
+        cache.get(1)  # 1 is now most recently used
+        cache.set(3, _view(0))  # weight 1 -> evicts 2
+        assert cache.get(2) is None
+        assert cache.get(1) is not None
+        assert cache.stats()["weight"] <= 6
+
+    def test_oversized_view_is_not_cached(self):
+        cache = CartCache(max_weight=3)
+        cache.set(1, _view(5))
+        assert cache.get(1) is None
+
+    def test_write_during_load_discards_stale_view(self):
+        cache = CartCache(max_weight=100)
+        token = cache.begin_load(1)
+        cache.invalidate(1)  # a write committed while the reader was querying
+        assert cache.put(1, _view(1), token) is False
+        assert cache.get(1) is None
+
+    def test_hit_rate(self):
+        cache = CartCache(max_weight=100)
+        cache.get(1)
+        cache.set(1, _view(0))
+        cache.get(1)
+        assert cache.stats()["hit_rate"] == 0.5
+
+
+class TestCartCacheIntegration:
+    def test_repeated_reads_do_not_touch_database(self, client, fresh_auth_headers, monkeypatch):
+        from app import repositories
+
+        headers = fresh_auth_headers()
+        first = client.get("/cart", headers=headers).json()
+
+        def no_db(user_id):
+            raise AssertionError("cart read hit the database")
+
+        monkeypatch.setattr(repositories.carts, "get_active", no_db)
+        hits = metrics.get_counter("cart_cache.hits")
+        assert client.get("/cart", headers=headers).json() == first
+        assert metrics.get_counter("cart_cache.hits") == hits + 1
+
+    def test_every_mutation_is_visible_to_next_read(self, client, fresh_auth_headers):
+        headers = fresh_auth_headers()
+        product_id = client.get("/products").json()[0]["id"]
+        client.get("/cart", headers=headers)
+
+        item = client.post("/cart/items", json={"product_id": product_id, "quantity": 1}, headers=headers).json()
+        assert client.get("/cart", headers=headers).json()["items"][0]["quantity"] == 1
+
+        client.put(f"/cart/items/{item['id']}", json={"quantity": 4}, headers=headers)
+        assert client.get("/cart", headers=headers).json()["items"][0]["quantity"] == 4
+
+        client.delete(f"/cart/items/{item['id']}", headers=headers)
+        assert client.get("/cart", headers=headers).json()["items"] == []
+
+        client.post("/cart/items", json={"product_id": product_id, "quantity": 2}, headers=headers)
+        client.get("/cart", headers=headers)
+        client.post("/cart/checkout", headers=headers)
+        assert client.get("/cart", headers=headers).json() == {"items": [], "total": 0.0, "status": "active"}
+
+    def test_concurrent_reads_and_writes_converge(self, client, fresh_auth_headers):
+        """After interleaved readers and writers finish, the cached view matches the database."""
+        from app.routes.cart import _load_cart_view
+
+        headers = fresh_auth_headers()
+        product_id = client.get("/products").json()[0]["id"]
+        user_id = int(decode_access_token(headers["Authorization"].split()[1])["sub"])
+        errors = []
+
+        def writer():
+            try:
+                for _ in range(20):
+                    client.post("/cart/items", json={"product_id": product_id, "quantity": 1}, headers=headers)
+            except Exception as e:  # pragma: no cover - surfaced below
+                errors.append(e)
+
+        def reader():
+            try:
+                for _ in range(20):
+                    client.get("/cart", headers=headers)
+            except Exception as e:  # pragma: no cover - surfaced below
+                errors.append(e)
+
+        threads = [threading.Thread(target=writer)] + [
+            threading.Thread(target=reader) for _ in range(4)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert not errors
+        cached = client.get("/cart", headers=headers).json()
+        assert cached == _load_cart_view(user_id)
+        assert cached["items"][0]["quantity"] == 20
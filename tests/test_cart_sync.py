@@ -0,0 +1,73 @@
+"""Tests for cart line snapshots and propagation of product changes into active carts."""
+
+import io
+import sqlite3
+
+import pytest
+
+from app import database
+from app.backfill import get_backfill_status
+from app.cart_sync import refresh_active_cart_lines
+from app.catalog_import import import_catalog
+from migrate import get_migration_files, load_migration_module, run_backfills
+
+# Cart line refresh and backfills run SQL on the database file.
+pytestmark = pytest.mark.sqlite_only
+
+
+def _import(rows):
+    body = "id,name,price\n" + "".join(f"{pid},{name},{price}\n" for pid, name, price in rows)
+    return import_catalog(io.StringIO(body), "csv", background=False)
+
+
+class TestCartSnapshots:
+    def test_cart_shows_snapshot_until_refreshed(self, client, fresh_auth_headers):
+        """A product changed behind the API's back does not affect cart reads until refreshed."""
+        _import([(200001, "Snapshot Lamp", 10)])
+        headers = fresh_auth_headers()
+        client.post("/cart/items", json={"product_id": 200001, "quantity": 3}, headers=headers)
+
+        conn = sqlite3.connect(database.DATABASE_PATH, uri=True)
+        conn.execute("UPDATE products SET name = 'Renamed Lamp', price_cents = 1200 WHERE id = 200001")
+        conn.commit()
+        conn.close()
+        cart = client.get("/cart", headers=headers).json()
+        assert cart["items"][0]["price"] == 10
+        assert cart["total"] == 30
+
+        assert refresh_active_cart_lines([200001]) >= 1
+        cart = client.get("/cart", headers=headers).json()
+        assert cart["items"][0]["product_name"] == "Renamed Lamp"
+        assert cart["items"][0]["price"] == 12
+        assert cart["total"] == 36
+
+    def test_import_price_change_propagates_to_active_carts_only(self, client, fresh_auth_headers):
+        _import([(200002, "Synced Mug", 5)])
+        active = fresh_auth_headers()
+        buyer = fresh_auth_headers()
+        client.post("/cart/items", json={"product_id": 200002, "quantity": 2}, headers=active)
+        client.post("/cart/items", json={"product_id": 200002, "quantity": 2}, headers=buyer)
+        checkout = client.post("/cart/checkout", headers=buyer).json()
+
+        _import([(200002, "Synced Mug", 7.5)])
+        cart = client.get("/cart", headers=active).json()
+        assert cart["items"][0]["price"] == 7.5
+        assert cart["total"] == 15
+        assert checkout["total"] == 10
+
+
+class TestSnapshotBackfill:
+    def test_migration_defines_backfill(self):
+        modules = [load_migration_module(path) for path in get_migration_files()]
+        assert any(hasattr(m, "backfill") for m in modules)
+
+    def test_backfills_complete_after_upgrade(self, client):
+        """The money migration finishes the snapshot backfill, so a later backfill run is a no-op."""
+        run_backfills()
+        assert get_backfill_status("005_add_cart_item_snapshots", db_path=database.DATABASE_PATH)["completed"]
+        conn = sqlite3.connect(database.DATABASE_PATH, uri=True)
+        missing = conn.execute(
+            "SELECT COUNT(*) FROM cart_items WHERE unit_price_cents IS NULL OR product_name IS NULL"
+        ).fetchone()[0]
+        conn.close()
+        assert missing == 0
@@ -0,0 +1,107 @@
+"""Tests for the bulk catalog import pipeline and its admin endpoint."""
+
+import io
+import json
+import sqlite3
+
+import pytest
+
+from app import catalog, catalog_import, database
+from app.catalog_import import import_catalog
+
+# The import pipeline writes the SQLite file directly.
+pytestmark = pytest.mark.sqlite_only
+
+
+def _products_by_id(client):
+    return {p["id"]: p for p in client.get("/products").json()}
+
+
+class TestImportEndpoint:
+    """POST /admin/products/import"""
+
+    def test_import_requires_admin_key(self, client):
+        response = client.post("/admin/products/import", content=b"name,price\nX,1\n")
+        assert response.status_code == 403
+
+    def test_csv_import_inserts_and_reports_throughput(self, client, admin_headers):
+        body = "id,name,price\n100001,Import A,1.50\n100002,Import B,2.25\n,No Id,3\n"
+        response = client.post("/admin/products/import?format=csv", content=body, headers=admin_headers)
+        assert response.status_code == 200
+        data = response.json()
+        assert data["imported"] == 3
+        assert data["failed"] == 0
+        assert data["rows_per_sec"] > 0
+        products = _products_by_id(client)
+        assert products[100001] == {"id": 100001, "name": "Import A", "price": 1.5}
+        assert any(p["name"] == "No Id" for p in products.values())
+
+    def test_jsonl_import_upserts_existing_ids(self, client, admin_headers):
+        lines = [{"id": 100010, "name": "Before", "price": 5}]
+        client.post(
+            "/admin/products/import?format=jsonl",
+            content="\n".join(json.dumps(r) for r in lines),
+            headers=admin_headers,
+        )
+        lines = [{"id": 100010, "name": "After", "price": 6.5}]
+        response = client.post(
+            "/admin/products/import?format=jsonl",
+            content="\n".join(json.dumps(r) for r in lines),
+            headers=admin_headers,
+        )
+        assert response.json()["imported"] == 1
+        assert _products_by_id(client)[100010] == {"id": 100010, "name": "After", "price": 6.5}
+
+    def test_invalid_rows_are_reported_and_skipped(self, client, admin_headers):
+        body = "id,name,price\n100020,Good,1\n100021,,1\n100022,Bad Price,abc\n100023,Negative,-1\n"
+        data = client.post("/admin/products/import", content=body, headers=admin_headers).json()
+        assert data["imported"] == 1
+        assert data["failed"] == 3
+        assert [e["line"] for e in data["errors"]] == [3, 4, 5]
+
+    def test_unknown_format_returns_400(self, client, admin_headers):
+        response = client.post("/admin/products/import?format=xml", content=b"", headers=admin_headers)
+        assert response.status_code == 400
+
+
+class TestImportCatalog:
+    def test_catalog_version_bumped_once_for_many_chunks(self, client):
+        before = catalog.get_version()
+        rows = "".join(f"{100100 + i},Chunked {i},{i}\n" for i in range(10))
+        result = import_catalog(io.StringIO("id,name,price\n" + rows), "csv", chunk_size=3)
+        assert result["imported"] == 10
+        assert catalog.get_version() == before + 1
+
+    def test_secondary_indexes_are_rebuilt(self, client):
+        conn = sqlite3.connect(database.DATABASE_PATH, uri=True)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_test_products_name ON products(name)")
+        conn.commit()
+        try:
+            import_catalog(io.StringIO("id,name,price\n100200,Indexed,1\n"), "csv")
+            names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+            assert "idx_test_products_name" in names
+        finally:
+            conn.execute("DROP INDEX IF EXISTS idx_test_products_name")
+            conn.commit()
+            conn.close()
+
+    def test_unique_indexes_stay_and_a_failed_rebuild_keeps_the_load_error(self, client, monkeypatch):
+        conn = sqlite3.connect(database.DATABASE_PATH, uri=True)
+        conn.execute("CREATE UNIQUE INDEX idx_test_products_unique_name ON products(name)")
+        conn.commit()
+        drop = catalog_import._drop_secondary_indexes
+        monkeypatch.setattr(
+            catalog_import,
+            "_drop_secondary_indexes",
+            lambda c: drop(c) + ["CREATE INDEX idx_test_broken ON no_such_table(x)"],
+        )
+        try:
+            rows = "id,name,price\n100300,Twin,1\n100301,Twin,2\n"
+            with pytest.raises(sqlite3.IntegrityError):
+                import_catalog(io.StringIO(rows), "csv")
+            names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+            assert "idx_test_products_unique_name" in names
+        finally:
+            conn.execute("DROP INDEX IF EXISTS idx_test_products_unique_name")
+            conn.commit()
+            conn.close()
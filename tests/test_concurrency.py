@@ -0,0 +1,60 @@
+"""Tests for per-route-group concurrency limits."""
+
+import threading
+import time
+import weakref
+
+import pytest
+
+from app import concurrency, metrics
+
+
+@pytest.fixture
+def blocked_login(client, monkeypatch):
+    """Limit auth to one slot with a short queue timeout, and make password checks block until released."""
+    group = concurrency.GROUPS["auth"]
+    monkeypatch.setattr(group, "limit", 1)
+    monkeypatch.setattr(group, "queue_timeout", 0.05)
+    monkeypatch.setattr(group, "_semaphores", weakref.WeakKeyDictionary())
+    entered, release = threading.Event(), threading.Event()
+
+    def slow_verify(password, hashed):
+        entered.set()
+        release.wait(5)
+        return False
+
+    monkeypatch.setattr("app.routes.auth.verify_password", slow_verify)
+    client.post("/auth/register", json={"email": "limits@example.com", "password": "pass123"})
+    body = {"email": "limits@example.com", "password": "pass123"}
+    holder = threading.Thread(target=client.post, args=("/auth/login",), kwargs={"json": body})
+    holder.start()
+    assert entered.wait(5)
+    yield body
+    release.set()
+    holder.join()
+
+
+class TestConcurrencyLimits:
+    def test_saturated_group_returns_fast_503(self, client, blocked_login):
+        rejected = metrics.get_counter("concurrency.auth.rejected")
+        started = time.perf_counter()
+        response = client.post("/auth/login", json=blocked_login)
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+        assert time.perf_counter() - started < 1
+        assert metrics.get_counter("concurrency.auth.rejected") == rejected + 1
+
+    def test_other_groups_unaffected(self, client, blocked_login):
+        assert client.get("/products").status_code == 200
+
+    def test_queue_wait_is_recorded(self, client):
+        client.get("/products")
+        assert metrics.snapshot()["timings"]["concurrency.catalog_read.queue_wait_seconds"]["count"] > 0
+
+    def test_threadpool_sized_at_startup(self, client):
+        from app import warmup
+
+        assert warmup.wait_until_ready(30)
+        data = client.get("/health/ready").json()
+        assert data["threadpool"]["limit"] == concurrency.THREADPOOL_SIZE
+        assert set(data["concurrency"]) == {"auth", "cart_write", "catalog_read"}
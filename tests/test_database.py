@@ -0,0 +1,97 @@
+"""Tests for in-memory databases, template clones and switching databases."""
+
+import sqlite3
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import database, idempotency
+from app.database import (
+    ShardCountMismatch,
+    clone_database,
+    derived_path,
+    drop_database,
+    get_db,
+    recorded_shard_count,
+    use_database,
+)
+from app.main import app
+from migrate import run_migrations
+
+# Copies are made of the SQLite schema and rows.
+pytestmark = pytest.mark.sqlite_only
+
+
+def test_derived_paths_keep_uri_query():
+    assert derived_path("data/app.db", "_shard2") == "data/app_shard2.db"
+    assert derived_path("file:/app?vfs=memdb", "_shard2") == "file:/app_shard2?vfs=memdb"
+    assert database.default_archive_path("data/app.db") == "data/app_archive.db"
+    assert database.default_archive_path("file:/app?vfs=memdb") == "file:/app_archive?vfs=memdb"
+
+
+def test_clone_is_independent_of_its_source(_database):
+    with get_db() as conn:
+        conn.execute("INSERT INTO items (name) VALUES ('in source')")
+    clone = "file:/test_clone?vfs=memdb"
+    clone_database(_database, clone)
+    try:
+        with get_db() as conn:
+            conn.execute("DELETE FROM items WHERE name = 'in source'")
+        # The clone outlives the connections that created it.
+        conn = sqlite3.connect(clone, uri=True)
+        assert conn.execute("SELECT COUNT(*) FROM items WHERE name = 'in source'").fetchone()[0] == 1
+        assert conn.execute("SELECT COUNT(*) FROM _migrations").fetchone()[0] > 0
+        conn.close()
+    finally:
+        drop_database(clone)
+
+
+def test_each_test_starts_from_the_template(_database):
+    with get_db() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM users").fetchone()[0] == 0
+        assert conn.execute("SELECT COUNT(*) FROM products").fetchone()[0] > 0
+
+
+def test_use_database_switches_connections_and_drops_caches(_database):
+    with get_db() as conn:
+        conn.execute("INSERT INTO items (name) VALUES ('before switch')")
+    idempotency._remember(1, "key", "digest", {}, float("inf"))
+    other = "file:/test_switched?vfs=memdb"
+    clone_database(_database, other)
+    with get_db() as conn:
+        conn.execute("DELETE FROM items WHERE name = 'before switch'")
+    try:
+        use_database(other)
+        assert database.ARCHIVE_DATABASE_PATH == "file:/test_switched_archive?vfs=memdb"
+        assert idempotency._lookup(1, "key") is None
+        with get_db() as conn:
+            assert conn.execute("SELECT COUNT(*) FROM items WHERE name = 'before switch'").fetchone()[0] == 1
+    finally:
+        use_database(_database)
+        drop_database("file:/test_switched_archive?vfs=memdb")
+        drop_database(other)
+
+
+def test_trace_counts_repeated_statements_but_not_trigger_bodies():
+    select = "SELECT id FROM products WHERE id = ?"
+    insert = "INSERT INTO cart_items (cart_id, product_id, quantity, unit_price_cents) VALUES (?, 1, 1, 100)"
+    with get_db() as conn:
+        cart_id = conn.execute("INSERT INTO cart (user_id) VALUES (1) RETURNING id").fetchone()[0]
+    with database.trace_statements() as statements:
+        with get_db() as conn:
+            for _ in range(2):
+                conn.execute(select, (1,)).fetchone()
+            # Fires the cart total trigger.
+            conn.cursor().execute(insert, (cart_id,))
+    assert statements == [select, select, insert]
+
+
+def test_refuses_to_start_with_another_shard_count(_database):
+    with get_db() as conn:
+        assert recorded_shard_count(conn) == database.SHARD_COUNT == 1
+        conn.execute("UPDATE _meta SET value = '4' WHERE key = 'shard_count'")
+    with pytest.raises(ShardCountMismatch, match="SHARD_COUNT=4"):
+        with TestClient(app):
+            pass
+    with pytest.raises(SystemExit, match="SHARD_COUNT=4"):
+        run_migrations("upgrade")
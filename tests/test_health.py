@@ -1,7 +1,11 @@
 """Tests for the health check API."""
 
+import os
+
 import pytest
 
+from migrate import get_migration_files
+
 
 class TestHealth:
     """GET /health"""
@@ -12,3 +16,89 @@ class TestHealth:
         assert response.status_code == 200
         data = response.json()
         assert data == {"status": "healthy"}
+
+
+class TestReadiness:
+    """GET /health/ready"""
+
+    def test_ready_after_warmup(self, client):
+        """Once warm-up has finished, readiness returns 200 and the warm-up duration."""
+        from app import warmup
+
+        assert warmup.wait_until_ready(30)
+        response = client.get("/health/ready")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["status"] == "ready"
+        assert data["warmup_seconds"] > 0
+        assert data["database"]["ok"] is True
+        assert data["database"]["latency_ms"] >= 0
+        latest = os.path.basename(get_migration_files()[-1]).replace(".py", "")
+        assert data["database"]["migration"] == latest
+        assert data["database"]["wal_bytes"] >= 0
+        assert 0 <= data["pool"]["utilization"] <= 1
+        assert data["threadpool"]["limit"] > 0
+
+    def test_database_probe_is_cached(self, client):
+        """Repeated readiness polls within the TTL probe the database at most once."""
+        from app import metrics, warmup
+
+        assert warmup.wait_until_ready(30)
+        before = metrics.get_counter("health.probe_cache_misses")
+        for _ in range(5):
+            assert client.get("/health/ready").status_code == 200
+        assert metrics.get_counter("health.probe_cache_misses") - before <= 1
+
+    def test_database_failure_returns_503(self, client, monkeypatch):
+        from app import probes, warmup
+
+        assert warmup.wait_until_ready(30)
+        monkeypatch.setattr(probes, "_cached", None)
+        monkeypatch.setattr(
+            probes,
+            "_probe_database",
+            lambda: {"ok": False, "error": "disk I/O error", "latency_ms": None, "migration": None},
+        )
+        response = client.get("/health/ready")
+        assert response.status_code == 503
+        assert response.json()["database"]["error"] == "disk I/O error"
+        monkeypatch.setattr(probes, "_cached", None)
+
+    def test_saturated_threadpool_returns_503(self, client, monkeypatch):
+        from app import probes, warmup
+
+        assert warmup.wait_until_ready(30)
+        monkeypatch.setattr(
+            probes, "threadpool_status", lambda limiter: {"in_use": 40, "limit": 40, "saturation": 1.0}
+        )
+        response = client.get("/health/ready")
+        assert response.status_code == 503
+        assert response.json()["status"] == "unavailable"
+
+    def test_not_ready_returns_503(self, client, monkeypatch):
+        """Before warm-up completes, readiness returns 503."""
+        from app import warmup
+
+        monkeypatch.setattr(warmup, "is_ready", lambda: False)
+        response = client.get("/health/ready")
+        assert response.status_code == 503
+        assert response.json() == {"status": "warming_up"}
+
+    def test_warmup_steps_do_not_fail(self, client, caplog):
+        """Every step runs cleanly, including the index pre-read over partial indexes."""
+        from app import metrics, warmup
+
+        assert warmup.wait_until_ready(30)
+        before = metrics.get_counter("warmup.failures")
+        warmup.run_warmup()
+        assert metrics.get_counter("warmup.failures") == before
+        assert "Warm-up step" not in caplog.text
+
+    def test_pool_prefill_opens_idle_connections(self, client):
+        """Warm-up pre-opens connections up to the pool size."""
+        from app.database import get_pool
+
+        pool = get_pool()
+        pool.prefill()
+        stats = pool.stats()
+        assert stats["idle"] + stats["in_use"] >= stats["size"]
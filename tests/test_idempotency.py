@@ -0,0 +1,97 @@
+"""Tests for Idempotency-Key replay on cart writes and checkout."""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app import idempotency
+from app.database import trace_statements
+
+
+@pytest.fixture
+def headers(client, fresh_auth_headers):
+    from app import warmup
+
+    assert warmup.wait_until_ready(30)
+    return fresh_auth_headers()
+
+
+@pytest.fixture
+def product_id(client):
+    return client.get("/products").json()[0]["id"]
+
+
+def _add(client, headers, product_id, key, quantity=1):
+    return client.post(
+        "/cart/items",
+        json={"product_id": product_id, "quantity": quantity},
+        headers={**headers, "Idempotency-Key": key},
+    )
+
+
+class TestIdempotentAdd:
+    """POST /cart/items with Idempotency-Key"""
+
+    def test_retry_replays_without_writing(self, client, headers, product_id):
+        first = _add(client, headers, product_id, "add-1")
+        assert first.status_code == 201
+        assert "Idempotent-Replayed" not in first.headers
+        with trace_statements() as statements:
+            retry = _add(client, headers, product_id, "add-1")
+        assert retry.status_code == 201
+        assert retry.json() == first.json()
+        assert retry.headers["Idempotent-Replayed"] == "true"
+        assert statements == []
+        assert client.get("/cart", headers=headers).json()["items"][0]["quantity"] == 1
+
+    @pytest.mark.sqlite_only
+    def test_replay_from_table_is_one_read(self, client, headers, product_id):
+        first = _add(client, headers, product_id, "add-2")
+        idempotency.clear_cache()
+        with trace_statements() as statements:
+            retry = _add(client, headers, product_id, "add-2")
+        assert retry.json() == first.json()
+        assert len(statements) == 1 and statements[0].lstrip().startswith("SELECT"), statements
+
+    def test_key_reused_for_different_request_returns_422(self, client, headers, product_id):
+        _add(client, headers, product_id, "add-3", quantity=1)
+        assert _add(client, headers, product_id, "add-3", quantity=5).status_code == 422
+
+    def test_new_key_adds_again(self, client, headers, product_id):
+        _add(client, headers, product_id, "add-4")
+        _add(client, headers, product_id, "add-5")
+        assert client.get("/cart", headers=headers).json()["items"][0]["quantity"] == 2
+
+    def test_keys_are_per_user(self, client, fresh_auth_headers, headers, product_id):
+        other = fresh_auth_headers()
+        _add(client, headers, product_id, "shared-key")
+        response = _add(client, other, product_id, "shared-key")
+        assert response.status_code == 201
+        assert "Idempotent-Replayed" not in response.headers
+
+    def test_concurrent_duplicates_write_once(self, client, headers, product_id):
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            responses = list(pool.map(lambda _: _add(client, headers, product_id, "add-burst"), range(4)))
+        assert {r.status_code for r in responses} == {201}
+        assert sum("Idempotent-Replayed" not in r.headers for r in responses) == 1
+        assert client.get("/cart", headers=headers).json()["items"][0]["quantity"] == 1
+
+    def test_invalid_key_returns_400(self, client, headers, product_id):
+        assert _add(client, headers, product_id, "k" * 256).status_code == 400
+
+    def test_failed_write_is_not_stored(self, client, headers):
+        assert _add(client, headers, 999999, "add-missing").status_code == 404
+        assert _add(client, headers, 999999, "add-missing").status_code == 404
+
+
+class TestIdempotentCheckout:
+    """POST /cart/checkout with Idempotency-Key"""
+
+    def test_retry_returns_first_checkout(self, client, headers, product_id):
+        _add(client, headers, product_id, "before-checkout")
+        checkout_headers = {**headers, "Idempotency-Key": "checkout-1"}
+        first = client.post("/cart/checkout", headers=checkout_headers)
+        assert first.json()["message"] == "Checkout successful"
+        retry = client.post("/cart/checkout", headers=checkout_headers)
+        assert retry.json() == first.json()
+        assert retry.headers["Idempotent-Replayed"] == "true"
@@ -0,0 +1,87 @@
+"""Tests for the cross-worker cache invalidation bus."""
+
+import sqlite3
+import time
+
+import pytest
+
+from app import catalog, database, metrics
+from app.cart_cache import cart_cache
+from app.database import get_db
+from app.invalidation import bus, publish
+
+# The bus is a table in the SQLite file.
+pytestmark = pytest.mark.sqlite_only
+
+OTHER_WORKER = "other-worker"
+USER_ID = 987654
+
+
+def _foreign_event(topic, key=None, age=0.0):
+    """Commit an event as another worker process would."""
+    conn = sqlite3.connect(database.DATABASE_PATH, uri=True)
+    conn.execute(
+        "INSERT INTO _cache_events (topic, key, origin, created_at) VALUES (?, ?, ?, ?)",
+        (topic, key, OTHER_WORKER, time.time() - age),
+    )
+    conn.commit()
+    conn.close()
+
+
+@pytest.fixture
+def synced_bus(client):
+    bus.poll()
+    yield bus
+    cart_cache.invalidate(USER_ID)
+
+
+class TestInvalidationBus:
+    def test_foreign_cart_event_evicts_cached_view(self, synced_bus):
+        cart_cache.set(USER_ID, {"items": [], "total": 0.0, "status": "active"})
+        lag_count = metrics.snapshot()["timings"].get("cache_bus.invalidation_lag_seconds", {}).get("count", 0)
+        _foreign_event("cart", USER_ID, age=0.2)
+        synced_bus.poll()
+        assert cart_cache.get(USER_ID) is None
+        lag = metrics.snapshot()["timings"]["cache_bus.invalidation_lag_seconds"]
+        assert lag["count"] > lag_count
+        assert lag["max"] >= 0.2
+
+    def test_foreign_catalog_event_bumps_catalog_version(self, synced_bus):
+        version = catalog.get_version()
+        _foreign_event("catalog")
+        synced_bus.poll()
+        assert catalog.get_version() > version
+
+    def test_own_events_are_not_reapplied(self, synced_bus):
+        with get_db() as conn:
+            publish(conn, "cart", USER_ID)
+        cart_cache.set(USER_ID, {"items": [], "total": 0.0, "status": "active"})
+        synced_bus.poll()
+        assert cart_cache.get(USER_ID) is not None
+
+    def test_event_rolls_back_with_the_write(self, synced_bus):
+        with get_db() as conn:
+            before = conn.execute("SELECT COUNT(*) FROM _cache_events").fetchone()[0]
+        with pytest.raises(RuntimeError):
+            with get_db() as conn:
+                publish(conn, "cart", USER_ID)
+                raise RuntimeError("write failed")
+        with get_db() as conn:
+            assert conn.execute("SELECT COUNT(*) FROM _cache_events").fetchone()[0] == before
+
+    def test_stale_reader_polls_synchronously(self, synced_bus, monkeypatch):
+        cart_cache.set(USER_ID, {"items": [], "total": 0.0, "status": "active"})
+        _foreign_event("cart", USER_ID)
+        monkeypatch.setattr(synced_bus, "_last_poll", time.monotonic() - synced_bus.max_staleness - 1)
+        synced_bus.ensure_fresh()
+        assert cart_cache.get(USER_ID) is None
+
+    def test_cart_write_publishes_event(self, client, fresh_auth_headers):
+        auth_headers = fresh_auth_headers()
+        with get_db() as conn:
+            last = conn.execute("SELECT COALESCE(MAX(id), 0) FROM _cache_events").fetchone()[0]
+        products = client.get("/products").json()
+        client.post("/cart/items", json={"product_id": products[0]["id"], "quantity": 1}, headers=auth_headers)
+        with get_db() as conn:
+            topics = [row["topic"] for row in conn.execute("SELECT topic FROM _cache_events WHERE id > ?", (last,))]
+        assert "cart" in topics
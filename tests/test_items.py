@@ -99,3 +99,67 @@ class TestDeleteItem:
         response = client.delete("/items/99999")
         assert response.status_code == 404
         assert "not found" in response.json()["detail"].lower()
+
+
+class TestPaginateItems:
+    """GET /items?after=&limit="""
+
+    def test_pages_follow_keyset_cursor(self, client):
+        """Walking next_after visits every item exactly once, in id order."""
+        client.post("/items/bulk", json={"items": [{"name": f"Page{i}"} for i in range(5)]})
+        all_ids = [item["id"] for item in client.get("/items?limit=1000").json()["items"]]
+        seen, after = [], 0
+        while True:
+            page = client.get(f"/items?after={after}&limit=2").json()
+            assert len(page["items"]) <= 2
+            seen.extend(item["id"] for item in page["items"])
+            if page["next_after"] is None:
+                break
+            after = page["next_after"]
+        assert seen == all_ids
+
+    def test_limit_out_of_range_returns_422(self, client):
+        assert client.get("/items?limit=0").status_code == 422
+
+
+class TestBulkItems:
+    """POST /items/bulk, PUT /items/bulk, POST /items/bulk/delete"""
+
+    def test_bulk_create_returns_items_in_order(self, client):
+        response = client.post("/items/bulk", json={"items": [{"name": "B1"}, {"name": "B2"}]})
+        assert response.status_code == 201
+        items = response.json()["items"]
+        assert [item["name"] for item in items] == ["B1", "B2"]
+        assert items[0]["id"] < items[1]["id"]
+
+    def test_bulk_update_renames_all(self, client):
+        items = client.post("/items/bulk", json={"items": [{"name": "U1"}, {"name": "U2"}]}).json()["items"]
+        body = {"items": [{"id": item["id"], "name": item["name"] + "-new"} for item in items]}
+        response = client.put("/items/bulk", json=body)
+        assert response.status_code == 200
+        for item in items:
+            assert client.get(f"/items/{item['id']}").json()["name"] == item["name"] + "-new"
+
+    def test_bulk_update_with_missing_id_changes_nothing(self, client):
+        item = client.post("/items", json={"name": "Keep"}).json()
+        body = {"items": [{"id": item["id"], "name": "Changed"}, {"id": 99999, "name": "Ghost"}]}
+        response = client.put("/items/bulk", json=body)
+        assert response.status_code == 404
+        assert "99999" in response.json()["detail"]
+        assert client.get(f"/items/{item['id']}").json()["name"] == "Keep"
+
+    def test_bulk_delete_removes_all(self, client):
+        items = client.post("/items/bulk", json={"items": [{"name": "D1"}, {"name": "D2"}]}).json()["items"]
+        response = client.post("/items/bulk/delete", json={"ids": [item["id"] for item in items]})
+        assert response.status_code == 204
+        for item in items:
+            assert client.get(f"/items/{item['id']}").status_code == 404
+
+    def test_bulk_delete_with_missing_id_deletes_nothing(self, client):
+        item = client.post("/items", json={"name": "Survivor"}).json()
+        response = client.post("/items/bulk/delete", json={"ids": [item["id"], 99999]})
+        assert response.status_code == 404
+        assert client.get(f"/items/{item['id']}").status_code == 200
+
+    def test_bulk_empty_list_returns_422(self, client):
+        assert client.post("/items/bulk", json={"items": []}).status_code == 422
@@ -0,0 +1,201 @@
+"""Tests for cart maintenance: idle cart purge, order archival and incremental vacuum."""
+
+import json
+import sqlite3
+import time
+
+import pytest
+
+from app import database, maintenance, stock
+from app.database import get_db
+
+# Maintenance works on the SQLite and archive files.
+pytestmark = pytest.mark.sqlite_only
+
+
+@pytest.fixture
+def user(register_user, fresh_auth_headers):
+    """(auth headers, email) of a new user."""
+    email = register_user()
+    return fresh_auth_headers(email), email
+
+
+def _add_item(client, headers, quantity=1):
+    product_id = client.get("/products").json()[0]["id"]
+    client.post("/cart/items", json={"product_id": product_id, "quantity": quantity}, headers=headers)
+
+
+def _cart_id(email, status="active"):
+    with get_db() as conn:
+        row = conn.execute(
+            """
+            SELECT c.id FROM cart c JOIN users u ON u.id = c.user_id
+            WHERE u.email = ? AND c.status = ? ORDER BY c.id DESC
+            """,
+            (email, status),
+        ).fetchone()
+    return row["id"] if row else None
+
+
+def _age(cart_id, seconds):
+    with get_db() as conn:
+        conn.execute("UPDATE cart SET updated_at = updated_at - ? WHERE id = ?", (seconds, cart_id))
+
+
+def _export(client, admin_headers):
+    response = client.get("/orders/export", headers=admin_headers)
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def _run():
+    return maintenance.run_maintenance(idle_ttl=3600, archive_after=3600, pause=0)
+
+
+class TestCartActivity:
+    def test_line_changes_touch_cart(self, client, user):
+        headers, email = user
+        _add_item(client, headers)
+        cart_id = _cart_id(email)
+        _age(cart_id, 1000)
+        _add_item(client, headers)
+        with get_db() as conn:
+            updated_at = conn.execute("SELECT updated_at FROM cart WHERE id = ?", (cart_id,)).fetchone()[0]
+        assert updated_at >= int(time.time()) - 5
+
+
+class TestExpireIdleCarts:
+    def test_idle_cart_is_purged_with_its_lines(self, client, user):
+        headers, email = user
+        _add_item(client, headers, 2)
+        assert client.get("/cart", headers=headers).json()["items"]
+        cart_id = _cart_id(email)
+        _age(cart_id, 7200)
+        report = _run()
+        assert report["expired_carts"] >= 1 and report["expired_lines"] >= 1
+        with get_db() as conn:
+            assert conn.execute("SELECT COUNT(*) FROM cart_items WHERE cart_id = ?", (cart_id,)).fetchone()[0] == 0
+        assert client.get("/cart", headers=headers).json()["items"] == []
+
+    def test_purge_returns_reserved_stock(self, client, user, admin_headers, monkeypatch):
+        headers, email = user
+        product_id = client.get("/products").json()[0]["id"]
+        client.put(f"/admin/products/{product_id}/stock", json={"available": 5}, headers=admin_headers)
+        monkeypatch.setattr(stock, "STOCK_RESERVATION_SECONDS", 60.0)
+        _add_item(client, headers, 2)
+        # Switched off again: the reaper no longer runs, and the purge alone must give the units back.
+        monkeypatch.setattr(stock, "STOCK_RESERVATION_SECONDS", 0.0)
+        cart_id = _cart_id(email)
+        _age(cart_id, 7200)
+        _run()
+        with get_db() as conn:
+            available = conn.execute("SELECT available FROM product_stock WHERE product_id = ?", (product_id,))
+            assert available.fetchone()[0] == 5
+            held = conn.execute("SELECT COUNT(*) FROM stock_reservations WHERE cart_id = ?", (cart_id,))
+            assert held.fetchone()[0] == 0
+
+    def test_recent_cart_is_kept(self, client, user):
+        headers, email = user
+        _add_item(client, headers)
+        _run()
+        assert len(client.get("/cart", headers=headers).json()["items"]) == 1
+
+
+class TestArchiveOrders:
+    def test_old_order_moves_to_archive_and_stays_exported(self, client, user, admin_headers):
+        headers, email = user
+        _add_item(client, headers, 3)
+        client.post("/cart/checkout", headers=headers)
+        order_id = _cart_id(email, "checked_out")
+        before = next(order for order in _export(client, admin_headers) if order["id"] == order_id)
+        _age(order_id, 7200)
+        report = _run()
+        assert report["archived_orders"] >= 1 and report["archived_lines"] >= 1
+        with get_db() as conn:
+            assert conn.execute("SELECT COUNT(*) FROM cart WHERE id = ?", (order_id,)).fetchone()[0] == 0
+        archive = sqlite3.connect(database.ARCHIVE_DATABASE_PATH, uri=True)
+        assert archive.execute("SELECT COUNT(*) FROM orders WHERE id = ?", (order_id,)).fetchone()[0] == 1
+        archive.close()
+        exported = _export(client, admin_headers)
+        assert [order for order in exported if order["id"] == order_id] == [before]
+        assert [order["id"] for order in exported] == sorted(order["id"] for order in exported)
+
+    def test_recent_order_is_not_archived(self, client, user):
+        headers, email = user
+        _add_item(client, headers)
+        client.post("/cart/checkout", headers=headers)
+        _run()
+        assert _cart_id(email, "checked_out") is not None
+
+    def test_archive_copy_commits_before_the_delete(self, client, user):
+        headers, email = user
+        _add_item(client, headers)
+        client.post("/cart/checkout", headers=headers)
+        order_id = _cart_id(email, "checked_out")
+        _age(order_id, 7200)
+        with get_db() as conn:
+            conn.execute(
+                "CREATE TRIGGER fail_order_delete BEFORE DELETE ON cart"
+                f" WHEN OLD.id = {order_id} BEGIN SELECT RAISE(ABORT, 'interrupted'); END"
+            )
+        with pytest.raises(sqlite3.IntegrityError):
+            _run()
+        archive = sqlite3.connect(database.ARCHIVE_DATABASE_PATH, uri=True)
+        assert archive.execute("SELECT COUNT(*) FROM orders WHERE id = ?", (order_id,)).fetchone()[0] == 1
+        assert _cart_id(email, "checked_out") == order_id
+        with get_db() as conn:
+            conn.execute("DROP TRIGGER fail_order_delete")
+        _run()
+        assert _cart_id(email, "checked_out") is None
+        assert archive.execute("SELECT COUNT(*) FROM order_items WHERE order_id = ?", (order_id,)).fetchone()[0] == 1
+        archive.close()
+
+    def test_interrupted_archive_is_exported_once(self, client, user, admin_headers):
+        headers, email = user
+        _add_item(client, headers)
+        client.post("/cart/checkout", headers=headers)
+        order_id = _cart_id(email, "checked_out")
+        _run()
+        # Simulate a pass that committed the archive copy but not the delete.
+        conn = sqlite3.connect(database.ARCHIVE_DATABASE_PATH, uri=True)
+        conn.execute("ATTACH DATABASE ? AS live", (database.DATABASE_PATH,))
+        conn.execute(
+            "INSERT INTO orders (id, user_id, total_cents, checked_out_at, archived_at)"
+            " SELECT id, user_id, total_cents, updated_at, 0 FROM live.cart WHERE id = ?",
+            (order_id,),
+        )
+        conn.execute(
+            "INSERT INTO order_items (id, order_id, product_id, quantity, product_name, unit_price_cents)"
+            " SELECT id, cart_id, product_id, quantity, product_name, unit_price_cents FROM live.cart_items"
+            " WHERE cart_id = ?",
+            (order_id,),
+        )
+        conn.commit()
+        conn.close()
+        matching = [order for order in _export(client, admin_headers) if order["id"] == order_id]
+        assert len(matching) == 1 and len(matching[0]["items"]) == 1
+        _age(order_id, 7200)
+        assert _run()["archived_orders"] >= 1
+        assert len([order for order in _export(client, admin_headers) if order["id"] == order_id]) == 1
+
+
+class TestVacuumAndScheduling:
+    def test_database_uses_incremental_auto_vacuum(self, client):
+        with get_db() as conn:
+            assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+        report = _run()
+        assert report["vacuumed_pages"] >= 0 and report["seconds"] >= 0
+
+    def test_admin_endpoint_runs_a_pass(self, client, admin_headers):
+        assert client.post("/admin/maintenance").status_code == 403
+        response = client.post("/admin/maintenance", headers=admin_headers)
+        assert response.status_code == 200
+        assert {"expired_carts", "archived_orders", "vacuumed_pages", "seconds"} <= set(response.json())
+
+    def test_scheduler_runs_passes(self, client):
+        scheduler = maintenance.MaintenanceScheduler(interval=0.05)
+        scheduler.start()
+        deadline = time.time() + 10
+        while scheduler.last_report is None and time.time() < deadline:
+            time.sleep(0.05)
+        scheduler.stop()
+        assert scheduler.last_report is not None
@@ -0,0 +1,64 @@
+"""Tests for integer-cents money handling."""
+
+import io
+import sqlite3
+
+import pytest
+
+from app import database
+from app.catalog_import import import_catalog
+from app.money import from_cents, to_cents
+
+
+class TestConversions:
+    @pytest.mark.parametrize(
+        "amount, cents",
+        [("19.99", 1999), (19.99, 1999), (0.1, 10), ("5", 500), (0, 0), ("0.005", 1), ("1.004", 100)],
+    )
+    def test_to_cents(self, amount, cents):
+        assert to_cents(amount) == cents
+
+    @pytest.mark.parametrize("amount", ["abc", "", None, "nan", "inf"])
+    def test_to_cents_rejects_invalid(self, amount):
+        with pytest.raises(ValueError):
+            to_cents(amount)
+
+    def test_from_cents(self):
+        assert from_cents(1999) == 19.99
+        assert from_cents(0) == 0.0
+
+
+@pytest.mark.sqlite_only
+class TestMoneySchema:
+    def test_money_columns_are_integer_cents(self, client):
+        conn = sqlite3.connect(database.DATABASE_PATH, uri=True)
+        columns = {
+            table: {row[1]: row[2] for row in conn.execute(f"PRAGMA table_info({table})")}
+            for table in ("products", "cart", "cart_items")
+        }
+        laptop = conn.execute("SELECT price_cents FROM products WHERE name = 'Laptop'").fetchone()
+        conn.close()
+        assert columns["products"]["price_cents"] == "INTEGER" and "price" not in columns["products"]
+        assert columns["cart"]["total_cents"] == "INTEGER" and "total" not in columns["cart"]
+        assert columns["cart_items"]["unit_price_cents"] == "INTEGER"
+        assert laptop == (99999,)
+
+    def test_money_columns_are_not_null(self, client):
+        conn = sqlite3.connect(database.DATABASE_PATH, uri=True)
+        try:
+            with pytest.raises(sqlite3.IntegrityError):
+                conn.execute("INSERT INTO products (name) VALUES ('No Price')")
+            with pytest.raises(sqlite3.IntegrityError):
+                conn.execute("INSERT INTO cart_items (cart_id, product_id, quantity) VALUES (1, 1, 1)")
+        finally:
+            conn.close()
+
+    def test_cart_total_is_exact(self, client, fresh_auth_headers):
+        """3 x 0.10 totals exactly 0.30 (float math would give 0.30000000000000004)."""
+        import_catalog(io.StringIO("id,name,price\n200100,Dime Candy,0.10\n"), "csv", background=False)
+        headers = fresh_auth_headers()
+        client.post("/cart/items", json={"product_id": 200100, "quantity": 3}, headers=headers)
+        cart = client.get("/cart", headers=headers).json()
+        assert cart["total"] == 0.3
+        assert cart["items"][0]["subtotal"] == 0.3
+        assert client.post("/cart/checkout", headers=headers).json()["total"] == 0.3
@@ -0,0 +1,54 @@
+"""Tests for the admin orders export API."""
+
+import json
+
+import pytest
+
+# The export streams from the SQLite files.
+pytestmark = pytest.mark.sqlite_only
+
+
+def _checkout_order(client, headers, quantities):
+    """Add products in the given quantities to the cart of the user behind headers and check out."""
+    products = client.get("/products").json()
+    for product, quantity in zip(products, quantities):
+        client.post("/cart/items", json={"product_id": product["id"], "quantity": quantity}, headers=headers)
+    return client.post("/cart/checkout", headers=headers).json()
+
+
+def _export(client, admin_headers, after=0):
+    response = client.get(f"/orders/export?after={after}", headers=admin_headers)
+    assert response.status_code == 200
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+class TestExportOrders:
+    """GET /orders/export"""
+
+    def test_export_requires_admin_key(self, client):
+        assert client.get("/orders/export").status_code == 403
+        assert client.get("/orders/export", headers={"X-Admin-Key": "wrong"}).status_code == 403
+
+    def test_export_includes_checked_out_orders_with_items(self, client, fresh_auth_headers, admin_headers):
+        checkout = _checkout_order(client, fresh_auth_headers(), [2, 1, 3])
+        order = _export(client, admin_headers)[-1]
+        assert [item["quantity"] for item in order["items"]] == [2, 1, 3]
+        assert order["total"] == checkout["total"]
+        assert all({"product_id", "product_name", "price"} <= set(item) for item in order["items"])
+
+    def test_orders_spanning_chunks_are_not_split(self, client, fresh_auth_headers, admin_headers, monkeypatch):
+        from app import exports
+
+        _checkout_order(client, fresh_auth_headers(), [1, 1, 1])
+        _checkout_order(client, fresh_auth_headers(), [1, 1])
+        full = _export(client, admin_headers)
+        monkeypatch.setattr(exports, "EXPORT_CHUNK_SIZE", 2)
+        assert _export(client, admin_headers) == full
+        assert len({order["id"] for order in full}) == len(full)
+
+    def test_export_resumes_after_cursor(self, client, fresh_auth_headers, admin_headers):
+        _checkout_order(client, fresh_auth_headers(), [1])
+        _checkout_order(client, fresh_auth_headers(), [1])
+        orders = _export(client, admin_headers)
+        resumed = _export(client, admin_headers, after=orders[-2]["id"])
+        assert resumed == orders[-1:]
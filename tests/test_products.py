@@ -1,5 +1,7 @@
 """Tests for the Products API (read-only)."""
 
+import json
+
 import pytest
 
 
@@ -35,3 +37,88 @@ class TestListProducts:
         prices = [p["price"] for p in products]
         assert all(isinstance(n, str) and len(n) > 0 for n in names)
         assert all(isinstance(pr, (int, float)) and pr >= 0 for pr in prices)
+
+
+@pytest.mark.sqlite_only
+class TestExportProducts:
+    """GET /products/export"""
+
+    def test_export_streams_ndjson_catalog(self, client):
+        """Export returns every product as one JSON object per line, ordered by id."""
+        response = client.get("/products/export")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert lines == client.get("/products").json()
+
+    def test_export_small_chunks_matches_full_export(self, client, monkeypatch):
+        from app import exports
+
+        full = client.get("/products/export").text
+        monkeypatch.setattr(exports, "EXPORT_CHUNK_SIZE", 3)
+        assert client.get("/products/export").text == full
+
+    def test_export_resumes_after_cursor(self, client):
+        products = client.get("/products").json()
+        after = products[1]["id"]
+        response = client.get(f"/products/export?after={after}")
+        ids = [json.loads(line)["id"] for line in response.text.splitlines()]
+        assert ids == [p["id"] for p in products if p["id"] > after]
+
+
+class TestProductQueries:
+    """GET /products with price range, sort and limit (columnar catalog index)"""
+
+    def test_price_range_sorted_by_price(self, client):
+        all_products = client.get("/products").json()
+        response = client.get("/products", params={"min_price": 10, "max_price": 100, "sort": "price"})
+        assert response.status_code == 200
+        expected = sorted(
+            (p for p in all_products if 10 <= p["price"] <= 100), key=lambda p: (p["price"], p["id"])
+        )
+        assert response.json() == expected
+
+    def test_cheapest_n(self, client):
+        all_products = client.get("/products").json()
+        response = client.get("/products", params={"sort": "price", "limit": 3})
+        assert response.json() == sorted(all_products, key=lambda p: (p["price"], p["id"]))[:3]
+
+    def test_range_keeps_id_order_by_default(self, client):
+        response = client.get("/products", params={"min_price": 20})
+        ids = [p["id"] for p in response.json()]
+        assert ids == sorted(ids)
+        assert all(p["price"] >= 20 for p in response.json())
+
+    def test_invalid_sort_returns_422(self, client):
+        assert client.get("/products", params={"sort": "name"}).status_code == 422
+
+    def test_index_rebuilt_after_catalog_change(self, client):
+        from app import catalog
+        from app.catalog_index import get_index
+
+        client.get("/products", params={"sort": "price", "limit": 1})
+        before = get_index()
+        catalog.invalidate()
+        after = get_index()
+        assert after is not before
+        assert after.version == catalog.get_version()
+
+
+class TestCatalogIndex:
+    def test_range_and_memory_report(self):
+        from app.catalog_index import CatalogIndex
+
+        products = [
+            {"id": 1, "name": "Pen", "price_cents": 150},
+            {"id": 2, "name": "Café", "price_cents": 99},
+            {"id": 3, "name": "Ink", "price_cents": 150},
+            {"id": 4, "name": "Desk", "price_cents": 25000},
+        ]
+        index = CatalogIndex(products, version=7)
+        assert [p["id"] for p in index.query(min_cents=100, max_cents=150, sort="price")] == [1, 3]
+        assert [p["id"] for p in index.query(sort="price", limit=2)] == [2, 1]
+        assert index.query(min_cents=30000) == []
+        assert index.row(1) == {"id": 2, "name": "Café", "price": 0.99}
+        stats = index.stats()
+        assert stats["products"] == 4 and stats["bytes"] == index.memory_bytes() > 0
+        assert stats["bytes_per_million_products"] == round(stats["bytes"] / 4 * 1_000_000)
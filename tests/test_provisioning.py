@@ -0,0 +1,58 @@
+"""Tests for bulk user provisioning and its admin endpoint."""
+
+import io
+import json
+
+import pytest
+
+from app.provisioning import provision_users
+
+# Provisioning inserts into the SQLite shards directly.
+pytestmark = pytest.mark.sqlite_only
+
+
+def _login(client, email, password):
+    return client.post("/auth/login", json={"email": email, "password": password}).status_code
+
+
+class TestProvisionUsers:
+    def test_hashes_in_process_pool_and_reports_row_errors(self, client):
+        body = (
+            "email,password\n"
+            "bulk1@example.com,secret123\n"
+            "BULK2@example.com,secret456\n"
+            "not-an-email,secret123\n"
+            "bulk3@example.com,short\n"
+            "bulk1@example.com,secret789\n"
+            "bulk4@example.com,secret000\n"
+        )
+        result = provision_users(io.StringIO(body), "csv", chunk_size=2, workers=2)
+        assert result["created"] == 3
+        assert result["failed"] == 3
+        assert [e["line"] for e in result["errors"]] == [4, 5, 6]
+        assert "duplicate" in result["errors"][2]["error"]
+        assert result["users_per_sec"] > 0
+        assert _login(client, "bulk2@example.com", "secret456") == 200
+
+    def test_existing_users_are_reported_not_overwritten(self, client):
+        client.post("/auth/register", json={"email": "existing_bulk@example.com", "password": "original1"})
+        lines = [{"email": "existing_bulk@example.com", "password": "changed1"}, ["not", "an", "object"]]
+        result = provision_users(io.StringIO("\n".join(json.dumps(r) for r in lines)), "jsonl", workers=1)
+        assert result["created"] == 0
+        assert [e["error"] for e in result["errors"]] == ["email already registered", "expected a JSON object"]
+        assert _login(client, "existing_bulk@example.com", "original1") == 200
+
+
+class TestProvisionEndpoint:
+    """POST /admin/users/import"""
+
+    def test_requires_admin_key(self, client):
+        assert client.post("/admin/users/import", content=b"email,password\n").status_code == 403
+
+    def test_import_users(self, client, admin_headers, monkeypatch):
+        monkeypatch.setattr("app.provisioning.PROVISION_WORKERS", 1)
+        body = "email,password\nendpoint_bulk@example.com,secret123\n"
+        response = client.post("/admin/users/import?format=csv", content=body, headers=admin_headers)
+        assert response.status_code == 200
+        assert response.json()["created"] == 1
+        assert _login(client, "endpoint_bulk@example.com", "secret123") == 200
@@ -0,0 +1,208 @@
+"""Contract tests: the SQLite and in-memory repositories behave the same."""
+
+import time
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+from app import database, repositories, warmup
+from app.repositories import DuplicateEmail, ProductNotFound, memory, sqlite
+
+
+def _no_store(tx, result):
+    pass
+
+
+@pytest.fixture(params=["sqlite", "memory"])
+def repos(request, _migrate):
+    if request.param == "sqlite":
+        return SimpleNamespace(
+            users=sqlite.SqliteUserRepository(),
+            products=sqlite.SqliteProductRepository(),
+            carts=sqlite.SqliteCartRepository(),
+            items=sqlite.SqliteItemRepository(),
+            idempotency_keys=sqlite.SqliteIdempotencyKeyRepository(),
+        )
+    store = memory.MemoryStore()
+    return SimpleNamespace(
+        users=memory.MemoryUserRepository(store),
+        products=memory.MemoryProductRepository(store),
+        carts=memory.MemoryCartRepository(store),
+        items=memory.MemoryItemRepository(store),
+        idempotency_keys=memory.MemoryIdempotencyKeyRepository(store),
+    )
+
+
+@pytest.fixture
+def user_id(repos):
+    return repos.users.create(f"repo_{uuid.uuid4().hex}@example.com", "hash")
+
+
+class TestUsers:
+    def test_create_and_get_by_email(self, repos):
+        email = f"repo_{uuid.uuid4().hex}@example.com"
+        user_id = repos.users.create(email, "hash")
+        assert repos.users.get_by_email(email) == {"id": user_id, "email": email, "password": "hash"}
+        assert repos.users.get_by_email("missing@example.com") is None
+
+    def test_duplicate_email_raises(self, repos):
+        email = f"repo_{uuid.uuid4().hex}@example.com"
+        repos.users.create(email, "hash")
+        with pytest.raises(DuplicateEmail):
+            repos.users.create(email, "other")
+
+
+class TestProducts:
+    def test_list_all_ordered_by_id_in_cents(self, repos):
+        products = repos.products.list_all()
+        assert products and [p["id"] for p in products] == sorted(p["id"] for p in products)
+        assert all(isinstance(p["price_cents"], int) for p in products)
+
+
+class TestCarts:
+    def test_add_update_remove_keep_total(self, repos, user_id):
+        first, second = repos.products.list_all()[:2]
+        line = repos.carts.add_item(user_id, first["id"], 2, _no_store)
+        assert line == {"id": line["id"], "product_id": first["id"], "quantity": 2}
+        # Adding the same product again increases the same line.
+        assert repos.carts.add_item(user_id, first["id"], 1, _no_store)["id"] == line["id"]
+        other = repos.carts.add_item(user_id, second["id"], 1, _no_store)
+
+        cart = repos.carts.get_active(user_id)
+        assert [l["id"] for l in cart["lines"]] == sorted([line["id"], other["id"]])
+        assert cart["lines"][0]["product_name"] == first["name"]
+        assert cart["total_cents"] == 3 * first["price_cents"] + second["price_cents"]
+
+        assert repos.carts.update_item(user_id, line["id"], 5)
+        assert repos.carts.remove_item(user_id, other["id"])
+        cart = repos.carts.get_active(user_id)
+        assert [(l["id"], l["quantity"]) for l in cart["lines"]] == [(line["id"], 5)]
+        assert cart["total_cents"] == 5 * first["price_cents"]
+
+    def test_other_users_lines_are_not_found(self, repos, user_id):
+        product = repos.products.list_all()[0]
+        line = repos.carts.add_item(user_id, product["id"], 1, _no_store)
+        other_user = repos.users.create(f"repo_{uuid.uuid4().hex}@example.com", "hash")
+        assert not repos.carts.update_item(other_user, line["id"], 2)
+        assert not repos.carts.remove_item(other_user, line["id"])
+
+    def test_unknown_product_raises(self, repos, user_id):
+        with pytest.raises(ProductNotFound):
+            repos.carts.add_item(user_id, 10**9, 1, _no_store)
+
+    def test_merge_lines_adds_to_existing_lines(self, repos, user_id):
+        first, second = repos.products.list_all()[:2]
+        repos.carts.add_item(user_id, first["id"], 1, _no_store)
+        lines = [(first["id"], 2), (second["id"], 1), (10**9, 1)]
+        assert repos.carts.merge_lines(user_id, lines, "guest-1", 1000.0, 0.0) == (2, [])
+        cart = repos.carts.get_active(user_id)
+        assert [(l["product_id"], l["quantity"]) for l in cart["lines"]] == [(first["id"], 3), (second["id"], 1)]
+        assert cart["total_cents"] == 3 * first["price_cents"] + second["price_cents"]
+
+    def test_merge_lines_merges_a_guest_cart_once(self, repos, user_id):
+        product = repos.products.list_all()[0]
+        assert repos.carts.merge_lines(user_id, [(product["id"], 2)], "guest-1", 1000.0, 0.0) == (1, [])
+        assert repos.carts.merge_lines(user_id, [(product["id"], 2)], "guest-1", 1010.0, 10.0) == (0, [])
+        assert repos.carts.get_active(user_id)["lines"][0]["quantity"] == 2
+        # Once the record has expired (so has every token of the cart), the id is free again.
+        assert repos.carts.merge_lines(user_id, [(product["id"], 2)], "guest-1", 3000.0, 2000.0) == (1, [])
+        assert repos.carts.get_active(user_id)["lines"][0]["quantity"] == 4
+
+    def test_checkout_returns_total_and_empties_cart(self, repos, user_id):
+        product = repos.products.list_all()[0]
+        repos.carts.add_item(user_id, product["id"], 2, _no_store)
+        stored = []
+        assert repos.carts.checkout(user_id, lambda tx, total: stored.append(total)) == 2 * product["price_cents"]
+        assert stored == [2 * product["price_cents"]]
+        assert repos.carts.get_active(user_id) is None
+        assert repos.carts.checkout(user_id, _no_store) is None
+
+    def test_failing_store_rolls_back_the_write(self, repos, user_id):
+        product = repos.products.list_all()[0]
+
+        def failing_store(tx, result):
+            raise RuntimeError("store failed")
+
+        with pytest.raises(RuntimeError):
+            repos.carts.add_item(user_id, product["id"], 1, failing_store)
+        assert repos.carts.get_active(user_id) is None
+
+
+class TestItems:
+    def test_crud_and_pages(self, repos):
+        created = repos.items.create_many(["repo a", "repo b", "repo c"])
+        ids = [item["id"] for item in created]
+        assert [item["name"] for item in created] == ["repo a", "repo b", "repo c"]
+        assert repos.items.list_page(ids[0], 2) == created[1:]
+        assert repos.items.get(ids[0]) == created[0]
+
+        assert repos.items.update_many([(ids[0], "renamed"), (10**9, "missing")]) == [10**9]
+        assert repos.items.get(ids[0])["name"] == "repo a"
+        assert repos.items.update_many([(ids[0], "renamed")]) == []
+        assert repos.items.get(ids[0])["name"] == "renamed"
+
+        assert repos.items.delete_many([ids[1], 10**9]) == [10**9]
+        assert repos.items.get(ids[1]) is not None
+        assert repos.items.delete_many(ids) == []
+        assert repos.items.get(ids[0]) is None
+        assert not {item["id"] for item in repos.items.list_page(ids[0] - 1, 3)} & set(ids)
+
+
+class TestIdempotencyKeys:
+    def test_live_key_is_kept_expired_key_is_overwritten(self, repos, user_id):
+        now = time.time()
+        key = uuid.uuid4().hex
+
+        def save(digest, response, at, ttl=60):
+            # Saved inside a (checkout) write transaction, as app.idempotency does.
+            saved = []
+            repos.carts.checkout(
+                user_id,
+                lambda tx, total: saved.append(
+                    repos.idempotency_keys.save(tx, user_id, key, digest, response, at, at - ttl)
+                ),
+            )
+            return saved[0]
+
+        assert save("a", {"n": 1}, now)
+        assert repos.idempotency_keys.find(user_id, key, now - 60) == ("a", {"n": 1}, now)
+        assert not save("b", {"n": 2}, now + 1)
+        assert save("c", {"n": 3}, now + 120)
+        assert repos.idempotency_keys.find(user_id, key, now + 60)[0] == "c"
+        assert repos.idempotency_keys.find(user_id, key, now + 200) is None
+
+
+def test_switching_databases_leaves_earlier_rows_behind(_database):
+    """Holds for the configured backend: the memory store is reset when the database switches."""
+    other = "file:/test_switch_target?vfs=memdb"
+    database.clone_database(_database, other)
+    email = f"repo_{uuid.uuid4().hex}@example.com"
+    repositories.users.create(email, "hash")
+    try:
+        database.use_database(other)
+        assert repositories.users.get_by_email(email) is None
+        assert repositories.products.list_all()
+    finally:
+        database.use_database(_database)
+        database.drop_database(other)
+
+
+@pytest.mark.memory_only
+def test_memory_backend_refuses_jobs_on_the_sqlite_files(client, admin_headers):
+    product_id = client.get("/products").json()[0]["id"]
+    calls = [
+        ("post", "/admin/products/import?format=csv", {"content": "name,price\nUnseen,1\n"}),
+        ("post", "/admin/users/import?format=csv", {"content": "email,password\nunseen@example.com,pass123\n"}),
+        ("put", f"/admin/products/{product_id}/stock", {"json": {"available": 1}}),
+        ("post", "/admin/maintenance", {}),
+    ]
+    for method, url, kwargs in calls:
+        response = getattr(client, method)(url, headers=admin_headers, **kwargs)
+        assert response.status_code == 501, url
+        assert "STORAGE_BACKEND=memory" in response.json()["detail"]
+        # The admin key is still checked first.
+        assert getattr(client, method)(url, **kwargs).status_code == 403
+    assert "Unseen" not in {product["name"] for product in client.get("/products").json()}
+    # Let warm-up finish its bcrypt hash: a run of this test alone would otherwise exit under it.
+    assert warmup.wait_until_ready(30)
@@ -0,0 +1,212 @@
+"""
+Sharding tests. SHARD_COUNT is read at import time, so each scenario runs in a
+fresh interpreter against its own temporary database files.
+"""
+
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import textwrap
+
+from app.database import SHARD_ID_BITS
+from app.startup import PROJECT_ROOT
+
+SCENARIO = textwrap.dedent(
+    """
+    import json, sqlite3
+    from fastapi.testclient import TestClient
+
+    from migrate import run_migrations
+    run_migrations("upgrade")
+
+    from app.database import recorded_shard_count, shard_for_email, shard_for_user, shard_path
+    from app.main import app
+
+    result = {"users": []}
+    with TestClient(app) as client:
+        admin = {"X-Admin-Key": "shard-admin"}
+        body = "id,name,price\\n900001,Sharded Import,4.50\\n"
+        assert client.post("/admin/products/import?format=csv", content=body, headers=admin).status_code == 200
+        assert client.put("/admin/products/1/stock", json={"available": 10}, headers=admin).status_code == 200
+        for n in range(12):
+            email = f"shard{n}@example.com"
+            user = client.post("/auth/register", json={"email": email, "password": "password123"}).json()
+            token = client.post("/auth/login", json={"email": email, "password": "password123"}).json()["access_token"]
+            headers = {"Authorization": f"Bearer {token}"}
+            added = client.post("/cart/items", json={"product_id": 1, "quantity": 1}, headers=headers)
+            cart = client.get("/cart", headers=headers).json()
+            checkout = client.post("/cart/checkout", headers=headers)
+            result["users"].append({
+                "id": user["id"],
+                "email_shard": shard_for_email(email),
+                "id_shard": shard_for_user(user["id"]),
+                "added": added.status_code,
+                "cart_items": len(cart["items"]),
+                "checkout": checkout.status_code,
+            })
+        duplicate = client.post("/auth/register", json={"email": "SHARD0@example.com", "password": "password123"})
+        result["duplicate"] = duplicate.status_code
+        export = client.get("/orders/export", headers=admin)
+        result["exported_orders"] = [json.loads(line)["id"] for line in export.text.splitlines()]
+
+    result["recorded_shard_count"] = recorded_shard_count(sqlite3.connect(shard_path(0)))
+    result["stock"] = []
+    result["users_per_shard"] = []
+    result["imported_product"] = []
+    for shard in range(3):
+        conn = sqlite3.connect(shard_path(shard))
+        result["stock"].append(conn.execute("SELECT available FROM product_stock WHERE product_id = 1").fetchone()[0])
+        result["users_per_shard"].append(conn.execute("SELECT COUNT(*) FROM users").fetchone()[0])
+        row = conn.execute("SELECT name, price_cents FROM products WHERE id = 900001").fetchone()
+        result["imported_product"].append(list(row) if row else None)
+        conn.close()
+    print(json.dumps(result))
+    """
+)
+
+
+# Four shards of 10 units each; a buyer on shard 0 takes 12, then one buyer per shard takes 1.
+GATHER_SCENARIO = textwrap.dedent(
+    """
+    import json, sqlite3
+    from fastapi.testclient import TestClient
+
+    from migrate import run_migrations
+    run_migrations("upgrade")
+
+    from app import metrics
+    from app.database import shard_for_email, shard_path
+    from app.main import app
+
+    def stock():
+        return [
+            sqlite3.connect(shard_path(shard)).execute(
+                "SELECT available FROM product_stock WHERE product_id = 1"
+            ).fetchone()[0]
+            for shard in range(4)
+        ]
+
+    def buyer(client, shard):
+        n = 0
+        while shard_for_email(f"buyer{shard}-{n}@example.com") != shard:
+            n += 1
+        email = f"buyer{shard}-{n}@example.com"
+        client.post("/auth/register", json={"email": email, "password": "password123"})
+        token = client.post("/auth/login", json={"email": email, "password": "password123"}).json()["access_token"]
+        return {"Authorization": f"Bearer {token}"}
+
+    result = {}
+    with TestClient(app) as client:
+        admin = {"X-Admin-Key": "shard-admin"}
+        assert client.put("/admin/products/1/stock", json={"available": 40}, headers=admin).status_code == 200
+        result["before"] = stock()
+        headers = buyer(client, 0)
+        client.post("/cart/items", json={"product_id": 1, "quantity": 12}, headers=headers)
+        result["checkout"] = client.post("/cart/checkout", headers=headers).status_code
+        result["after_gather"] = stock()
+        result["gathered"] = metrics.get_counter("stock.units_gathered")
+        for shard in (1, 2, 3, 0):
+            headers = buyer(client, shard)
+            client.post("/cart/items", json={"product_id": 1, "quantity": 1}, headers=headers)
+            assert client.post("/cart/checkout", headers=headers).status_code == 200
+            result.setdefault("after_buyers", []).append(stock())
+        result["gathered_after_buyers"] = metrics.get_counter("stock.units_gathered")
+    print(json.dumps(result))
+    """
+)
+
+
+def run_migrate(tmp_path, shard_count: int) -> subprocess.CompletedProcess:
+    env = {
+        **os.environ,
+        "DATABASE_PATH": str(tmp_path / "app.db"),
+        "ARCHIVE_DATABASE_PATH": str(tmp_path / "archive.db"),
+        "SHARD_COUNT": str(shard_count),
+    }
+    return subprocess.run(
+        [sys.executable, "migrate.py", "upgrade"], cwd=PROJECT_ROOT, env=env, capture_output=True, text=True
+    )
+
+
+def run_scenario(tmp_path, scenario: str = SCENARIO, shard_count: int = 3) -> dict:
+    env = {
+        **os.environ,
+        "DATABASE_PATH": str(tmp_path / "app.db"),
+        "ARCHIVE_DATABASE_PATH": str(tmp_path / "archive.db"),
+        "SHARD_COUNT": str(shard_count),
+        "STORAGE_BACKEND": "sqlite",
+        "ADMIN_API_KEY": "shard-admin",
+    }
+    result = subprocess.run(
+        [sys.executable, "-c", scenario], cwd=PROJECT_ROOT, env=env, capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+class TestSharding:
+    def test_users_spread_over_shards(self, tmp_path):
+        result = run_scenario(tmp_path)
+        for shard in range(3):
+            assert (tmp_path / ("app.db" if shard == 0 else f"app_shard{shard}.db")).exists()
+        users = result["users"]
+        # A user's id lies in the id range of the shard their email hashes to.
+        for user in users:
+            assert user["id_shard"] == user["email_shard"]
+            assert user["id"] >> SHARD_ID_BITS == user["email_shard"]
+        assert len({user["id"] for user in users}) == len(users)
+        assert sum(result["users_per_shard"]) == len(users)
+        assert len({user["email_shard"] for user in users}) > 1
+        # migrate.py records the count the users were placed with (checked at startup).
+        assert result["recorded_shard_count"] == 3
+        # Registration finds duplicates in the email's shard.
+        assert result["duplicate"] == 409
+
+        # Cart writes and checkout go to the user's shard. A shard that sold its share of
+        # stock gathers what the others have left, so all 10 units sell before any 409.
+        assert all(user["added"] == 201 and user["cart_items"] == 1 for user in users)
+        assert [user["checkout"] for user in users] == [200] * 10 + [409] * 2
+        assert result["stock"] == [0, 0, 0]
+
+        # The catalog import is replicated to every shard.
+        assert result["imported_product"] == [["Sharded Import", 450]] * 3
+
+        # The export reads every shard.
+        exported = result["exported_orders"]
+        assert exported == sorted(exported) and len(exported) == 10
+
+    def test_a_short_shard_gathers_only_its_shortfall(self, tmp_path):
+        result = run_scenario(tmp_path, GATHER_SCENARIO, shard_count=4)
+        assert result["before"] == [10, 10, 10, 10]
+        assert result["checkout"] == 200
+        # Only the 2 missing units moved, from the next shard; the others keep their share.
+        assert result["gathered"] == 2
+        assert result["after_gather"] == [0, 8, 10, 10]
+        # Buyers on the other shards sell from their own share; nothing is pulled back.
+        assert result["after_buyers"][:3] == [[0, 7, 10, 10], [0, 7, 9, 10], [0, 7, 9, 9]]
+        # The drained shard's next buyer takes the single unit it lacks.
+        assert result["after_buyers"][3] == [0, 6, 9, 9]
+        assert result["gathered_after_buyers"] == 3
+
+    def test_refuses_to_shard_a_populated_database_without_a_record(self, tmp_path):
+        assert run_migrate(tmp_path, 1).returncode == 0
+        # A single-file database with users from before SHARD_COUNT was recorded.
+        conn = sqlite3.connect(tmp_path / "app.db")
+        conn.execute("DROP TABLE _meta")
+        for name in ("alice", "bob", "carol"):
+            conn.execute("INSERT INTO users (email, password) VALUES (?, 'x')", (f"{name}@example.com",))
+        conn.commit()
+
+        result = run_migrate(tmp_path, 4)
+        assert result.returncode != 0
+        assert "SHARD_COUNT=1" in result.stderr
+        assert conn.execute("SELECT name FROM sqlite_master WHERE name = '_meta'").fetchone() is None
+        assert not (tmp_path / "app_shard1.db").exists()
+        conn.close()
+        # The count the users were placed with is still accepted, and now recorded.
+        assert run_migrate(tmp_path, 1).returncode == 0
+        conn = sqlite3.connect(tmp_path / "app.db")
+        assert conn.execute("SELECT value FROM _meta WHERE key = 'shard_count'").fetchone()[0] == "1"
+        conn.close()
@@ -0,0 +1,106 @@
+"""Tests for single-flight coalescing of cache-miss loads."""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app import catalog
+from app.cart_cache import CartCache
+from app.singleflight import SingleFlight, SingleFlightTimeout
+
+
+def _run_concurrently(fn, n=20):
+    barrier = threading.Barrier(n)
+
+    def call():
+        barrier.wait()
+        return fn()
+
+    with ThreadPoolExecutor(max_workers=n) as pool:
+        futures = [pool.submit(call) for _ in range(n)]
+        return [f.exception() or f.result() for f in futures]
+
+
+class TestSingleFlight:
+    def test_concurrent_callers_share_one_call(self):
+        flight = SingleFlight("test")
+        calls = []
+
+        def load():
+            calls.append(1)
+            time.sleep(0.1)
+            return {"value": 42}
+
+        results = _run_concurrently(lambda: flight.do("k", load))
+        assert len(calls) == 1
+        assert all(r is results[0] for r in results)
+        assert flight.in_flight() == 0
+
+    def test_error_propagates_to_every_waiter(self):
+        flight = SingleFlight("test")
+
+        def load():
+            time.sleep(0.1)
+            raise RuntimeError("db down")
+
+        results = _run_concurrently(lambda: flight.do("k", load))
+        assert all(isinstance(r, RuntimeError) for r in results)
+        # The failed load is not remembered; the next caller retries.
+        assert flight.do("k", lambda: "ok") == "ok"
+
+    def test_waiter_times_out(self):
+        flight = SingleFlight("test")
+        release = threading.Event()
+        leader = threading.Thread(target=flight.do, args=("k", release.wait))
+        leader.start()
+        while flight.in_flight() == 0:
+            time.sleep(0.001)
+        with pytest.raises(SingleFlightTimeout):
+            flight.do("k", lambda: "unused", timeout=0.05)
+        release.set()
+        leader.join()
+
+    def test_forget_starts_a_new_load(self):
+        flight = SingleFlight("test")
+        release = threading.Event()
+        leader = threading.Thread(target=flight.do, args=("k", release.wait))
+        leader.start()
+        while flight.in_flight() == 0:
+            time.sleep(0.001)
+        flight.forget("k")
+        assert flight.do("k", lambda: "fresh") == "fresh"
+        release.set()
+        leader.join()
+
+
+class TestStampede:
+    def test_cart_cache_misses_load_once(self):
+        cache = CartCache(max_weight=100)
+        loads = []
+
+        def loader(user_id):
+            loads.append(user_id)
+            time.sleep(0.1)
+            return {"items": [], "total": 0.0, "status": "active"}
+
+        results = _run_concurrently(lambda: cache.load(7, loader), n=50)
+        assert loads == [7]
+        assert all(r == results[0] for r in results)
+        assert cache.get(7) is not None
+
+    def test_catalog_misses_load_once(self, client, monkeypatch):
+        loads = []
+        original = catalog._load
+
+        def slow_load():
+            loads.append(1)
+            time.sleep(0.1)
+            return original()
+
+        monkeypatch.setattr(catalog, "_load", slow_load)
+        catalog.invalidate()
+        results = _run_concurrently(catalog.get_products, n=50)
+        assert len(loads) == 1
+        assert all(r == results[0] for r in results)
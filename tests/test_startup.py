@@ -0,0 +1,41 @@
+"""Tests for startup instrumentation and the import-time budget."""
+
+import os
+import subprocess
+import sys
+
+from app import metrics
+from app.startup import PROJECT_ROOT, import_time_ms
+
+# Budget for importing app.main in a fresh interpreter; override on slow CI machines.
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "1500"))
+
+
+class TestImportBudget:
+    def test_app_import_within_budget(self):
+        """Importing app.main stays within the configured budget."""
+        elapsed = import_time_ms("app.main")
+        assert elapsed < IMPORT_BUDGET_MS, f"app.main imported in {elapsed:.0f} ms (budget {IMPORT_BUDGET_MS:.0f} ms)"
+
+    def test_heavy_auth_dependencies_are_deferred(self):
+        """passlib and python-jose are not imported until first use."""
+        code = "import sys, app.main; print('passlib' in sys.modules, 'jose' in sys.modules)"
+        result = subprocess.run(
+            [sys.executable, "-c", code], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+        )
+        assert result.stdout.split() == ["False", "False"]
+
+
+class TestStartupMetrics:
+    def test_first_request_time_recorded(self, client):
+        """The first served request records time since process start."""
+        client.get("/health")
+        assert metrics.get_gauge("startup.first_request_seconds") > 0
+        assert metrics.get_gauge("startup.app_loaded_seconds") > 0
+
+    def test_metrics_endpoint_returns_snapshot(self, client):
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        data = response.json()
+        assert set(data) == {"counters", "gauges", "timings"}
+        assert "startup.first_request_seconds" in data["gauges"]
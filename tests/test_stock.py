@@ -0,0 +1,139 @@
+"""Tests for stock decrements at checkout and soft reservations."""
+
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app import stock
+from app.database import get_db
+
+# Stock is kept by SQLite tables and triggers.
+pytestmark = pytest.mark.sqlite_only
+
+
+@pytest.fixture
+def product_id(client, admin_headers):
+    """A new product with 5 units in stock."""
+    with get_db() as conn:
+        pid = conn.execute(
+            "INSERT INTO products (name, price_cents) VALUES (?, 500) RETURNING id", (f"Stocked {uuid.uuid4().hex}",)
+        ).fetchone()["id"]
+    assert client.put(f"/admin/products/{pid}/stock", json={"available": 5}, headers=admin_headers).status_code == 200
+    return pid
+
+
+@pytest.fixture
+def reservations(monkeypatch):
+    monkeypatch.setattr(stock, "STOCK_RESERVATION_SECONDS", 60.0)
+
+
+def _available(product_id):
+    with get_db() as conn:
+        return conn.execute("SELECT available FROM product_stock WHERE product_id = ?", (product_id,)).fetchone()[0]
+
+
+def _reserved(product_id):
+    with get_db() as conn:
+        return conn.execute(
+            "SELECT COALESCE(SUM(quantity), 0) FROM stock_reservations WHERE product_id = ?", (product_id,)
+        ).fetchone()[0]
+
+
+def _add(client, headers, product_id, quantity):
+    return client.post("/cart/items", json={"product_id": product_id, "quantity": quantity}, headers=headers)
+
+
+class TestCheckoutStock:
+    def test_checkout_deducts_stock(self, client, fresh_auth_headers, product_id):
+        headers = fresh_auth_headers()
+        _add(client, headers, product_id, 2)
+        assert _available(product_id) == 5
+        assert client.post("/cart/checkout", headers=headers).json()["message"] == "Checkout successful"
+        assert _available(product_id) == 3
+
+    def test_shortage_returns_409_and_keeps_cart(self, client, fresh_auth_headers, product_id):
+        headers = fresh_auth_headers()
+        untracked = client.get("/products").json()[0]["id"]
+        _add(client, headers, untracked, 1)
+        _add(client, headers, product_id, 6)
+        response = client.post("/cart/checkout", headers=headers)
+        assert response.status_code == 409
+        assert str(product_id) in response.json()["detail"]
+        assert _available(product_id) == 5
+        assert len(client.get("/cart", headers=headers).json()["items"]) == 2
+
+    def test_concurrent_checkouts_never_oversell(self, client, fresh_auth_headers, product_id):
+        buyers = [fresh_auth_headers() for _ in range(4)]
+        for headers in buyers:
+            _add(client, headers, product_id, 2)
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            responses = list(pool.map(lambda h: client.post("/cart/checkout", headers=h), buyers))
+        assert sorted(r.status_code for r in responses) == [200, 200, 409, 409]
+        assert _available(product_id) == 1
+
+    def test_set_stock_validation(self, client, admin_headers, product_id):
+        assert client.put("/admin/products/999999/stock", json={"available": 1}, headers=admin_headers).status_code == 404
+        response = client.put(f"/admin/products/{product_id}/stock", json={"available": -1}, headers=admin_headers)
+        assert response.status_code == 422
+        assert client.put(f"/admin/products/{product_id}/stock", json={"available": 1}).status_code == 403
+
+
+class TestReservations:
+    def test_add_update_remove_hold_and_release(self, client, fresh_auth_headers, product_id, reservations):
+        headers = fresh_auth_headers()
+        item_id = _add(client, headers, product_id, 2).json()["id"]
+        assert (_available(product_id), _reserved(product_id)) == (3, 2)
+        assert _add(client, headers, product_id, 4).status_code == 409
+        assert client.get("/cart", headers=headers).json()["items"][0]["quantity"] == 2
+        client.put(f"/cart/items/{item_id}", json={"quantity": 5}, headers=headers)
+        assert (_available(product_id), _reserved(product_id)) == (0, 5)
+        client.put(f"/cart/items/{item_id}", json={"quantity": 1}, headers=headers)
+        assert (_available(product_id), _reserved(product_id)) == (4, 1)
+        client.delete(f"/cart/items/{item_id}", headers=headers)
+        assert (_available(product_id), _reserved(product_id)) == (5, 0)
+
+    def test_checkout_consumes_reservation(self, client, fresh_auth_headers, product_id, reservations):
+        headers = fresh_auth_headers()
+        _add(client, headers, product_id, 3)
+        assert client.post("/cart/checkout", headers=headers).status_code == 200
+        assert (_available(product_id), _reserved(product_id)) == (2, 0)
+
+    def test_reserved_units_are_not_sold_to_others(self, client, fresh_auth_headers, product_id, reservations):
+        holder, other = fresh_auth_headers(), fresh_auth_headers()
+        _add(client, holder, product_id, 4)
+        assert _add(client, other, product_id, 2).status_code == 409
+        assert _add(client, other, product_id, 1).status_code == 201
+
+    def test_expired_reservations_return_to_stock(self, client, fresh_auth_headers, product_id, reservations):
+        headers = fresh_auth_headers()
+        _add(client, headers, product_id, 3)
+        assert stock.expire_reservations(now=time.time() + 120, batch_size=1) >= 1
+        assert (_available(product_id), _reserved(product_id)) == (5, 0)
+        # The cart line remains; checkout now deducts it like an unreserved line.
+        assert client.post("/cart/checkout", headers=headers).status_code == 200
+        assert _available(product_id) == 2
+
+    def test_holds_are_returned_after_reservations_are_disabled(
+        self, client, fresh_auth_headers, product_id, reservations, monkeypatch
+    ):
+        headers = fresh_auth_headers()
+        item_id = _add(client, headers, product_id, 2).json()["id"]
+        other = fresh_auth_headers()
+        _add(client, other, product_id, 1)
+        assert (_available(product_id), _reserved(product_id)) == (2, 3)
+        monkeypatch.setattr(stock, "STOCK_RESERVATION_SECONDS", 0.0)
+        # Changing or removing a line releases its hold.
+        client.put(f"/cart/items/{item_id}", json={"quantity": 1}, headers=headers)
+        assert (_available(product_id), _reserved(product_id)) == (4, 1)
+        # The reaper still runs and returns the rest once it expires.
+        with get_db() as conn:
+            conn.execute("UPDATE stock_reservations SET expires_at = 0 WHERE product_id = ?", (product_id,))
+        reaper = stock.ReservationReaper(interval=0.05)
+        reaper.start()
+        deadline = time.time() + 10
+        while _reserved(product_id) and time.time() < deadline:
+            time.sleep(0.05)
+        reaper.stop()
+        assert (_available(product_id), _reserved(product_id)) == (5, 0)